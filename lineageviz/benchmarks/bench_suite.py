@@ -0,0 +1,150 @@
+"""
+Benchmark suite over synthetic lineages.
+
+For every lineage kind and size, each stage is timed (best of --repeat
+runs) and then run once more under tracemalloc for its peak memory, so
+regressions in either show up as a changed row. Inputs are generated with
+lineageviz.synth and written to a temporary directory.
+
+Run from the repository root:
+
+    python benchmarks/bench_suite.py --sizes 10 1000 100000 --kinds balanced stem
+    python benchmarks/bench_suite.py --only layout_tree draw_tree --csv results.csv
+
+Stages with a cap (see CAPS) are skipped above it unless --no-caps is given.
+"""
+import argparse
+import csv
+import gc
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+import matplotlib
+matplotlib.use('Agg')
+import pandas as pd
+from matplotlib.figure import Figure
+
+from geometry_engine import compute_angle_table, export_to_ply, plot_geometry_scene
+from lineageviz.importer import load_tree_from_csv, load_tree_from_json
+from lineageviz.layout import layout_tree
+from lineageviz.parser import parse_newick_plusplus
+from lineageviz.plot import draw_tree
+from lineageviz.synth import KINDS, synthetic_divisions, write_lineage
+from spatial_infer import position_tree, position_tree_array
+
+# Largest cell count each stage is run at by default (the per-object paths
+# would take minutes beyond these).
+CAPS = {
+    'load_tree_from_csv': 10 ** 6,
+    'load_tree_from_json': 10 ** 6,
+    'draw_tree': 10 ** 5,
+    'position_tree': 10 ** 5,  # narrow generations (stem chains) go one division at a time
+    'plot_geometry_scene': 10 ** 5,
+}
+
+
+class Inputs:
+    """Synthetic files and in-memory structures for one kind and size."""
+
+    def __init__(self, kind, n_cells, directory):
+        self.divisions = synthetic_divisions(n_cells, kind)
+        self.n_cells = 2 * len(self.divisions['parent']) + 1
+        stem = os.path.join(directory, f"{kind}-{self.n_cells}")
+        self.csv = write_lineage(self.divisions, stem + '.csv')
+        self.json = write_lineage(self.divisions, stem + '.json')
+        self.nwk = write_lineage(self.divisions, stem + '.nwk')
+        self.ply = stem + '.ply'
+        with open(self.nwk) as f:
+            self.newick = f.read()
+        self.tree = parse_newick_plusplus(self.newick, as_array=True)
+        layout_tree(self.tree)
+
+        d = self.divisions
+        self.division_dict = {
+            p: {"daughters": [l, r], "left_volume": lv, "right_volume": rv, "division_angle": a}
+            for p, l, r, lv, rv, a in zip(d['parent'].tolist(), d['left_child'].tolist(),
+                                          d['right_child'].tolist(), d['left_volume'].tolist(),
+                                          d['right_volume'].tolist(), d['division_angle'].tolist())
+        }
+        names, positions = position_tree_array(self.division_dict)
+        self.cell_data = pd.DataFrame({
+            'name': names,
+            'x': positions[:, 0], 'y': positions[:, 1], 'z': positions[:, 2],
+            'volume': [self.division_dict.get(n, {}).get('left_volume', 0.5) for n in names],
+            'daughters': [self.division_dict.get(n, {}).get('daughters', []) for n in names],
+        })
+
+
+def _draw(tree):
+    fig = Figure(figsize=(12, 6))
+    draw_tree(tree, fig.subplots())
+    fig.canvas.draw()
+
+
+STAGES = {
+    'parse_newick_plusplus': lambda i: parse_newick_plusplus(i.newick, as_array=True),
+    'load_tree_from_csv': lambda i: load_tree_from_csv(i.csv),
+    'load_tree_from_json': lambda i: load_tree_from_json(i.json),
+    'layout_tree': lambda i: layout_tree(i.tree),
+    'draw_tree': lambda i: _draw(i.tree),
+    'position_tree': lambda i: position_tree(i.division_dict),
+    'compute_angle_table': lambda i: compute_angle_table(i.cell_data),
+    'plot_geometry_scene': lambda i: plot_geometry_scene(i.cell_data).to_json(),
+    'export_to_ply': lambda i: export_to_ply(i.cell_data, i.ply, volume=True, planes=True),
+}
+
+
+def measure(fn, inputs, repeat):
+    best = float('inf')
+    for _ in range(repeat):
+        gc.collect()
+        start = time.perf_counter()
+        fn(inputs)
+        best = min(best, time.perf_counter() - start)
+    gc.collect()
+    tracemalloc.start()
+    fn(inputs)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return best, peak
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10, 1000, 100000])
+    parser.add_argument('--kinds', nargs='+', choices=KINDS, default=list(KINDS))
+    parser.add_argument('--only', nargs='+', choices=list(STAGES), default=list(STAGES))
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--no-caps', action='store_true', help="run every stage at every size")
+    parser.add_argument('--csv', help="also write the results to this CSV file")
+    args = parser.parse_args(argv)
+
+    rows = []
+    print(f"{'stage':>22} {'kind':>9} {'cells':>9} {'seconds':>10} {'peak MB':>9}")
+    with tempfile.TemporaryDirectory() as directory:
+        for kind in args.kinds:
+            for size in args.sizes:
+                inputs = Inputs(kind, size, directory)
+                for stage in args.only:
+                    if not args.no_caps and inputs.n_cells > CAPS.get(stage, float('inf')):
+                        continue
+                    seconds, peak = measure(STAGES[stage], inputs, args.repeat)
+                    rows.append((stage, kind, inputs.n_cells, seconds, peak / 1e6))
+                    print(f"{stage:>22} {kind:>9} {inputs.n_cells:>9} {seconds:10.4f} {peak / 1e6:9.1f}",
+                          flush=True)
+                del inputs
+
+    if args.csv:
+        with open(args.csv, 'w', newline='') as f:
+            writer = csv.writer(f)
+            writer.writerow(['stage', 'kind', 'cells', 'seconds', 'peak_mb'])
+            writer.writerows(rows)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1 @@
+# Lets pytest import the lineageviz package from a source checkout.
@@ -2,6 +2,9 @@
 import numpy as np
 import pandas as pd
 import plotly.graph_objects as go
+from matplotlib.colors import to_rgb
+from lineageviz.profiling import timed
+from spatial_infer import normalize_rows
 
 # --- Geometry Builders ---
 
@@ -23,10 +26,27 @@ def compute_angle(v1, v2):
 
 # --- 3D Plotting Functions ---
 
-def plot_geometry_scene(cell_data, show_vectors=True, show_planes=True, show_spheres=True):
+@timed
+def plot_geometry_scene(cell_data, show_vectors=True, show_planes=True, show_spheres=True, batched=True):
+    """
+    3D scene of cell bodies, division vectors (parent to daughter centroid)
+    and division planes.
+    - batched: draw all cells, all vectors and all planes as one trace each,
+      so the figure stays small for thousands of cells; with batched=False
+      every cell and division gets its own traces (legacy behaviour)
+    """
+    if batched:
+        fig = go.Figure(geometry_traces(cell_data, show_vectors, show_planes, show_spheres))
+        _scene_layout(fig)
+        return fig
+
     fig = go.Figure()
 
-    for _, row in cell_data.iterrows():
+    parents, left, right = division_rows(cell_data)
+    divisions = dict(zip(parents.tolist(), zip(left.tolist(), right.tolist())))
+    xyz = _xyz(cell_data)
+
+    for i, (_, row) in enumerate(cell_data.iterrows()):
         name = row['name']
         x, y, z = row['x'], row['y'], row['z']
         volume = row.get('volume', 1.0)
@@ -43,35 +63,36 @@ def plot_geometry_scene(cell_data, show_vectors=True, show_planes=True, show_sph
             ))
 
         # Draw division vector and plane if daughters exist
-        daughters = row.get('daughters', [])
-        if show_vectors and len(daughters) == 2:
-            d1 = cell_data[cell_data['name'] == daughters[0]]
-            d2 = cell_data[cell_data['name'] == daughters[1]]
-            if not d1.empty and not d2.empty:
-                x1, y1, z1 = d1.iloc[0][['x', 'y', 'z']]
-                x2, y2, z2 = d2.iloc[0][['x', 'y', 'z']]
-                cx, cy, cz = compute_centroid([(x1, y1, z1), (x2, y2, z2)])
-
-                # Vector from parent to centroid
-                fig.add_trace(go.Scatter3d(
-                    x=[x, cx], y=[y, cy], z=[z, cz],
-                    mode='lines',
-                    line=dict(color='red', width=3),
-                    name=f"Vector {name}"
+        if show_vectors and i in divisions:
+            j1, j2 = divisions[i]
+            x1, y1, z1 = xyz[j1]
+            x2, y2, z2 = xyz[j2]
+            cx, cy, cz = compute_centroid([(x1, y1, z1), (x2, y2, z2)])
+
+            # Vector from parent to centroid
+            fig.add_trace(go.Scatter3d(
+                x=[x, cx], y=[y, cy], z=[z, cz],
+                mode='lines',
+                line=dict(color='red', width=3),
+                name=f"Vector {name}"
+            ))
+
+            # Division plane (as transparent triangle)
+            if show_planes:
+                fig.add_trace(go.Mesh3d(
+                    x=[x1, x2, x],
+                    y=[y1, y2, y],
+                    z=[z1, z2, z],
+                    color='gray',
+                    opacity=0.2,
+                    showscale=False,
+                    name=f"Plane {name}"
                 ))
 
-                # Division plane (as transparent triangle)
-                if show_planes:
-                    fig.add_trace(go.Mesh3d(
-                        x=[x1, x2, x],
-                        y=[y1, y2, y],
-                        z=[z1, z2, z],
-                        color='gray',
-                        opacity=0.2,
-                        showscale=False,
-                        name=f"Plane {name}"
-                    ))
+    _scene_layout(fig)
+    return fig
 
+def _scene_layout(fig):
     fig.update_layout(
         scene=dict(
             xaxis_title='AP',
@@ -83,29 +104,459 @@ def plot_geometry_scene(cell_data, show_vectors=True, show_planes=True, show_sph
         title="Cell Geometry Scene"
     )
 
+def geometry_traces(cell_data, show_vectors=True, show_planes=True, show_spheres=True,
+                    rows=None, divisions=None):
+    """
+    The batched scene as a list of at most three traces: one marker trace
+    for every cell (per-point sizes), one line trace holding every division
+    vector as segments separated by gaps (NaN, which plotly treats like
+    None), and one Mesh3d with a triangle per division plane. Hover text
+    keeps the cell / division names.
+    - rows: rows of cell_data drawn as cells (default: all)
+    - divisions: (parent_rows, left_rows, right_rows) to draw (default:
+      division_rows(cell_data))
+    """
+    names = cell_data['name'].astype(str).to_numpy()
+    xyz = _xyz(cell_data)
+    traces = []
+
+    if show_spheres:
+        if 'volume' in cell_data.columns:
+            volume = cell_data['volume'].to_numpy(dtype=float)
+        else:
+            volume = np.ones(len(cell_data))
+        if rows is None:
+            rows = np.arange(len(cell_data))
+        traces.append(go.Scatter3d(
+            x=xyz[rows, 0], y=xyz[rows, 1], z=xyz[rows, 2],
+            mode='markers+text',
+            text=names[rows],
+            textposition="top center",
+            marker=dict(size=5 + volume[rows] * 10, color='lightblue', opacity=0.8),
+            hoverinfo='text',
+            name="Cells"
+        ))
+
+    if not show_vectors:
+        return traces
+    parents, left, right = division_rows(cell_data) if divisions is None else divisions
+    if len(parents) == 0:
+        return traces
+    p = xyz[parents]
+    d1 = xyz[left]
+    d2 = xyz[right]
+    m = len(parents)
+
+    # parent, centroid, gap for every division
+    segments = np.full((m, 3, 3), np.nan)
+    segments[:, 0] = p
+    segments[:, 1] = (d1 + d2) / 2
+    segments = segments.reshape(-1, 3)
+    labels = np.repeat(np.char.add("Vector ", names[parents]), 3)
+    traces.append(go.Scatter3d(
+        x=segments[:, 0], y=segments[:, 1], z=segments[:, 2],
+        mode='lines',
+        line=dict(color='red', width=3),
+        hovertext=labels,
+        hoverinfo='text',
+        name="Division vectors"
+    ))
+
+    if show_planes:
+        vertices = np.stack([d1, d2, p], axis=1).reshape(-1, 3)
+        faces = np.arange(3 * m).reshape(m, 3)
+        traces.append(go.Mesh3d(
+            x=vertices[:, 0], y=vertices[:, 1], z=vertices[:, 2],
+            i=faces[:, 0], j=faces[:, 1], k=faces[:, 2],
+            color='gray',
+            opacity=0.2,
+            showscale=False,
+            hovertext=np.repeat(np.char.add("Plane ", names[parents]), 3),
+            hoverinfo='text',
+            name="Division planes"
+        ))
+    return traces
+
+def division_spans(cells, lifespans):
+    """
+    When each division of `cells` is on screen: its vector and plane are
+    shown while both daughters are alive (the parent, which has divided,
+    no longer is). Used by the scene at a time cutoff and by every frame
+    of the animation.
+    Returns: ((parent_rows, left_rows, right_rows), shown_from, shown_until)
+    """
+    parents, left, right = division_rows(cells)
+    birth, death = lifespans.birth, lifespans.death
+    return ((parents, left, right), np.maximum(birth[left], birth[right]),
+            np.minimum(death[left], death[right]))
+
+@timed
+def plot_geometry_at(cells, lifespans, t, show_vectors=True, show_planes=True, show_spheres=True):
+    """
+    The batched scene at time t: the cells alive at t and the divisions
+    shown at t (see division_spans), out of every positioned cell.
+    - cells, lifespans: as for plot_geometry_timeseries
+    """
+    (parents, left, right), shown_from, shown_until = division_spans(cells, lifespans)
+    shown = (shown_from <= t) & (t < shown_until)
+    fig = go.Figure(geometry_traces(cells, show_vectors, show_planes, show_spheres,
+                                    rows=lifespans.cells_alive_at(t),
+                                    divisions=(parents[shown], left[shown], right[shown])))
+    _scene_layout(fig)
     return fig
 
+def frame_times(lifespans, step=None, max_frames=None):
+    """
+    Animation frame times: every division event (each distinct birth time)
+    or, with step, every `step` minutes up to the last division. With
+    max_frames, longer series are thinned to that many evenly spread
+    frames, keeping the first and last.
+    """
+    births = np.unique(lifespans.birth[np.isfinite(lifespans.birth)])
+    times = births if step is None else np.arange(births.min(), births.max() + step, step, dtype=float)
+    if max_frames is not None and len(times) > max_frames:
+        times = times[np.unique(np.linspace(0, len(times) - 1, max_frames).round().astype(int))]
+    return times
+
+# Traces are one per kind and run of frames, at most ~frames**2 / 2 per
+# kind, so the frame count is capped rather than one per division (the app
+# lets the user raise the cap or pick a step, and says when it samples).
+MAX_FRAMES = 24
+
+@timed
+def plot_geometry_timeseries(cells, lifespans, times=None, step=None, max_frames=MAX_FRAMES,
+                             show_vectors=True, show_planes=True, show_spheres=True, frame_ms=500):
+    """
+    The batched geometry scene over developmental time as one figure with
+    Plotly animation frames, so playing and scrubbing run in the browser.
+    - cells: every cell with its position (computed once, e.g. by
+      position_tree_array), plus optional volume and daughters columns
+    - lifespans: LifespanIndex over the same rows
+    - times: frame times (default: frame_times(lifespans, step, max_frames))
+    - frame_ms: playback duration of a frame
+
+    Frame t shows what plot_geometry_at shows for t. A cell or division is
+    visible in one run of consecutive frames; cells and divisions are drawn
+    once, batched into one trace per kind and run, and a frame only sets
+    which traces are visible, so the figure grows with the cells plus
+    frames x runs flags rather than frames x cells coordinates.
+    """
+    times = (frame_times(lifespans, step, max_frames) if times is None
+             else np.asarray(times, dtype=float))
+    xyz = _xyz(cells)
+
+    traces, runs = [], []
+    if show_spheres:
+        for run, rows in _frame_runs(times, lifespans.birth, lifespans.death):
+            traces += geometry_traces(cells, show_vectors=False, rows=rows)
+            runs.append(run)
+    if show_vectors:
+        (parents, left, right), shown_from, shown_until = division_spans(cells, lifespans)
+        for run, k in _frame_runs(times, shown_from, shown_until):
+            added = geometry_traces(cells, show_planes=show_planes, show_spheres=False,
+                                    divisions=(parents[k], left[k], right[k]))
+            traces += added
+            runs += [run] * len(added)
+    for trace in traces:
+        trace.showlegend = False
+
+    runs = np.asarray(runs, dtype=np.int64).reshape(-1, 2)
+    frames = []
+    for f, t in enumerate(times.tolist()):
+        visible = ((runs[:, 0] <= f) & (f < runs[:, 1])).tolist()
+        frames.append(go.Frame(data=[type(trace)(visible=v) for trace, v in zip(traces, visible)],
+                               traces=list(range(len(traces))), name=f"{t:g}"))
+
+    fig = go.Figure(data=traces, frames=frames)
+    if frames:
+        # Start on the last frame (the full embryo, like the time slider's default)
+        for trace, update in zip(fig.data, frames[-1].data):
+            trace.visible = update.visible
+    _scene_layout(fig)
+    _animation_controls(fig, [f.name for f in frames], frame_ms)
+    if len(xyz):
+        lo, hi = np.nanmin(xyz, axis=0), np.nanmax(xyz, axis=0)
+        pad = 0.1 * np.maximum(hi - lo, 1e-9)
+        fig.update_layout(scene=dict(
+            xaxis=dict(range=[lo[0] - pad[0], hi[0] + pad[0]]),
+            yaxis=dict(range=[lo[1] - pad[1], hi[1] + pad[1]]),
+            zaxis=dict(range=[lo[2] - pad[2], hi[2] + pad[2]]),
+            aspectmode='cube'))
+    return fig
+
+def _frame_runs(times, start, stop):
+    """
+    Group items visible while start <= t < stop by the run of frames
+    [first, end) that this covers; items visible in no frame are left out.
+    Yields ((first, end), item indices) in order of first frame.
+    """
+    first = np.searchsorted(times, start, side='left')
+    end = np.searchsorted(times, stop, side='left')
+    items = np.flatnonzero(first < end)
+    if len(items) == 0:
+        return
+    key = first[items] * (len(times) + 1) + end[items]
+    order = np.argsort(key, kind='stable')
+    items, key = items[order], key[order]
+    bounds = np.flatnonzero(np.r_[True, key[1:] != key[:-1], True])
+    for a, b in zip(bounds[:-1].tolist(), bounds[1:].tolist()):
+        yield (int(first[items[a]]), int(end[items[a]])), items[a:b]
+
+def _animation_controls(fig, names, frame_ms):
+    play = dict(frame=dict(duration=frame_ms, redraw=True), fromcurrent=False,
+                transition=dict(duration=0), mode='immediate')
+    fig.update_layout(
+        updatemenus=[dict(type='buttons', showactive=False, x=0.0, y=0.0, xanchor='left', yanchor='top',
+                          buttons=[dict(label='▶ Play', method='animate', args=[None, play]),
+                                   dict(label='⏸ Pause', method='animate',
+                                        args=[[None], dict(frame=dict(duration=0, redraw=False),
+                                                           mode='immediate')])])],
+        sliders=[dict(active=len(names) - 1, x=0.12, len=0.88, y=0.0, yanchor='top',
+                      currentvalue=dict(prefix='t = ', suffix=' min'),
+                      steps=[dict(label=name, method='animate',
+                                  args=[[name], dict(frame=dict(duration=0, redraw=True),
+                                                     transition=dict(duration=0), mode='immediate')])
+                             for name in names])])
+
 # --- Analysis ---
 
-def compute_angle_table(cell_data):
-    angles = []
-    for _, row in cell_data.iterrows():
-        daughters = row.get('daughters', [])
-        if len(daughters) == 2:
-            d1 = cell_data[cell_data['name'] == daughters[0]]
-            d2 = cell_data[cell_data['name'] == daughters[1]]
-            if not d1.empty and not d2.empty:
-                p = np.array([row['x'], row['y'], row['z']])
-                v1 = compute_vector(p, d1.iloc[0][['x', 'y', 'z']])
-                v2 = compute_vector(p, d2.iloc[0][['x', 'y', 'z']])
-                angle = compute_angle(v1, v2)
-                angles.append({"parent": row['name'], "angle": angle})
-    return pd.DataFrame(angles)
+@timed
+def division_rows(cell_data):
+    """
+    Row positions of every division whose daughters are both in cell_data.
+    Daughters are matched by name through a single index (first row wins
+    for repeated names) instead of scanning the frame per division.
+    Returns: (parent_rows, left_rows, right_rows) int arrays
+    """
+    empty = np.empty(0, dtype=np.int64)
+    if 'daughters' not in cell_data.columns or len(cell_data) == 0:
+        return empty, empty, empty
+    names = cell_data['name']
+    first = ~names.duplicated().to_numpy()
+    index = pd.Index(names[first])
+    rows = np.flatnonzero(first)
+
+    parents, d1, d2 = [], [], []
+    for i, daughters in enumerate(cell_data['daughters'].tolist()):
+        if isinstance(daughters, (list, tuple)) and len(daughters) == 2:
+            parents.append(i)
+            d1.append(daughters[0])
+            d2.append(daughters[1])
+    if not parents:
+        return empty, empty, empty
+    j1 = index.get_indexer(d1)
+    j2 = index.get_indexer(d2)
+    found = (j1 >= 0) & (j2 >= 0)
+    return np.asarray(parents)[found], rows[j1[found]], rows[j2[found]]
+
+def _xyz(cell_data):
+    if len(cell_data) == 0:
+        return np.empty((0, 3))
+    return cell_data[['x', 'y', 'z']].to_numpy(dtype=float)
+
+def _row_dot(a, b):
+    return np.matmul(a[:, None, :], b[:, :, None])[:, 0, 0]
+
+EMBRYO_AXES = {'AP': (1.0, 0.0, 0.0), 'DV': (0.0, 1.0, 0.0), 'LR': (0.0, 0.0, 1.0)}
+
+@timed
+def compute_angle_table(cell_data, axes=False, separation=False):
+    """
+    Angle between the two parent->daughter vectors of every division.
+    - axes: also report the angle (0-90 degrees) between the division axis
+      (daughter to daughter) and each embryo axis, as ap/dv/lr_angle
+    - separation: also report the distance between the daughters
+    All quantities are computed for every division at once.
+    """
+    parents, left, right = division_rows(cell_data)
+    columns = ["parent", "angle"]
+    if axes:
+        columns += [f"{k.lower()}_angle" for k in EMBRYO_AXES]
+    if separation:
+        columns.append("separation")
+    if len(parents) == 0:
+        return pd.DataFrame(columns=columns)
+
+    xyz = _xyz(cell_data)
+    p = xyz[parents]
+    v1 = normalize_rows(xyz[left] - p)
+    v2 = normalize_rows(xyz[right] - p)
+    dot = np.clip(_row_dot(v1, v2), -1.0, 1.0)
+    table = {
+        "parent": cell_data['name'].to_numpy()[parents],
+        "angle": np.degrees(np.arccos(dot)),
+    }
+
+    if axes or separation:
+        axis = xyz[right] - xyz[left]
+        if axes:
+            u = normalize_rows(axis)
+            for key, direction in EMBRYO_AXES.items():
+                cos = np.clip(np.abs(u @ np.asarray(direction)), 0.0, 1.0)
+                table[f"{key.lower()}_angle"] = np.degrees(np.arccos(cos))
+        if separation:
+            table["separation"] = np.sqrt(_row_dot(axis, axis))
+    return pd.DataFrame(table, columns=columns)
 
 # --- Export ---
-def export_to_ply(cell_data, filename="embryo.ply"):
-    with open(filename, 'w') as f:
-        f.write("ply\nformat ascii 1.0\nelement vertex %d\n" % len(cell_data))
-        f.write("property float x\nproperty float y\nproperty float z\nend_header\n")
-        for _, row in cell_data.iterrows():
-            f.write(f"{row['x']} {row['y']} {row['z']}\n")
+
+AXIS_INDEX = {'AP': 0, 'DV': 1, 'LR': 2}
+SHAPE_STRETCH = {'sphere': 1.0, 'elongated': 1.5, 'compressed': 1 / 1.5}
+
+@timed
+def export_to_ply(cell_data, filename="embryo.ply", volume=False, color_map=None,
+                  planes=False, bodies=False, resolution=12):
+    """
+    Write cells as a binary little-endian PLY file.
+
+    One vertex per cell (its center); everything is assembled in NumPy
+    structured arrays and written with a single buffer write.
+
+    Parameters:
+    - cell_data: DataFrame with name, x, y, z (and volume, daughters, shape,
+      elongation_axis when used)
+    - filename: output path
+    - volume: add a per-vertex `volume` property
+    - color_map: lineage prefix -> color (first matching prefix wins,
+      'others' for the rest); adds per-vertex red/green/blue
+    - planes: add a triangle face per division (daughter, daughter, parent)
+    - bodies: add a tessellated sphere per cell, radius from its volume;
+      `shape` 'elongated' / 'compressed' stretch it along `elongation_axis`
+      (AP, DV or LR) at constant volume
+    - resolution: latitude bands of each tessellated body
+    """
+    vertices, faces = ply_arrays(cell_data, volume, color_map, planes, bodies, resolution)
+    header = ["ply", "format binary_little_endian 1.0", f"element vertex {len(vertices)}"]
+    header += [f"property {_PLY_TYPES[vertices.dtype[k].str]} {k}" for k in vertices.dtype.names]
+    if faces is not None:
+        header += [f"element face {len(faces)}", "property list uchar int vertex_indices"]
+    header.append("end_header\n")
+    with open(filename, 'wb') as f:
+        f.write(b"".join([
+            "\n".join(header).encode('ascii'),
+            vertices.tobytes(),
+            b"" if faces is None else faces.tobytes(),
+        ]))
+    return filename
+
+def export_ply_series(frames, pattern="embryo_{:04d}.ply", **kwargs):
+    """
+    Export a time series of embryos to numbered PLY files.
+
+    `frames` may be any iterable of cell_data frames (e.g. a generator);
+    each is written and released before the next is requested, so only one
+    embryo is in memory at a time. Keyword arguments go to export_to_ply.
+    Returns the written filenames.
+    """
+    written = []
+    for t, cell_data in enumerate(frames):
+        written.append(export_to_ply(cell_data, pattern.format(t), **kwargs))
+    return written
+
+_PLY_TYPES = {'<f4': 'float', '|u1': 'uchar', '<i4': 'int'}
+_FACE = np.dtype([('n', 'u1'), ('v', '<i4', (3,))])
+
+def ply_arrays(cell_data, volume=False, color_map=None, planes=False, bodies=False, resolution=12):
+    """
+    The vertex and face records export_to_ply writes, as structured arrays.
+    Returns: (vertices, faces) with faces None when there are none
+    """
+    n = len(cell_data)
+    centers = _xyz(cell_data)
+    if 'volume' in cell_data.columns:
+        volumes = cell_data['volume'].to_numpy(dtype=float)
+    else:
+        volumes = np.ones(n)
+
+    points = [centers]
+    owner = [np.arange(n)]   # cell each vertex belongs to
+    tris = []
+    if planes:
+        parents, left, right = division_rows(cell_data)
+        tris.append(np.stack([left, right, parents], axis=1))
+    if bodies and n:
+        unit, unit_faces = _unit_sphere(resolution)
+        scale = _body_scale(cell_data, volumes)
+        points.append((centers[:, None, :] + unit[None] * scale[:, None, :]).reshape(-1, 3))
+        owner.append(np.repeat(np.arange(n), len(unit)))
+        base = n + len(unit) * np.arange(n)
+        tris.append((unit_faces[None] + base[:, None, None]).reshape(-1, 3))
+
+    points = np.concatenate(points)
+    owner = np.concatenate(owner)
+    fields = [('x', '<f4'), ('y', '<f4'), ('z', '<f4')]
+    if volume:
+        fields.append(('volume', '<f4'))
+    if color_map:
+        fields += [('red', 'u1'), ('green', 'u1'), ('blue', 'u1')]
+    vertices = np.empty(len(points), dtype=fields)
+    vertices['x'], vertices['y'], vertices['z'] = points.T
+    if volume:
+        vertices['volume'] = volumes[owner]
+    if color_map:
+        rgb = np.round(_lineage_rgb(cell_data['name'], color_map) * 255).astype(np.uint8)[owner]
+        vertices['red'], vertices['green'], vertices['blue'] = rgb.T
+
+    faces = None
+    if tris:
+        tris = np.concatenate(tris)
+        faces = np.empty(len(tris), dtype=_FACE)
+        faces['n'] = 3
+        faces['v'] = tris
+    return vertices, faces
+
+def _unit_sphere(resolution):
+    """UV sphere: (vertices, triangle faces) with `resolution` latitude bands."""
+    n_lat = max(int(resolution), 2)
+    n_lon = 2 * n_lat
+    theta = np.linspace(0, np.pi, n_lat + 1)[1:-1]
+    phi = np.linspace(0, 2 * np.pi, n_lon, endpoint=False)
+    ring = np.stack([
+        np.outer(np.sin(theta), np.cos(phi)),
+        np.outer(np.sin(theta), np.sin(phi)),
+        np.outer(np.cos(theta), np.ones(n_lon)),
+    ], axis=-1).reshape(-1, 3)
+    vertices = np.concatenate([[[0.0, 0.0, 1.0]], ring, [[0.0, 0.0, -1.0]]])
+
+    top, bottom = 0, len(vertices) - 1
+    grid = 1 + np.arange((n_lat - 1) * n_lon).reshape(n_lat - 1, n_lon)
+    nxt = np.roll(grid, -1, axis=1)
+    caps = [
+        np.stack([np.full(n_lon, top), grid[0], nxt[0]], axis=1),
+        np.stack([np.full(n_lon, bottom), nxt[-1], grid[-1]], axis=1),
+    ]
+    a, b, c, d = grid[:-1], nxt[:-1], grid[1:], nxt[1:]
+    bands = [np.stack([a, c, b], axis=-1).reshape(-1, 3), np.stack([b, c, d], axis=-1).reshape(-1, 3)]
+    return vertices, np.concatenate(caps + bands).astype(np.int64)
+
+def _body_scale(cell_data, volumes):
+    """Per-cell (n, 3) semi-axes: sphere radius from volume, stretched by shape."""
+    n = len(cell_data)
+    radius = np.cbrt(3 * np.clip(np.nan_to_num(volumes), 0, None) / (4 * np.pi))
+    scale = np.repeat(radius[:, None], 3, axis=1)
+    if 'shape' not in cell_data.columns:
+        return scale
+    stretch = cell_data['shape'].map(SHAPE_STRETCH).fillna(1.0).to_numpy(dtype=float)
+    if 'elongation_axis' in cell_data.columns:
+        axis = cell_data['elongation_axis'].map(AXIS_INDEX).fillna(0).to_numpy(dtype=np.int64)
+    else:
+        axis = np.zeros(n, dtype=np.int64)
+    # Stretch one axis by s and the other two by 1/sqrt(s): volume is kept
+    scale /= np.sqrt(stretch)[:, None]
+    rows = np.arange(n)
+    scale[rows, axis] = radius * stretch
+    return scale
+
+def _lineage_rgb(names, color_map):
+    """RGB per cell from lineage name prefixes (first match wins)."""
+    names = names.astype(str).to_numpy().astype(str)
+    fallback = color_map.get('others', 'lightblue')
+    rgb = np.tile(to_rgb(fallback), (len(names), 1))
+    unresolved = np.ones(len(names), dtype=bool)
+    for prefix, color in color_map.items():
+        if prefix == 'others':
+            continue
+        match = unresolved & np.char.startswith(names, prefix)
+        rgb[match] = to_rgb(color)
+        unresolved &= ~match
+    return rgb
@@ -0,0 +1,167 @@
+import numpy as np
+from .layout import _depth_levels
+from .profiling import timed
+from .query import LineageIndex
+
+
+@timed
+def subtree_reduce(tree, values, ufunc=np.add):
+    """
+    Reduce per-cell `values` over every cell's subtree (the cell included).
+
+    Parameters:
+    - tree: a LineageArray
+    - values: (n,) or (n, k) array, one row per cell
+    - ufunc: a binary NumPy ufunc (np.add, np.maximum, np.minimum, ...)
+
+    Integer sums are range differences of one cumulative sum over preorder
+    (a subtree is the slice [i, subtree_end[i])). Everything else is one
+    children-before-parents pass: ufunc.at per depth level when the tree is
+    wide, a plain reverse-preorder sweep when it is a deep chain.
+    """
+    values = np.asarray(values)
+    if len(values) != len(tree):
+        raise ValueError("values need one row per cell")
+    if ufunc is np.add and (values.dtype == bool or np.issubdtype(values.dtype, np.integer)):
+        total = np.cumsum(values, axis=0, dtype=np.int64)
+        total = np.concatenate((np.zeros((1,) + values.shape[1:], dtype=np.int64), total))
+        end = tree.subtree_end
+        return total[end] - total[np.arange(len(tree))]
+
+    acc = values.copy()
+    parent = tree.parent.astype(np.int64)
+    levels = _depth_levels(parent)
+    if levels is not None:
+        for cells in reversed(levels[1:]):
+            ufunc.at(acc, parent[cells], acc[cells])
+    else:
+        for i in range(len(acc) - 1, 0, -1):
+            p = parent[i]
+            acc[p] = ufunc(acc[p], acc[i])
+    return acc
+
+
+class Reducer:
+    """
+    One named subtree aggregate.
+
+    Parameters:
+    - values: callable(tree, index) returning per-cell values, or None if
+      the tree lacks what it needs (the aggregate is then skipped)
+    - ufunc: how values combine over a subtree (see subtree_reduce)
+    - finish: optional callable(tree, index, reduced) post-processing the
+      reduced array (e.g. turning a max depth into a height)
+    """
+
+    def __init__(self, values, ufunc=np.add, finish=None):
+        self.values = values
+        self.ufunc = ufunc
+        self.finish = finish
+
+    def __call__(self, tree, index=None):
+        index = index or LineageIndex(tree)
+        values = self.values(tree, index)
+        if values is None:
+            return None
+        reduced = subtree_reduce(tree, values, self.ufunc)
+        return reduced if self.finish is None else self.finish(tree, index, reduced)
+
+
+def _volume(tree, index):
+    if 'volume' not in tree.data:
+        return None
+    return np.nan_to_num(np.asarray(tree.data['volume'], dtype=np.float64))
+
+
+REDUCERS = {
+    'cells': Reducer(lambda tree, index: np.ones(len(tree), dtype=np.int64)),
+    'terminal_cells': Reducer(lambda tree, index: tree.is_leaf()),
+    'volume': Reducer(_volume),
+    'terminal_volume': Reducer(lambda tree, index: None if 'volume' not in tree.data
+                               else _volume(tree, index) * tree.is_leaf()),
+    'cumulative_time': Reducer(lambda tree, index: tree.length),
+    'max_depth': Reducer(lambda tree, index: index.depths, np.maximum),
+    'height': Reducer(lambda tree, index: index.depths, np.maximum,
+                      lambda tree, index, deepest: deepest - index.depths),
+}
+
+
+def register_reducer(name, reducer, reducers=None):
+    """
+    A copy of `reducers` (default: the built-in REDUCERS) with `reducer`
+    added as `name`, for subtree_aggregates(tree, reducers=...). REDUCERS
+    itself is never modified, so one caller's reducers do not leak into
+    another's.
+    """
+    registry = dict(REDUCERS if reducers is None else reducers)
+    registry[name] = reducer
+    return registry
+
+
+def subtree_aggregates(tree, reducers=None):
+    """
+    Per-cell subtree aggregates of a LineageArray, as {name: array}.
+
+    Built in (each over the cell's whole subtree, itself included):
+    - cells, terminal_cells: number of cells / leaves
+    - volume, terminal_volume: summed data['volume'] over all cells / leaves
+      (skipped when the tree has no volume column)
+    - cumulative_time: summed branch length
+    - max_depth: depth of the deepest cell; height: that minus the cell's
+      own depth
+
+    `reducers` maps extra names to Reducer objects; a name mapped to None
+    drops a built-in. Fate composition is in fate_composition.
+    """
+    selected = dict(REDUCERS)
+    selected.update(reducers or {})
+    index = LineageIndex(tree)
+    out = {}
+    for name, reducer in selected.items():
+        if reducer is None:
+            continue
+        result = reducer(tree, index)
+        if result is not None:
+            out[name] = result
+    return out
+
+
+def fate_composition(tree, fates=None):
+    """
+    Count the fates inside every subtree.
+
+    Parameters:
+    - fates: per-cell fate labels, or a {cell name: fate} dict; defaults
+      to data['fate']
+
+    Returns (categories, counts) with counts an (n, len(categories)) int
+    array: counts[i, k] cells with fate categories[k] below cell i.
+    """
+    if fates is None:
+        fates = tree.data.get('fate')
+        if fates is None:
+            return [], np.zeros((len(tree), 0), dtype=np.int64)
+    if isinstance(fates, dict):
+        fates = [fates.get(name) for name in tree.cell_names()]
+    fates = [f if isinstance(f, str) and f else None for f in np.asarray(fates, dtype=object).tolist()]
+    categories = sorted({f for f in fates if f is not None})
+    code = {f: k for k, f in enumerate(categories)}
+    column = np.array([code.get(f, -1) for f in fates], dtype=np.int64)
+    one_hot = np.zeros((len(tree), len(categories)), dtype=np.int64)
+    has = np.flatnonzero(column >= 0)
+    one_hot[has, column[has]] = 1
+    return categories, subtree_reduce(tree, one_hot)
+
+
+def small_subtrees(tree, values, fraction):
+    """
+    Topmost cells whose subtree aggregate is below `fraction` of the
+    root's, e.g. small_subtrees(tree, aggregates['volume'], 0.05) for the
+    sub-lineages holding under 5% of the volume. Returns a boolean mask
+    (cells below a marked cell are not marked).
+    """
+    values = np.asarray(values, dtype=np.float64)
+    small = values < fraction * values[0]
+    top = small.copy()
+    top[1:] &= ~small[tree.parent[1:]]
+    return top
@@ -0,0 +1,257 @@
+"""
+Export a time-lapse of a lineage tree growing.
+
+    python -m lineageviz.animate lineage.csv -o growth.gif --step 10 --fps 4 --workers 4
+
+Frame t shows what the app shows with its time slider at t: every cell
+born by t, with the division of each cell that has divided by t. The tree
+is laid out once for its final shape, so nothing moves between frames;
+each worker process draws it once and, per frame, only changes which
+segments and labels are shown. Cells that divide after t keep their full
+branch (the app redraws them as leaves sized by volume).
+
+Output by extension: .gif (Pillow), .mp4 (ffmpeg on PATH), or anything
+else as a directory of PNG frames.
+"""
+import argparse
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.collections import LineCollection
+from matplotlib.figure import Figure
+from PIL import Image
+from .importer import load_lineage
+from .layout import layout_tree
+from .lifespan import LifespanIndex
+from .plot import SIZE, ANGLE, TIME, LabelBatch, lineage_colors, tree_labels, tree_segments
+from .profiling import timed
+
+DIVISION_LABELS = (SIZE, ANGLE, TIME)
+
+
+def frame_times(tree, step=10, start=0, stop=None):
+    """
+    Cutoff times from start to the last division, `step` apart, with the
+    last frame showing the whole tree.
+    """
+    division = np.asarray(tree.data['time'], dtype=np.float64)
+    last = np.nanmax(division) if np.isfinite(division).any() else start
+    stop = last if stop is None else stop
+    return np.arange(start, stop + step, step, dtype=np.float64)
+
+
+@timed
+def appear_times(tree, order=None, time='time', **label_options):
+    """
+    Segments and labels of a laid-out tree with the time each one appears.
+
+    Branches, parent links, names and fates appear when the cell is born;
+    a cell's division connector and its size/angle/time labels appear when
+    it divides. Returns (segments, colors, segment_times, labels,
+    label_times), where labels is the (x, y, texts, style_ids) of a
+    LabelBatch.
+    """
+    if order is None:
+        order = tree.postorder()
+    lifespans = LifespanIndex.from_tree(tree, time)
+    colors = lineage_colors(tree, label_options.pop('color_map', None))
+    segments, segment_colors = tree_segments(tree, colors, order)
+
+    # Same (cell, kind) mask tree_segments applies: connector, branch, link.
+    n = len(tree)
+    kinds = np.stack([tree.first_child >= 0, np.ones(n, dtype=bool), tree.parent >= 0], axis=1)[order]
+    cell = np.repeat(order, 3).reshape(n, 3)[kinds]
+    connector = np.tile([True, False, False], (n, 1))[kinds]
+    segment_times = np.where(connector, lifespans.death[cell], lifespans.birth[cell])
+
+    *labels, owner = tree_labels(tree, order, with_cells=True, **label_options)
+    division = np.isin(labels[3], DIVISION_LABELS)
+    label_times = np.where(division, lifespans.death[owner], lifespans.birth[owner])
+    return segments, segment_colors, segment_times, labels, label_times
+
+
+class FrameRenderer:
+    """
+    One figure holding the whole laid-out tree, redrawn per cutoff time.
+
+    The tree's segments go into one LineCollection and its labels into one
+    LabelBatch; a frame only swaps in the segments that exist by then and
+    masks the labels, so nothing is laid out or re-created per frame. The
+    axes limits stay those of the full tree.
+    """
+
+    def __init__(self, tree, figsize=(12, 6), dpi=100, title="Lineage Tree", **draw_options):
+        self.dpi = dpi
+        self.title = title
+        (self.segments, self.colors, self.segment_times,
+         labels, self.label_times) = appear_times(tree, **draw_options)
+        self.figure = Figure(figsize=figsize)
+        FigureCanvasAgg(self.figure)
+        ax = self.ax = self.figure.subplots()
+        self.lines = LineCollection(self.segments, colors=self.colors,
+                                    capstyle='projecting', joinstyle='round')
+        ax.add_collection(self.lines)
+        self.labels = LabelBatch(*labels)
+        ax.add_artist(self.labels)
+        ax.autoscale_view()
+        ax.get_xaxis().set_visible(False)
+        ax.get_yaxis().set_visible(False)
+        ax.set_title(f"{title}: t = 0 min", fontsize=12)
+        self.figure.tight_layout()
+        ax.set_autoscale_on(False)
+
+    def show(self, t):
+        shown = self.segment_times <= t
+        self.lines.set_segments(self.segments[shown])
+        self.lines.set_color(self.colors[shown])
+        self.labels.set_shown(self.label_times <= t)
+        self.ax.set_title(f"{self.title}: t = {t:g} min", fontsize=12)
+
+    def save(self, t, filename):
+        self.show(t)
+        self.figure.savefig(filename, dpi=self.dpi)
+
+
+def _render_chunk(tree, times, paths, figsize, dpi, options):
+    """Worker: draw the tree once, then write one PNG per time."""
+    renderer = FrameRenderer(tree, figsize=figsize, dpi=dpi, **options)
+    for t, path in zip(times, paths):
+        renderer.save(t, path)
+    return len(paths)
+
+
+@timed
+def render_frames(tree, times, out_dir, figsize=(12, 6), dpi=100, workers=None, progress=None,
+                  **options):
+    """
+    Render one PNG per cutoff time into out_dir (frame_0000.png, ...).
+
+    Frames are split into one contiguous chunk per worker process, so each
+    worker builds the figure once; workers=1 renders in-process.
+    Returns the frame paths in time order.
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    times = [float(t) for t in times]
+    paths = [os.path.join(out_dir, f"frame_{k:04d}.png") for k in range(len(times))]
+    workers = min(workers or os.cpu_count() or 1, max(len(times), 1))
+    if workers == 1:
+        _render_chunk(tree, times, paths, figsize, dpi, options)
+        if progress is not None:
+            progress(len(paths), len(paths))
+        return paths
+    bounds = np.linspace(0, len(times), workers + 1).astype(int).tolist()
+    done = 0
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = [pool.submit(_render_chunk, tree, times[a:b], paths[a:b], figsize, dpi, options)
+                   for a, b in zip(bounds[:-1], bounds[1:]) if b > a]
+        for future in futures:
+            done += future.result()
+            if progress is not None:
+                progress(done, len(paths))
+    return paths
+
+
+def write_gif(paths, filename, fps=4):
+    frames = (Image.open(p).convert('RGB') for p in paths)
+    first = next(frames)
+    first.save(filename, save_all=True, append_images=frames, duration=int(1000 / fps), loop=0)
+
+
+def write_mp4(paths, filename, fps=4, ffmpeg=None):
+    """Encode PNG frames as H.264 by piping them to ffmpeg."""
+    ffmpeg = ffmpeg or shutil.which('ffmpeg')
+    if ffmpeg is None:
+        raise RuntimeError("MP4 export needs ffmpeg on PATH (or write a .gif instead)")
+    cmd = [ffmpeg, '-y', '-loglevel', 'error', '-f', 'image2pipe', '-framerate', str(fps),
+           '-i', '-', '-vf', 'pad=ceil(iw/2)*2:ceil(ih/2)*2', '-c:v', 'libx264',
+           '-pix_fmt', 'yuv420p', filename]
+    with subprocess.Popen(cmd, stdin=subprocess.PIPE) as proc:
+        for p in paths:
+            with open(p, 'rb') as f:
+                proc.stdin.write(f.read())
+        proc.stdin.close()
+        if proc.wait() != 0:
+            raise RuntimeError(f"ffmpeg failed with exit code {proc.returncode}")
+
+
+@timed
+def export_animation(tree, filename, step=10, times=None, fps=4, figsize=(12, 6), dpi=100,
+                     level_height=2, workers=None, progress=None, **options):
+    """
+    Write a time-lapse of `tree` growing.
+
+    Parameters:
+    - tree: a LineageArray whose data['time'] holds division times (as
+      returned by load_lineage or from_dataframe)
+    - filename: .gif, .mp4, or a directory for PNG frames
+    - step, times: cutoff times, every `step` minutes by default
+    - fps: frames per second
+    - figsize, dpi: frame size in inches and resolution
+    - level_height: vertical leaf spacing, as in layout_tree
+    - workers: frame-rendering processes (default: CPU count)
+    - progress: optional callable(done, total)
+    - options: label options of draw_tree (show_sizes, show_times,
+      color_map, search_target, fate_labels, angle_labels)
+
+    Returns the list of cutoff times rendered.
+    """
+    if 'time' not in tree.data:
+        raise ValueError("The tree needs division times (data['time']) to animate")
+    layout_tree(tree, level_height=level_height)
+    times = frame_times(tree, step) if times is None else np.asarray(times, dtype=np.float64)
+    ext = os.path.splitext(filename)[1].lower()
+    if ext == '.mp4' and shutil.which('ffmpeg') is None:
+        raise RuntimeError("MP4 export needs ffmpeg on PATH (or write a .gif instead)")
+    if ext not in ('.gif', '.mp4'):
+        render_frames(tree, times, filename, figsize, dpi, workers, progress, **options)
+        return times.tolist()
+    with tempfile.TemporaryDirectory(prefix='lineageviz-frames-') as tmp:
+        paths = render_frames(tree, times, tmp, figsize, dpi, workers, progress, **options)
+        if ext == '.gif':
+            write_gif(paths, filename, fps)
+        else:
+            write_mp4(paths, filename, fps)
+    return times.tolist()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m lineageviz.animate",
+                                     description="Export a time-lapse of a lineage tree growing.")
+    parser.add_argument('input', help="CSV or JSON division table")
+    parser.add_argument('-o', '--output', default='lineage.gif', help=".gif, .mp4 or a frame directory")
+    parser.add_argument('--step', type=float, default=10, help="minutes between frames")
+    parser.add_argument('--fps', type=float, default=4)
+    parser.add_argument('-j', '--workers', type=int, default=None)
+    parser.add_argument('--dpi', type=int, default=100)
+    parser.add_argument('--size', type=float, nargs=2, default=(12, 6), metavar=('W', 'H'))
+    parser.add_argument('--no-sizes', action='store_true', help="hide size labels")
+    parser.add_argument('--no-times', action='store_true', help="hide division times")
+    args = parser.parse_args(argv)
+
+    started = time.time()
+    tree, _ = load_lineage(args.input)
+
+    def report(done, total):
+        print(f"[{done}/{total}] frames", file=sys.stderr)
+
+    try:
+        times = export_animation(tree, args.output, step=args.step, fps=args.fps,
+                                 figsize=tuple(args.size), dpi=args.dpi, workers=args.workers,
+                                 progress=report, show_sizes=not args.no_sizes,
+                                 show_times=not args.no_times)
+    except (RuntimeError, ValueError) as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 1
+    print(f"Wrote {len(times)} frames to {args.output} in {time.time() - started:.1f}s.", file=sys.stderr)
+    return 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
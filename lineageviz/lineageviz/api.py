@@ -0,0 +1,183 @@
+import argparse
+import contextvars
+import hashlib
+import json
+import os
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from urllib.parse import quote
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from .profiling import timed
+
+DEFAULT_API_BASE = "https://cleavage-api.onrender.com"
+DEFAULT_TTL = 24 * 60 * 60
+DEFAULT_TIMEOUT = (3.05, 15)  # (connect, read) seconds
+DEFAULT_CACHE_DIR = os.path.join(os.path.expanduser('~'), '.cache', 'lineageviz', 'api')
+
+
+class SpeciesUnavailable(Exception):
+    """Raised when a resource is neither reachable nor cached."""
+
+
+class SpeciesClient:
+    """
+    Client for the cleavage species API with a persistent on-disk cache.
+
+    Every response is stored with its ETag. Within `ttl` seconds the cached
+    copy is returned without a request; after that it is revalidated with
+    If-None-Match, so unchanged payloads cost a 304. If the server cannot
+    be reached, the last cached copy is served instead.
+
+    Parameters:
+    - base_url: API root (point it at a local server for testing)
+    - cache_dir: where responses are cached (default ~/.cache/lineageviz/api)
+    - ttl: seconds a cached response is used without revalidation
+    - timeout: requests timeout, seconds or (connect, read)
+    - offline: never touch the network; only cached responses are returned
+    - max_workers: threads (and pooled connections) used by sync_all
+    """
+
+    def __init__(self, base_url=DEFAULT_API_BASE, cache_dir=None, ttl=DEFAULT_TTL,
+                 timeout=DEFAULT_TIMEOUT, offline=False, max_workers=8, session=None):
+        self.base_url = base_url.rstrip('/')
+        self.cache_dir = cache_dir or DEFAULT_CACHE_DIR
+        self.ttl = ttl
+        self.timeout = timeout
+        self.offline = offline
+        self.max_workers = max_workers
+        if session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=1, pool_maxsize=max_workers)
+            session.mount('http://', adapter)
+            session.mount('https://', adapter)
+        self.session = session
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+    # --- Resources ---
+
+    def species(self):
+        """Names of the available species."""
+        return self.get('/species')
+
+    def lineage(self, species):
+        """Division rows of one species (a list of dicts)."""
+        return self.get(f'/species/{quote(species, safe="")}')
+
+    def sync_all(self, names=None, progress=None):
+        """
+        Refresh the species list and every species' lineage concurrently.
+
+        Parameters:
+        - names: species to fetch (default: all listed by the API)
+        - progress: optional callable(done, total, name, error)
+
+        Returns {name: None or the exception raised for it}.
+        """
+        if names is None:
+            names = self.get('/species', refresh=True)
+        results = {}
+        with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+            # Each fetch runs in a copy of the caller's context, so its spans
+            # land in the caller's profiling recording.
+            futures = {pool.submit(contextvars.copy_context().run, self.get,
+                                   f'/species/{quote(n, safe="")}', True): n for n in names}
+            for done, future in enumerate(as_completed(futures), 1):
+                name = futures[future]
+                error = future.exception()
+                results[name] = error
+                if progress is not None:
+                    progress(done, len(futures), name, error)
+        return results
+
+    # --- Transport and cache ---
+
+    @timed
+    def get(self, path, refresh=False):
+        """
+        JSON body of GET base_url + path, through the cache. refresh=True
+        revalidates even if the cached copy is still within its TTL.
+        """
+        entry = self._read(path)
+        if self.offline:
+            if entry is None:
+                raise SpeciesUnavailable(f"{path} is not cached and offline mode is on")
+            return entry['body']
+        if entry is not None and not refresh and time.time() - entry['fetched'] < self.ttl:
+            return entry['body']
+
+        headers = {}
+        if entry is not None and entry.get('etag'):
+            headers['If-None-Match'] = entry['etag']
+        try:
+            response = self.session.get(self.base_url + path, headers=headers, timeout=self.timeout)
+            if response.status_code == 304 and entry is not None:
+                entry['fetched'] = time.time()
+            else:
+                response.raise_for_status()
+                entry = {'etag': response.headers.get('ETag'), 'fetched': time.time(),
+                         'body': response.json()}
+        except (requests.RequestException, ValueError) as e:
+            if entry is not None:
+                return entry['body']  # stale copy beats no data
+            raise SpeciesUnavailable(f"Could not fetch {path}: {e}") from e
+        self._write(path, entry)
+        return entry['body']
+
+    def _path(self, path):
+        key = hashlib.sha256(f"{self.base_url}{path}".encode()).hexdigest()[:32]
+        return os.path.join(self.cache_dir, key + '.json')
+
+    def _read(self, path):
+        try:
+            with open(self._path(path)) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _write(self, path, entry):
+        fd, tmp = tempfile.mkstemp(dir=self.cache_dir, prefix='.tmp-')
+        try:
+            with os.fdopen(fd, 'w') as f:
+                json.dump(entry, f)
+            os.replace(tmp, self._path(path))
+        except BaseException:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+            raise
+
+    def clear(self):
+        """Remove every cached response."""
+        for name in os.listdir(self.cache_dir):
+            if name.endswith('.json'):
+                os.remove(os.path.join(self.cache_dir, name))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Sync the local species cache with the cleavage API.")
+    parser.add_argument('command', choices=['sync', 'list'])
+    parser.add_argument('--base-url', default=DEFAULT_API_BASE)
+    parser.add_argument('--cache-dir', default=None)
+    parser.add_argument('--workers', type=int, default=8)
+    parser.add_argument('--offline', action='store_true')
+    args = parser.parse_args(argv)
+
+    client = SpeciesClient(args.base_url, args.cache_dir, offline=args.offline, max_workers=args.workers)
+    if args.command == 'list':
+        for name in client.species():
+            print(name)
+        return 0
+
+    def report(done, total, name, error):
+        status = "ok" if error is None else f"failed: {error}"
+        print(f"[{done}/{total}] {name} {status}")
+
+    results = client.sync_all(progress=report)
+    return 1 if any(error is not None for error in results.values()) else 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
@@ -0,0 +1,246 @@
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+
+import numpy as np
+from .importer import load_lineage
+from .layout import layout_arrays
+from .profiling import timed
+from .tree import LineageArray
+
+CACHE_VERSION = 2
+DEFAULT_CACHE_DIR = os.path.join(os.path.expanduser('~'), '.cache', 'lineageviz')
+DEFAULT_MAX_BYTES = 512 * 1024 * 1024
+
+_ARRAYS = ('parent', 'length', 'offset', 'name_id', 'x', 'y')
+_SEP = '\0'
+_NONE = '\1'
+
+
+# --- On-disk format ---
+#
+# A tree is a directory of .npy files (one per array, memory-mappable) plus
+# meta.json. Value columns (the name table and object-typed data columns)
+# are stored as a single UTF-8 blob: NUL-separated text when every value is
+# a str or None, JSON otherwise, so numeric names come back as numbers.
+
+@timed
+def save_arrays(tree, path):
+    """Write a LineageArray to directory `path` (replaced atomically)."""
+    parent_dir = os.path.dirname(os.path.abspath(path))
+    os.makedirs(parent_dir, exist_ok=True)
+    tmp = tempfile.mkdtemp(dir=parent_dir, prefix='.tmp-')
+    try:
+        for key in _ARRAYS:
+            np.save(os.path.join(tmp, key + '.npy'), getattr(tree, key))
+        blob, names = _encode_values(tree.names)
+        np.save(os.path.join(tmp, 'names.npy'), blob)
+        columns = {}
+        for key, col in tree.data.items():
+            col = np.asarray(col)
+            if col.dtype == object:
+                blob, columns[key] = _encode_values(col.tolist())
+                np.save(os.path.join(tmp, f'data-{key}.npy'), blob)
+            else:
+                np.save(os.path.join(tmp, f'data-{key}.npy'), col)
+                columns[key] = 'array'
+        with open(os.path.join(tmp, 'meta.json'), 'w') as f:
+            json.dump({'version': CACHE_VERSION, 'cells': len(tree), 'names': names, 'data': columns}, f)
+        if os.path.isdir(path):
+            shutil.rmtree(path)
+        os.replace(tmp, path)
+    except BaseException:
+        shutil.rmtree(tmp, ignore_errors=True)
+        raise
+
+
+@timed
+def load_arrays(path, mmap=True):
+    """
+    Read a LineageArray written by save_arrays.
+
+    With mmap=True the numeric arrays are copy-on-write memory maps: nothing
+    is read until touched, and in-memory edits (e.g. a relayout) never reach
+    the file.
+    """
+    with open(os.path.join(path, 'meta.json')) as f:
+        meta = json.load(f)
+    if meta.get('version') != CACHE_VERSION:
+        raise ValueError(f"Unsupported tree cache version in {path}")
+    mode = 'c' if mmap else None
+    arrays = {key: np.load(os.path.join(path, key + '.npy'), mmap_mode=mode) for key in _ARRAYS}
+    names = _decode_values(np.load(os.path.join(path, 'names.npy')), meta['names'])
+    data = {}
+    for key, kind in meta.get('data', {}).items():
+        col = np.load(os.path.join(path, f'data-{key}.npy'), mmap_mode=None if kind != 'array' else mode)
+        if kind != 'array':
+            values = _decode_values(col, kind)
+            col = np.empty(len(values), dtype=object)
+            col[:] = values
+        data[key] = col
+    return LineageArray(arrays['parent'], arrays['length'], arrays['offset'], arrays['name_id'],
+                        names, x=arrays['x'], y=arrays['y'], data=data)
+
+
+def _encode_values(values):
+    """(uint8 blob, kind) for a list of names or object-column values."""
+    values = [v.item() if isinstance(v, np.generic) else v for v in values]
+    if all(v is None or (isinstance(v, str) and _SEP not in v and v != _NONE) for v in values):
+        return _encode_text(values), 'text'
+    bad = [v for v in values if v is not None and not isinstance(v, (str, int, float))]
+    if bad:
+        raise ValueError(f"Cannot cache names or values that are not str, numbers or None: {bad[0]!r}")
+    text = json.dumps(values)
+    return np.frombuffer(text.encode('utf-8'), dtype=np.uint8), 'json'
+
+
+def _decode_values(blob, kind):
+    if kind == 'json':
+        return json.loads(blob.tobytes().decode('utf-8'))
+    return _decode_text(blob)
+
+
+def _encode_text(values):
+    text = _SEP.join(_NONE if v is None else str(v) for v in values)
+    return np.frombuffer(text.encode('utf-8'), dtype=np.uint8)
+
+
+def _decode_text(blob):
+    if len(blob) == 0:
+        return []
+    return [None if v == _NONE else v for v in blob.tobytes().decode('utf-8').split(_SEP)]
+
+
+@timed
+def file_digest(filename, chunk_size=1 << 20):
+    """SHA-256 of a file's contents, read in chunks."""
+    h = hashlib.sha256()
+    with open(filename, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+class TreeCache:
+    """
+    Size-capped cache of parsed and laid-out lineage trees.
+
+    Entries are keyed by the source file's content hash, its format and the
+    layout parameters, so an edited file or a different level_height never
+    hits a stale entry. Reading an entry memory-maps its arrays instead of
+    parsing and laying out again. When the total size exceeds max_bytes the
+    least recently used entries are removed.
+
+    Parameters:
+    - directory: where entries live (default ~/.cache/lineageviz)
+    - max_bytes: size cap across all entries
+    """
+
+    def __init__(self, directory=None, max_bytes=DEFAULT_MAX_BYTES):
+        self.directory = directory or DEFAULT_CACHE_DIR
+        self.max_bytes = max_bytes
+        os.makedirs(self.directory, exist_ok=True)
+
+    def key(self, filename, level_height=1.5, fmt=None):
+        # Same normalization as load_lineage, so 'csv', '.csv' and 'CSV' share entries
+        ext = '.' + fmt.lower().lstrip('.') if fmt else os.path.splitext(filename)[1].lower()
+        params = f"v{CACHE_VERSION}|{ext}|level_height={float(level_height)!r}"
+        return hashlib.sha256(f"{file_digest(filename)}|{params}".encode()).hexdigest()[:32]
+
+    def _path(self, key):
+        return os.path.join(self.directory, key)
+
+    def get(self, key):
+        """Return the cached tree for `key`, or None."""
+        path = self._path(key)
+        try:
+            tree = load_arrays(path)
+        except (OSError, ValueError):
+            return None
+        os.utime(os.path.join(path, 'meta.json'))  # mark as recently used
+        return tree
+
+    def put(self, key, tree, source=None):
+        path = self._path(key)
+        save_arrays(tree, path)
+        if source is not None:
+            with open(os.path.join(path, 'source'), 'w') as f:
+                f.write(os.path.abspath(source))
+        self.evict()
+
+    @timed
+    def load(self, filename, level_height=1.5, fmt=None):
+        """
+        Return the laid-out LineageArray for `filename`, from the cache when
+        possible; otherwise load, lay out and store it.
+        """
+        key = self.key(filename, level_height, fmt)
+        tree = self.get(key)
+        if tree is None:
+            tree, _ = load_lineage(filename, fmt)
+            layout_arrays(tree, level_height)
+            self.put(key, tree, source=filename)
+        return tree
+
+    def entries(self):
+        """(key, size_bytes, last_used) for every entry, oldest first."""
+        out = []
+        for key in os.listdir(self.directory):
+            path = self._path(key)
+            meta = os.path.join(path, 'meta.json')
+            if key.startswith('.') or not os.path.isfile(meta):
+                continue
+            size = sum(e.stat().st_size for e in os.scandir(path) if e.is_file())
+            out.append((key, size, os.stat(meta).st_mtime))
+        out.sort(key=lambda e: e[2])
+        return out
+
+    def size(self):
+        return sum(size for _, size, _ in self.entries())
+
+    def evict(self, max_bytes=None):
+        """Drop least recently used entries until the cache fits max_bytes."""
+        limit = self.max_bytes if max_bytes is None else max_bytes
+        entries = self.entries()
+        total = sum(size for _, size, _ in entries)
+        for key, size, _ in entries:
+            if total <= limit:
+                break
+            shutil.rmtree(self._path(key), ignore_errors=True)
+            total -= size
+
+    def invalidate(self, filename=None, key=None):
+        """
+        Remove cache entries.
+
+        With `key`, that entry; with `filename`, every entry built from that
+        path (whatever its contents were at the time); with neither, all.
+        """
+        if key is not None:
+            shutil.rmtree(self._path(key), ignore_errors=True)
+            return
+        target = os.path.abspath(filename) if filename is not None else None
+        for key, _, _ in self.entries():
+            if target is not None:
+                try:
+                    with open(os.path.join(self._path(key), 'source')) as f:
+                        if f.read() != target:
+                            continue
+                except OSError:
+                    continue
+            shutil.rmtree(self._path(key), ignore_errors=True)
+
+
+_default_cache = None
+
+
+def load_cached(filename, level_height=1.5, fmt=None, cache=None):
+    """Load and lay out `filename` through the default TreeCache."""
+    global _default_cache
+    if cache is None:
+        if _default_cache is None:
+            _default_cache = TreeCache()
+        cache = _default_cache
+    return cache.load(filename, level_height, fmt)
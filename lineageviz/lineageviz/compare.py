@@ -0,0 +1,402 @@
+"""
+Compare the same species' lineage across many embryos.
+
+    python -m lineageviz.compare embryos/ -o consensus.png --csv cells.csv --workers 8
+
+Every embryo is reduced to a few numbers per cell (in a process pool when
+there are many files), then all embryos are aligned by cell name into one
+dense embryo x cell x feature matrix with NaN where an embryo lacks a cell
+or a cell does not divide. Per-cell statistics are reductions over the
+embryo axis, and the consensus tree is drawn with draw_tree, its branches
+colored by how much a feature varies between embryos.
+"""
+import argparse
+import os
+import sys
+import time
+import warnings
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+from matplotlib import colormaps
+from matplotlib.cm import ScalarMappable
+from matplotlib.colors import Normalize
+from .importer import NAME_COLUMNS, from_dataframe, load_lineage
+from .layout import layout_tree
+from .plot import draw_tree
+from .profiling import timed
+from .tree import LineageArray
+
+FEATURES = ('division_time', 'volume_ratio', 'division_angle')
+# Per-cell columns a worker sends back: the features plus what the
+# consensus tree needs.
+_COLUMNS = FEATURES + ('length', 'sibling_rank')
+_MISSING_COLOR = (0.75, 0.75, 0.75, 1.0)
+
+
+@timed
+def load_embryo(path):
+    """
+    Load one lineage file as a LineageArray. CSV and JSON tables keep their
+    optional division_angle column as a per-cell data column.
+    """
+    ext = os.path.splitext(path)[1].lower()
+    if ext == '.csv':
+        df = pd.read_csv(path, dtype={c: str for c in NAME_COLUMNS}, keep_default_na=False)
+    elif ext == '.json':
+        df = pd.read_json(path, orient='records', dtype={c: str for c in NAME_COLUMNS})
+    else:
+        tree, _ = load_lineage(path)
+        return tree
+    tree, _ = from_dataframe(df)
+    if 'division_angle' in df.columns:
+        angles = df.drop_duplicates('parent').set_index('parent')['division_angle']
+        tree.data['division_angle'] = pd.to_numeric(
+            angles.reindex(tree.cell_names()), errors='coerce').to_numpy(dtype=np.float64)
+    return tree
+
+
+def embryo_features(tree):
+    """
+    Per-cell comparison features of one embryo.
+
+    - division_time: when the cell divides (the tree's 'time' data column,
+      else its branch length, which every importer sets to the absolute
+      division time); NaN for terminal cells
+    - volume_ratio: left / right daughter volume, from the cell's offset
+    - division_angle: the 'division_angle' data column, if any
+
+    Returns (names, parent, values) with values an (n, len(_COLUMNS)) array.
+    """
+    n = len(tree)
+    divides = tree.first_child >= 0
+    offset = np.asarray(tree.offset, dtype=np.float64)
+    values = np.full((n, len(_COLUMNS)), np.nan)
+
+    values[:, 0] = tree.data['time'] if 'time' in tree.data else tree.length
+    with np.errstate(divide='ignore', invalid='ignore'):
+        values[:, 1] = (1 - offset) / offset
+    if 'division_angle' in tree.data:
+        values[:, 2] = tree.data['division_angle']
+    values[~divides, :3] = np.nan
+    values[:, 3] = tree.length
+    values[:, 4] = pd.Series(tree.parent).groupby(tree.parent).cumcount().to_numpy()
+    return tree.cell_names(), np.asarray(tree.parent, dtype=np.int64), values
+
+
+def _load_features(path):
+    """Worker: (path, features or None, error or None); never raises."""
+    try:
+        return path, embryo_features(load_embryo(path)), None
+    except Exception as e:
+        return path, None, f"{type(e).__name__}: {e}"
+
+
+class LineageComparison:
+    """
+    Many embryos of one species aligned by cell name.
+
+    - embryos: one label per embryo (e.g. its file path)
+    - cells: cell names, in order of first appearance
+    - values: (embryos, cells, features) array over FEATURES, NaN where
+      missing
+    - present: (embryos, cells) bool, whether an embryo has the cell
+    - parent: consensus parent per cell (index into cells, -1 for roots),
+      the parent most embryos agree on
+    - length, sibling_rank: (embryos, cells) branch length and position
+      among siblings, for the consensus tree
+    - failed: (path, error) for inputs that could not be loaded
+    """
+
+    def __init__(self, embryos, cells, values, present, parent, length, sibling_rank, failed=None):
+        self.embryos = list(embryos)
+        self.cells = list(cells)
+        self.values = values
+        self.present = present
+        self.parent = parent
+        self.length = length
+        self.sibling_rank = sibling_rank
+        self.failed = list(failed or [])
+        self._index = {name: i for i, name in enumerate(self.cells)}
+
+    @classmethod
+    @timed
+    def from_features(cls, embryos, features, failed=None):
+        """Align (names, parent, values) tuples from embryo_features."""
+        if not features:
+            raise ValueError("No embryos to compare")
+        sizes = np.array([len(names) for names, _, _ in features])
+        starts = np.concatenate(([0], np.cumsum(sizes)[:-1]))
+        codes, cells = pd.factorize(np.concatenate(
+            [np.asarray(names, dtype=object) for names, _, _ in features]))
+        local_parent = np.concatenate([parent for _, parent, _ in features])
+        block = np.concatenate([values for _, _, values in features])
+
+        e, c = len(features), len(cells)
+        embryo = np.repeat(np.arange(e), sizes)
+        parent_code = np.where(local_parent >= 0,
+                               codes[np.repeat(starts, sizes) + np.maximum(local_parent, 0)], -1)
+
+        matrix = np.full((e, c, len(_COLUMNS)), np.nan)
+        matrix[embryo, codes] = block
+        present = np.zeros((e, c), dtype=bool)
+        present[embryo, codes] = True
+        return cls(embryos, cells, matrix[:, :, :len(FEATURES)], present,
+                   _consensus_parent(codes, parent_code, c),
+                   matrix[:, :, len(FEATURES)], matrix[:, :, len(FEATURES) + 1], failed)
+
+    @classmethod
+    def from_trees(cls, trees, labels=None):
+        """Compare LineageArrays already in memory."""
+        trees = list(trees)
+        labels = list(labels) if labels is not None else list(range(len(trees)))
+        return cls.from_features(labels, [embryo_features(tree) for tree in trees])
+
+    @classmethod
+    def from_files(cls, paths, workers=None, progress=None):
+        """
+        Load and align lineage files.
+
+        Parameters:
+        - paths: CSV, JSON or Newick++ files, one embryo each
+        - workers: process count (default: CPU count); 1 loads in-process
+        - progress: optional callable(done, total, path, error)
+
+        Files that fail to load are skipped and listed in .failed.
+        """
+        paths = list(paths)
+        if workers == 1 or len(paths) <= 1:
+            return cls.from_features(*_collect(map(_load_features, paths), len(paths), progress))
+        # Chunks keep the per-task overhead low with thousands of small files
+        chunk = max(1, len(paths) // (4 * (workers or os.cpu_count() or 1)))
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            results = pool.map(_load_features, paths, chunksize=chunk)
+            return cls.from_features(*_collect(results, len(paths), progress))
+
+    def __len__(self):
+        return len(self.embryos)
+
+    def __repr__(self):
+        return f"LineageComparison(embryos={len(self.embryos)}, cells={len(self.cells)})"
+
+    def index_of(self, cell):
+        return self._index[cell]
+
+    def feature(self, name):
+        """(embryos, cells) matrix of one feature."""
+        return self.values[:, :, FEATURES.index(name)]
+
+    def counts(self):
+        """(cells, features) number of embryos with a value."""
+        return np.sum(self.values == self.values, axis=0)
+
+    def mean(self):
+        """(cells, features) mean over embryos, ignoring missing values."""
+        return _nan_reduce(np.nanmean, self.values)
+
+    def variance(self, ddof=1):
+        """(cells, features) variance over embryos (NaN below ddof + 1 values)."""
+        counts = self.counts()
+        var = _nan_reduce(np.nanvar, self.values, ddof=0)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            return np.where(counts > ddof, var * counts / (counts - ddof), np.nan)
+
+    def std(self, ddof=1):
+        return np.sqrt(self.variance(ddof))
+
+    @timed
+    def outlier_scores(self):
+        """
+        (embryos, cells, features) robust z-scores: distance from the
+        per-cell median in units of 1.4826 x the median absolute deviation,
+        falling back to the standard deviation where half the embryos agree
+        exactly. NaN where a value is missing.
+        """
+        median = _nan_reduce(np.nanmedian, self.values)
+        deviation = np.abs(self.values - median)
+        scale = 1.4826 * _nan_reduce(np.nanmedian, deviation)
+        scale = np.where(scale > 0, scale, self.std(ddof=0))
+        with np.errstate(divide='ignore', invalid='ignore'):
+            scores = np.where(scale > 0, deviation / scale, 0.0)
+        return np.where(self.values == self.values, scores, np.nan)
+
+    def outliers(self, threshold=3.5):
+        """DataFrame of (embryo, cell, feature, value, score) above threshold, worst first."""
+        scores = self.outlier_scores()
+        e, c, f = np.nonzero(np.nan_to_num(scores) > threshold)
+        out = pd.DataFrame({
+            'embryo': np.asarray(self.embryos, dtype=object)[e],
+            'cell': np.asarray(self.cells, dtype=object)[c],
+            'feature': np.asarray(FEATURES, dtype=object)[f],
+            'value': self.values[e, c, f],
+            'score': scores[e, c, f],
+        })
+        return out.sort_values('score', ascending=False, kind='stable').reset_index(drop=True)
+
+    def embryo_scores(self):
+        """(embryos,) mean outlier score per embryo, to rank atypical embryos."""
+        return _nan_reduce(np.nanmean, self.outlier_scores().reshape(len(self.embryos), -1), axis=1)
+
+    def summary(self):
+        """One row per cell: embryo count, then mean and std of every feature."""
+        mean, std = self.mean(), self.std()
+        columns = {'cell': self.cells, 'embryos': self.present.sum(axis=0)}
+        for k, name in enumerate(FEATURES):
+            columns[f'{name}_mean'] = mean[:, k]
+            columns[f'{name}_std'] = std[:, k]
+        return pd.DataFrame(columns)
+
+    @timed
+    def consensus_tree(self, min_fraction=0.5):
+        """
+        LineageArray of the cells found in at least `min_fraction` of the
+        embryos, under the consensus parents. Branch lengths are mean branch
+        lengths, offsets follow the mean volume ratio and the data columns
+        hold each feature's mean and std plus the embryo count.
+        """
+        keep = self.present.mean(axis=0) >= min_fraction
+        if not keep.any():
+            raise ValueError(f"No cell is present in {min_fraction:.0%} of the embryos")
+        cells = np.flatnonzero(keep)
+        remap = np.full(len(self.cells), -1, dtype=np.int64)
+        remap[cells] = np.arange(len(cells))
+        parent = self.parent[cells]
+        parent = np.where(parent >= 0, remap[np.maximum(parent, 0)], -1)
+        # Root: the best-attested cell without a kept parent
+        roots = np.flatnonzero(parent < 0)
+        root = int(roots[np.argmax(self.present[:, cells[roots]].sum(axis=0))])
+
+        mean, std = self.mean()[cells], self.std()[cells]
+        ratio = mean[:, FEATURES.index('volume_ratio')]
+        offset = np.where(ratio == ratio, 1 / (1 + ratio), 0.5)
+        data = {'embryos': self.present[:, cells].sum(axis=0)}
+        for k, name in enumerate(FEATURES):
+            data[f'{name}_mean'] = mean[:, k]
+            data[f'{name}_std'] = std[:, k]
+        return LineageArray.from_parent_array(
+            parent, np.nan_to_num(_nan_reduce(np.nanmean, self.length[:, cells])),
+            offset, [self.cells[i] for i in cells.tolist()], root=root, data=data,
+            sibling_key=_nan_reduce(np.nanmean, self.sibling_rank[:, cells]))
+
+    @timed
+    def draw_consensus(self, ax, feature='division_time', statistic='std', min_fraction=0.5,
+                       cmap='viridis', level_height=1.5, colorbar=True, **options):
+        """
+        Draw the consensus tree with each cell's branch colored by how much
+        `feature` varies across embryos.
+
+        Parameters:
+        - ax: matplotlib Axes
+        - feature: one of FEATURES
+        - statistic: 'std', 'variance' or 'cv' (std / |mean|)
+        - min_fraction, level_height: see consensus_tree and layout_tree
+        - cmap, colorbar: colormap name and whether to add a colorbar
+        - options: passed to draw_tree
+
+        Terminal cells (no division values) are drawn gray. Returns the tree.
+        """
+        tree = self.consensus_tree(min_fraction)
+        layout_tree(tree, level_height=level_height)
+        std = tree.data[f'{feature}_std']
+        if statistic == 'std':
+            value = std
+        elif statistic == 'variance':
+            value = std ** 2
+        elif statistic == 'cv':
+            with np.errstate(divide='ignore', invalid='ignore'):
+                value = std / np.abs(tree.data[f'{feature}_mean'])
+        else:
+            raise ValueError(f"Unknown statistic: {statistic}")
+
+        finite = np.isfinite(value)
+        norm = Normalize(value[finite].min(), value[finite].max()) if finite.any() else Normalize(0, 1)
+        colormap = colormaps[cmap]
+        colors = np.tile(_MISSING_COLOR, (len(tree), 1))
+        colors[finite] = colormap(norm(value[finite]))
+        options.setdefault('show_sizes', False)
+        draw_tree(tree, ax, cell_colors=colors, **options)
+        if colorbar:
+            label = f"{feature.replace('_', ' ')} {statistic} across {len(self.embryos)} embryos"
+            ax.figure.colorbar(ScalarMappable(norm=norm, cmap=colormap), ax=ax, label=label)
+        return tree
+
+
+def _collect(results, total, progress):
+    embryos, features, failed = [], [], []
+    for done, (path, result, error) in enumerate(results, 1):
+        if error is None:
+            embryos.append(path)
+            features.append(result)
+        else:
+            failed.append((path, error))
+        if progress is not None:
+            progress(done, total, path, error)
+    return embryos, features, failed
+
+
+def _nan_reduce(func, values, axis=0, **kwargs):
+    # All-NaN slices are expected (terminal cells, absent cells): keep the
+    # NaN result without the RuntimeWarning.
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore', RuntimeWarning)
+        return func(values, axis=axis, **kwargs)
+
+
+def _consensus_parent(codes, parent_code, n):
+    """Most frequent parent per cell (ties: first seen), -1 if always a root."""
+    pairs, first, counts = np.unique(codes * (n + 1) + parent_code + 1,
+                                     return_index=True, return_counts=True)
+    child, parent = pairs // (n + 1), pairs % (n + 1) - 1
+    order = np.lexsort((first, -counts, child))
+    best = order[np.r_[True, child[order][1:] != child[order][:-1]]]
+    out = np.full(n, -1, dtype=np.int64)
+    out[child[best]] = parent[best]
+    return out
+
+
+def main(argv=None):
+    from matplotlib.figure import Figure
+    from .render import find_lineages
+
+    parser = argparse.ArgumentParser(prog="python -m lineageviz.compare",
+                                     description="Compare one species' lineage across embryos.")
+    parser.add_argument('inputs', nargs='+', help="files, directories or glob patterns")
+    parser.add_argument('-o', '--output', default='consensus.png', help="consensus tree image")
+    parser.add_argument('--csv', help="write per-cell statistics to this CSV")
+    parser.add_argument('--outliers', help="write outlier (embryo, cell) values to this CSV")
+    parser.add_argument('--feature', default='division_time', choices=FEATURES)
+    parser.add_argument('--statistic', default='std', choices=('std', 'variance', 'cv'))
+    parser.add_argument('--min-fraction', type=float, default=0.5)
+    parser.add_argument('--threshold', type=float, default=3.5, help="outlier score cut-off")
+    parser.add_argument('-j', '--workers', type=int, default=None)
+    parser.add_argument('--dpi', type=int, default=150)
+    parser.add_argument('--size', type=float, nargs=2, default=(12, 6), metavar=('W', 'H'))
+    args = parser.parse_args(argv)
+
+    paths = find_lineages(args.inputs)
+    if not paths:
+        print("No lineage files found.", file=sys.stderr)
+        return 2
+
+    started = time.time()
+
+    def report(done, total, path, error):
+        if error is not None:
+            print(f"[{done}/{total}] FAILED {path}: {error}", file=sys.stderr)
+
+    comparison = LineageComparison.from_files(paths, workers=args.workers, progress=report)
+    fig = Figure(figsize=tuple(args.size))
+    comparison.draw_consensus(fig.subplots(), args.feature, args.statistic, args.min_fraction)
+    fig.savefig(args.output, dpi=args.dpi, bbox_inches='tight')
+    if args.csv:
+        comparison.summary().to_csv(args.csv, index=False)
+    if args.outliers:
+        comparison.outliers(args.threshold).to_csv(args.outliers, index=False)
+    print(f"Compared {len(comparison)} embryos, {len(comparison.cells)} cells in "
+          f"{time.time() - started:.1f}s ({len(comparison.failed)} failed).", file=sys.stderr)
+    return 1 if comparison.failed else 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
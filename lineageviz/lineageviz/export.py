@@ -1,24 +1,45 @@
-import matplotlib.pyplot as plt
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.figure import Figure
 from .plot import draw_tree
 from .layout import layout_tree
+from .profiling import timed
+from .svg import write_svg
 
-def save_tree_image(tree, filename="tree.png", figsize=(12, 6), dpi=300, **kwargs):
+@timed
+def save_tree_image(tree, filename="tree.png", figsize=(12, 6), dpi=300, fig=None,
+                    streaming_svg=True, **kwargs):
     """
     Save a lineage tree to an image file.
 
     Parameters:
-    - tree: the root Node object
+    - tree: the root Node object (or a LineageArray)
     - filename: output file path (e.g., 'tree.png', 'tree.svg')
     - figsize: size of the figure in inches
     - dpi: resolution (for raster formats like PNG)
+    - fig: optional Figure to draw into; it is cleared first, so batch jobs
+      can reuse one figure instead of creating one per tree
+    - streaming_svg: write .svg files with svg.write_svg rather than
+      matplotlib (far faster and smaller for large trees)
     - kwargs: passed to draw_tree (e.g., show_sizes=True)
+
+    Uses the object-oriented Agg canvas, not pyplot, so it is safe to call
+    from worker processes and threads.
     """
     layout_tree(tree, level_height=2)
+    if streaming_svg and str(filename).lower().endswith('.svg'):
+        write_svg(tree, filename, width=figsize[0] * 72, height=figsize[1] * 72, **kwargs)
+        return
 
-    fig, ax = plt.subplots(figsize=figsize)
+    if fig is None:
+        fig = Figure(figsize=figsize)
+    else:
+        fig.clear()
+        fig.set_size_inches(figsize)
+    if not isinstance(fig.canvas, FigureCanvasAgg):
+        FigureCanvasAgg(fig)
+    ax = fig.subplots()
     draw_tree(tree, ax, **kwargs)
     ax.get_yaxis().set_visible(False)
     ax.set_title("Lineage Tree", fontsize=12)
-    plt.tight_layout()
-    plt.savefig(filename, dpi=dpi)
-    plt.close()
\ No newline at end of file
+    fig.tight_layout()
+    fig.savefig(filename, dpi=dpi)
@@ -1,83 +1,452 @@
 import csv
-from .tree import Node
+import json
+import os
+
+import numpy as np
+import pandas as pd
+from .parser import iter_newick_plusplus
+from .profiling import timed
+from .tree import LineageArray
+
+
+class ImportReport:
+    """
+    Problems found while building a lineage from division rows.
+
+    - rows: number of division rows read
+    - roots: cells that never appear as a daughter (in-degree 0)
+    - root: the root of the returned tree
+    - duplicate_parents: cells with more than one division row (first kept)
+    - multiple_parents: cells listed as a daughter more than once (first kept)
+    - cycles: lists of cells whose parent links form a loop
+    - orphans: cells not reachable from the returned root
+    - non_positive_volumes: row numbers with a daughter volume <= 0
+    - bad_rows: (row number, error) for rows that could not be parsed
+    """
+
+    def __init__(self):
+        self.rows = 0
+        self.roots = []
+        self.root = None
+        self.duplicate_parents = []
+        self.multiple_parents = []
+        self.cycles = []
+        self.orphans = []
+        self.non_positive_volumes = []
+        self.bad_rows = []
+
+    @property
+    def ok(self):
+        return (len(self.roots) == 1 and not self.duplicate_parents and not self.multiple_parents
+                and not self.cycles and not self.orphans and not self.non_positive_volumes
+                and not self.bad_rows)
+
+    def __repr__(self):
+        return (f"ImportReport(rows={self.rows}, root={self.root}, roots={len(self.roots)}, "
+                f"duplicate_parents={len(self.duplicate_parents)}, "
+                f"multiple_parents={len(self.multiple_parents)}, cycles={len(self.cycles)}, "
+                f"orphans={len(self.orphans)}, "
+                f"non_positive_volumes={len(self.non_positive_volumes)}, "
+                f"bad_rows={len(self.bad_rows)})")
+
+
+NAME_COLUMNS = ('parent', 'left_child', 'right_child')
+NUMBER_COLUMNS = ('time', 'left_volume', 'right_volume')
+
+
+# --- Column-wise builder ---
+
+@timed
+def from_columns(parent, left, right, time, left_volume, right_volume, fate=None,
+                 skip_non_positive=False, report=None, row_numbers=None):
+    """
+    Build a lineage tree from division columns in one vectorized pass.
+
+    Names are factorized once, so rows may arrive in any order; parent and
+    daughter indices are then resolved with array joins. A cell's branch
+    length is its division time if it divides and its volume otherwise; its
+    offset is right_volume / (left_volume + right_volume).
+
+    Parameters:
+    - parent, left, right: cell names, one per division row
+    - time, left_volume, right_volume: numeric columns
+    - fate: optional fate of both daughters per row (None or '' for none)
+    - skip_non_positive: drop rows with a volume <= 0 instead of keeping them
+    - report: ImportReport to fill in (e.g. one already holding bad rows)
+    - row_numbers: source row number per entry, for the report (default 1..n)
+
+    Returns (LineageArray, ImportReport). The tree is rooted at the ancestor
+    of the first row's parent; daughters keep their left/right order.
+    """
+    codes, names = pd.factorize(np.stack([np.asarray(c, dtype=object) for c in (parent, left, right)],
+                                         axis=1).ravel())
+    return _from_codes(codes.reshape(-1, 3), np.asarray(names, dtype=object), time, left_volume,
+                       right_volume, fate, skip_non_positive, report, row_numbers)
+
+
+def _from_codes(codes, names, time, left_volume, right_volume, fate=None, skip_non_positive=False,
+                report=None, row_numbers=None):
+    """
+    from_columns for rows whose (parent, left, right) names are given as
+    an (m, 3) array of codes into `names`, numbered in order of first
+    appearance.
+    """
+    report = ImportReport() if report is None else report
+    columns = [np.asarray(codes, dtype=np.int64).reshape(-1, 3)]
+    columns += [np.asarray(c, dtype=np.float64) for c in (time, left_volume, right_volume)]
+    if fate is not None:
+        columns.append(np.asarray(fate, dtype=object))
+    rows = (np.arange(1, len(columns[0]) + 1) if row_numbers is None
+            else np.asarray(row_numbers, dtype=np.int64))
+    report.rows += len(rows)
+
+    non_positive = ~((columns[2] > 0) & (columns[3] > 0))
+    report.non_positive_volumes = rows[non_positive].tolist()
+    if skip_non_positive and non_positive.any():
+        columns = [c[~non_positive] for c in columns]
+        # Renumber cells in order of first appearance among the rows left.
+        codes, first_seen = pd.factorize(columns[0].ravel())
+        columns[0] = codes.reshape(-1, 3)
+        names = names[first_seen]
+    if len(columns[0]) == 0:
+        raise ValueError("No division rows found")
+    codes, time, left_volume, right_volume = columns[:4]
+    fate = columns[4] if fate is not None else None
+    m = len(codes)
+
+    # Only the first division row of a parent counts; the daughters of the
+    # others are not cells at all unless they are named elsewhere.
+    kept = ~pd.Series(codes[:, 0]).duplicated().to_numpy()
+    report.duplicate_parents = names[codes[~kept, 0]].tolist()
+    used = np.zeros(len(names), dtype=bool)
+    used[codes[:, 0]] = True
+    used[codes[kept, 1:].ravel()] = True
+    if not used.all():
+        codes = (np.cumsum(used) - 1)[codes]
+        names = names[used]
+    names = names.tolist()
+    n = len(names)
+
+    p = codes[kept, 0]
+    total = left_volume[kept] + right_volume[kept]
+    cell_time = np.full(n, np.nan)
+    cell_time[p] = time[kept]
+    offset = np.full(n, 0.5)
+    offset[p] = np.where(total > 0, right_volume[kept] / np.where(total > 0, total, 1), 0.5)
+
+    # Daughter entries, interleaved left/right in row order. A daughter keeps
+    # its first parent; later claims (and self-loops) are reported.
+    child = codes[kept, 1:].ravel()
+    child_parent = np.repeat(p, 2)
+    loop = child == child_parent
+    accepted = ~loop
+    accepted[accepted] = ~pd.Series(child[accepted]).duplicated().to_numpy()
+    report.multiple_parents = [names[c] for c in child[~accepted].tolist()]
+    child, entry = child[accepted], np.flatnonzero(accepted)
+    parent_of = np.full(n, -1, dtype=np.int64)
+    parent_of[child] = child_parent[accepted]
+    volume = np.full(n, np.nan)
+    volume[child] = np.stack([left_volume[kept], right_volume[kept]], axis=1).ravel()[accepted]
+    sibling_key = np.zeros(n, dtype=np.int64)
+    sibling_key[child] = entry
+    length = np.where(cell_time == cell_time, cell_time, np.where(parent_of >= 0, volume, 0.0))
+
+    report.roots = [names[i] for i in np.flatnonzero(parent_of < 0).tolist()]
+    report.cycles = [[names[i] for i in cycle] for cycle in _cycles(parent_of)]
+
+    # Walk up from the first row's parent; a repeat means a cycle, in which
+    # case that parent is used as root and the loop is cut there.
+    root = int(codes[0, 0])
+    seen = {root}
+    while parent_of[root] >= 0 and parent_of[root] not in seen:
+        root = int(parent_of[root])
+        seen.add(root)
+    report.root = names[root]
+
+    data = {'volume': volume, 'time': cell_time}
+    if fate is not None:
+        fate = np.stack([fate[kept], fate[kept]], axis=1).ravel()[accepted]
+        given = pd.notna(fate) & (fate != '')
+        if given.any():
+            data['fate'] = np.full(n, None, dtype=object)
+            data['fate'][child[given]] = fate[given]
+    tree = LineageArray.from_parent_array(parent_of, length, offset, names, root=root,
+                                          data=data, sibling_key=sibling_key)
+    if len(tree) < n:
+        reached = set(tree.names)
+        report.orphans = [name for name in names if name not in reached]
+    return tree, report
+
+
+def _cycles(parent):
+    """Cells on parent-link loops, one list per loop."""
+    # After 2**k >= n pointer-jumping steps every cell above a root has
+    # reached -1; whatever is left landed on a loop.
+    up = parent.copy()
+    for _ in range(max(1, len(parent).bit_length())):
+        up = np.where(up >= 0, up[np.maximum(up, 0)], -1)
+    cycles, on_cycle = [], set()
+    for start in np.unique(up[up >= 0]).tolist():
+        if start in on_cycle:
+            continue
+        cycle = [start]
+        cell = int(parent[start])
+        while cell != start:
+            cycle.append(cell)
+            cell = int(parent[cell])
+        on_cycle.update(cycle)
+        cycles.append(cycle)
+    return cycles
+
+
+@timed
+def from_dataframe(df, skip_non_positive=False):
+    """
+    Build a lineage tree from a DataFrame of division rows.
+
+    Rows with a missing cell name or a non-numeric time or volume are
+    reported as bad rows and skipped; an optional 'fate' column labels both
+    daughters. See from_columns for the other parameters.
+
+    Returns (LineageArray, ImportReport).
+    """
+    report = ImportReport()
+    names, numbers, fate, rows = _checked_columns(df, report)
+    return from_columns(*names, *numbers, fate=fate, skip_non_positive=skip_non_positive,
+                        report=report, row_numbers=rows)
 
-def load_tree_from_csv(filename):
-    nodes = {}
-    structure = []
 
+def _checked_columns(df, report, first_row=1):
+    """
+    The valid rows of a division DataFrame as (name columns, number
+    columns, fate column or None, row numbers); the others go to
+    report.bad_rows, numbered from first_row.
+    """
+    missing = [c for c in NAME_COLUMNS + NUMBER_COLUMNS if c not in df.columns]
+    if missing:
+        raise ValueError(f"Missing columns: {', '.join(missing)}")
+    names = [df[c].to_numpy(dtype=object) for c in NAME_COLUMNS]
+    numbers = [pd.to_numeric(df[c], errors='coerce').to_numpy(dtype=np.float64)
+               for c in NUMBER_COLUMNS]
+    problems = [(~_present(col), f"missing {c}") for c, col in zip(NAME_COLUMNS, names)]
+    problems += [(col != col, f"invalid {c}") for c, col in zip(NUMBER_COLUMNS, numbers)]
+    good = ~np.logical_or.reduce([bad for bad, _ in problems])
+    rows = np.arange(first_row, first_row + len(df))
+    for i in np.flatnonzero(~good).tolist():
+        report.bad_rows.append((int(rows[i]), next(reason for bad, reason in problems if bad[i])))
+    fate = df['fate'].to_numpy(dtype=object)[good] if 'fate' in df.columns else None
+    return [col[good] for col in names], [col[good] for col in numbers], fate, rows[good]
+
+
+def _present(names):
+    return pd.notna(names) & (names != '')
+
+
+CHUNK_ROWS = 1 << 14
+
+
+class LineageBuilder:
+    """
+    Collect division rows, then build the tree column-wise with
+    from_columns. Each row names a parent, its two daughters, the division
+    time and the daughter volumes.
+
+    Rows are stored a chunk at a time as typed arrays: cell and fate names
+    become integer codes into one name table, so memory grows by a few
+    dozen bytes per row instead of by a Python object per value. Single
+    rows (add, add_row) are buffered until chunk_size of them are pending.
+    """
+
+    def __init__(self, chunk_size=CHUNK_ROWS):
+        self.chunk_size = chunk_size
+        self.report = ImportReport()
+        self._seen = 0
+        self._names = {}   # cell name -> code, in order of first appearance
+        self._fates = {}   # fate -> code
+        self._chunks = []  # (codes, numbers, fate codes, row numbers) per chunk
+        self._pending = []
+
+    def add(self, parent, left, right, time, left_volume, right_volume, fate=None):
+        """Add one division row."""
+        self._seen += 1
+        self._pending.append((parent, left, right, time, left_volume, right_volume, fate, self._seen))
+        if len(self._pending) >= self.chunk_size:
+            self._flush()
+
+    def add_row(self, row):
+        """Add a division from a mapping with the standard column names."""
+        try:
+            values = (row['parent'], row['left_child'], row['right_child'],
+                      float(row['time']), float(row['left_volume']), float(row['right_volume']))
+            if not all(name is not None and name != '' for name in values[:3]):
+                raise ValueError("missing cell name")
+        except (KeyError, TypeError, ValueError) as e:
+            self._seen += 1
+            self.report.bad_rows.append((self._seen, repr(e)))
+            return
+        self.add(*values, fate=row.get('fate') or None)
+
+    def add_rows(self, rows):
+        for row in rows:
+            self.add_row(row)
+        return self
+
+    def add_frame(self, df):
+        """Add a DataFrame of division rows (e.g. one pd.read_csv chunk)."""
+        self._flush()
+        names, numbers, fate, rows = _checked_columns(df, self.report, self._seen + 1)
+        self._seen += len(df)
+        self._store(names, numbers, fate, rows)
+        return self
+
+    def _flush(self):
+        if not self._pending:
+            return
+        columns = list(zip(*self._pending))
+        self._pending = []
+        self._store([np.asarray(c, dtype=object) for c in columns[:3]],
+                    [np.asarray(c, dtype=np.float64) for c in columns[3:6]],
+                    np.asarray(columns[6], dtype=object), np.asarray(columns[7], dtype=np.int64))
+
+    def _store(self, names, numbers, fate, rows):
+        if len(rows) == 0:
+            return
+        codes = _encode(np.stack(names, axis=1).ravel(), self._names).reshape(-1, 3)
+        fate_codes = np.full(len(rows), -1, dtype=np.int32)
+        if fate is not None:
+            given = _present(fate)
+            fate_codes[given] = _encode(fate[given], self._fates)
+        self._chunks.append((codes, np.stack(numbers, axis=1), fate_codes, rows))
+
+    @timed
+    def finish(self, skip_non_positive=False):
+        """Return (LineageArray, ImportReport); see from_columns."""
+        self._flush()
+        if not self._chunks:
+            raise ValueError("No division rows found")
+        codes, numbers, fate_codes, rows = (np.concatenate(c) for c in zip(*self._chunks))
+        fate = None
+        if (fate_codes >= 0).any():
+            # Index -1 (no fate) picks the trailing None
+            fate = np.array(list(self._fates) + [None], dtype=object)[fate_codes]
+        names = np.empty(len(self._names), dtype=object)
+        names[:] = list(self._names)
+        # The builder is spent: free its tables before the tree is built
+        self._chunks, self._names, self._fates = [], {}, {}
+        return _from_codes(codes, names, *numbers.T, fate=fate, skip_non_positive=skip_non_positive,
+                           report=self.report, row_numbers=rows)
+
+
+def _encode(values, table):
+    """Codes of `values` in `table` (a dict), adding new values in order."""
+    local, uniques = pd.factorize(values)
+    lookup = np.fromiter((table.setdefault(u, len(table)) for u in uniques.tolist()),
+                         dtype=np.int32, count=len(uniques))
+    return lookup[local]
+
+
+# --- Streaming readers ---
+
+def iter_csv_rows(filename):
+    """Yield division rows from a CSV file one at a time."""
     with open(filename, newline='') as csvfile:
-        reader = csv.DictReader(csvfile)
-        for row in reader:
-            parent = row['parent']
-            left = row['left_child']
-            right = row['right_child']
-            time = float(row['time'])
-            left_vol = float(row['left_volume'])
-            right_vol = float(row['right_volume'])
-            total_vol = left_vol + right_vol
-
-            # Automatically calculate offset based on volume
-            offset = right_vol / (left_vol + right_vol) if (left_vol + right_vol) > 0 else 0.5
-
-            # Create child nodes with length = volume
-            left_node = Node(name=left, length=left_vol, offset=0.5)
-            right_node = Node(name=right, length=right_vol, offset=0.5)
-            nodes[left] = left_node
-            nodes[right] = right_node
-
-            structure.append((parent, left_node, right_node, time, offset))
-
-    # Build tree from bottom-up
-    for parent, left, right, time, offset in reversed(structure):
-        if parent in nodes:
-            parent_node = nodes[parent]
-        else:
-            parent_node = Node(name=parent)
-            nodes[parent] = parent_node
-
-        parent_node.length = time
-        parent_node.offset = offset
-        parent_node.children = [left, right]
-
-    return nodes[structure[0][0]]
+        yield from csv.DictReader(csvfile)
 
-import json
-from .tree import Node
 
-def load_tree_from_json(filename):
+def iter_csv_chunks(filename, chunk_size=CHUNK_ROWS):
+    """Yield a CSV division table as DataFrames of up to chunk_size rows."""
+    with pd.read_csv(filename, chunksize=chunk_size, dtype={c: str for c in NAME_COLUMNS},
+                     keep_default_na=False) as chunks:
+        yield from chunks
+
+
+def iter_json_rows(filename, chunk_size=1 << 20):
+    """
+    Yield division rows from a JSON array of objects without loading the
+    whole file: the text is read in chunks and objects are decoded as soon
+    as they are complete.
+    """
+    decoder = json.JSONDecoder()
     with open(filename, 'r') as f:
-        data = json.load(f)
+        buf = ''
+        pos = 0
+        started = False
+        eof = False
+        while True:
+            # Skip separators between array items.
+            while pos < len(buf) and buf[pos] in ' \t\r\n,[]':
+                if buf[pos] == '[':
+                    started = True
+                pos += 1
+            if pos < len(buf):
+                if not started:
+                    raise ValueError("Expected a JSON array of division rows")
+                try:
+                    row, end = decoder.raw_decode(buf, pos)
+                except json.JSONDecodeError:
+                    if eof:
+                        raise
+                else:
+                    yield row
+                    pos = end
+                    continue
+            if eof:
+                return
+            chunk = f.read(chunk_size)
+            eof = not chunk
+            buf = buf[pos:] + chunk
+            pos = 0
 
-    nodes = {}
-    structure = []
 
-    for row in data:
-        parent = row['parent']
-        left = row['left_child']
-        right = row['right_child']
-        time = float(row['time'])
-        left_vol = float(row['left_volume'])
-        right_vol = float(row['right_volume'])
-        total_vol = left_vol + right_vol
+def _read_csv(builder, filename):
+    for df in iter_csv_chunks(filename):
+        builder.add_frame(df)
 
-        offset = right_vol / (left_vol + right_vol) if (left_vol + right_vol) > 0 else 0.5
 
-        left_node = Node(name=left, length=left_vol, offset=0.5)
-        right_node = Node(name=right, length=right_vol, offset=0.5)
-        nodes[left] = left_node
-        nodes[right] = right_node
+def _read_json(builder, filename):
+    builder.add_rows(iter_json_rows(filename))
 
-        structure.append((parent, left_node, right_node, time, offset))
 
-    for parent, left, right, time, offset in reversed(structure):
-        if parent in nodes:
-            parent_node = nodes[parent]
-        else:
-            parent_node = Node(name=parent)
-            nodes[parent] = parent_node
+# Extension -> function feeding a file to a LineageBuilder
+READERS = {
+    '.csv': _read_csv,
+    '.json': _read_json,
+}
+NEWICK_EXTENSIONS = ('.nwk', '.newick', '.tree')
 
-        parent_node.length = time
-        parent_node.offset = offset
-        parent_node.children = [left, right]
 
-    return nodes[structure[0][0]]
\ No newline at end of file
+@timed
+def load_lineage(filename, fmt=None):
+    """
+    Stream a CSV or JSON division table, or the first tree of a Newick++
+    file, into a LineageArray.
+
+    Parameters:
+    - filename: path to the lineage file
+    - fmt: 'csv', 'json' or 'nwk'; inferred from the file extension if omitted
+
+    Returns (tree, report); see ImportReport for what is checked.
+    """
+    ext = '.' + fmt.lower().lstrip('.') if fmt else os.path.splitext(filename)[1].lower()
+    if ext in NEWICK_EXTENSIONS:
+        for tree in iter_newick_plusplus(filename, as_array=True):
+            report = ImportReport()
+            report.root = tree.name(0)
+            report.roots = [report.root]
+            return tree, report
+        raise ValueError(f"No tree found in {filename}")
+    if ext not in READERS:
+        raise ValueError(f"Unsupported lineage format: {ext or filename}")
+    builder = LineageBuilder()
+    READERS[ext](builder, filename)
+    return builder.finish()
+
+
+def load_tree_from_csv(filename):
+    tree, _ = load_lineage(filename, 'csv')
+    return tree.to_node()
+
+
+def load_tree_from_json(filename):
+    tree, _ = load_lineage(filename, 'json')
+    return tree.to_node()
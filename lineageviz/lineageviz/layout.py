@@ -1,26 +1,285 @@
+import numpy as np
+from .profiling import timed
+from .tree import LineageArray, NodeView, flatten
+
+
+@timed
 def layout_tree(node, level_height=1.5):
-    y_counter = [0]  # mutable so it can increment across recursion
-
-    def recurse(n, x_start):
-        if not n.children:
-            n.x = x_start + n.length
-            n.y = y_counter[0] * level_height
-            y_counter[0] += 1
-            return n.y, n.y, n.x
-
-        child_positions = []
-        max_x = x_start + n.length
-        for child in n.children:
-            y_top, y_bot, child_x = recurse(child, x_start + n.length)
-            center_y = (y_top + y_bot) / 2
-            child_positions.append(center_y)
-            max_x = max(max_x, child_x)
-
-        y_top = max(child_positions)
-        y_bot = min(child_positions)
-        n.x = x_start
-        n.y = (1 - n.offset) * y_top + n.offset * y_bot
-
-        return y_top, y_bot, max_x
-
-    recurse(node, 0)
\ No newline at end of file
+    """
+    Assign plotting coordinates to every cell of a lineage tree.
+
+    x is the cumulative branch length from the root (leaves extend to the end
+    of their own branch), leaves are stacked level_height apart in preorder and
+    an internal cell sits at an offset-weighted blend of its children's extent.
+
+    Accepts a Node tree (x/y are written onto the nodes) or a LineageArray
+    (x/y arrays are filled in place). The sweep is iterative, so arbitrarily
+    deep lineages do not hit the recursion limit.
+    """
+    if isinstance(node, LineageArray):
+        return layout_arrays(node, level_height)
+    if isinstance(node, NodeView) and node.index == 0:
+        return layout_arrays(node.tree, level_height)
+
+    nodes, parent = flatten(node)
+    x, y = _layout(np.asarray(parent, dtype=np.int64),
+                   np.asarray([n.length for n in nodes], dtype=np.float64),
+                   np.asarray([n.offset for n in nodes], dtype=np.float64),
+                   level_height)
+    for n, xi, yi in zip(nodes, x.tolist(), y.tolist()):
+        n.x = xi
+        n.y = yi
+
+
+@timed
+def layout_arrays(tree, level_height=1.5):
+    """Lay out a LineageArray in place; same coordinates as layout_tree."""
+    tree.x, tree.y = _layout(tree.parent, tree.length, tree.offset, level_height)
+    return tree
+
+
+def _layout(parent, length, offset, level_height, full=False):
+    """
+    Compute (x, y) for cells stored in preorder; with full=True also the
+    per-cell x_start and child-extent center (see IncrementalLayout).
+
+    Sibling subtrees cover increasing, disjoint leaf ranges, so the highest
+    and lowest child centers of a cell are those of its last and first child
+    (reversed when level_height is negative). That turns the max/min over
+    children into two lookups per cell in a single bottom-up sweep, batched
+    by depth level when the tree is wide enough.
+    """
+    n = len(parent)
+    parent = np.asarray(parent, dtype=np.int64)
+    levels = _depth_levels(parent)
+
+    # x_start of a cell is its parent's x_start plus the parent's length,
+    # accumulated root-down in the same order as the recursive walk.
+    start = np.zeros(n)
+    if levels is not None:
+        for cells in levels[1:]:
+            p = parent[cells]
+            start[cells] = start[p] + length[p]
+    else:
+        parent_list = parent.tolist()
+        length_list = length.tolist()
+        s = start.tolist()
+        for i in range(1, n):
+            p = parent_list[i]
+            s[i] = s[p] + length_list[p]
+        start = np.asarray(s)
+
+    first_child = np.full(n, -1, dtype=np.int64)
+    last_child = np.full(n, -1, dtype=np.int64)
+    if n > 1:
+        idx = np.arange(1, n)
+        first = parent[1:] == idx - 1
+        first_child[idx[first] - 1] = idx[first]
+        # The last child of a cell is the child with no later sibling: the
+        # next cell with the same parent would start before its subtree ends.
+        last = np.ones(n, dtype=bool)
+        last[0] = False
+        order = np.argsort(parent, kind="stable")
+        same = parent[order[1:]] == parent[order[:-1]]
+        last[order[:-1][same]] = False
+        last_child[parent[last]] = np.flatnonzero(last)
+    leaf = first_child < 0
+
+    x = np.where(leaf, start + length, start)
+
+    center = np.where(leaf, (np.cumsum(leaf) - 1) * level_height, 0.0)
+    high, low = (last_child, first_child) if level_height >= 0 else (first_child, last_child)
+
+    internal = np.flatnonzero(~leaf)[::-1]
+    if levels is not None:
+        for cells in reversed(levels):
+            cells = cells[~leaf[cells]]
+            center[cells] = (center[high[cells]] + center[low[cells]]) / 2
+    else:
+        c = center.tolist()
+        for i, h, l in zip(internal.tolist(), high[internal].tolist(), low[internal].tolist()):
+            c[i] = (c[h] + c[l]) / 2
+        center = np.asarray(c)
+
+    y = center.copy()
+    y_top = center[high[internal]]
+    y_bot = center[low[internal]]
+    y[internal] = (1 - offset[internal]) * y_top + offset[internal] * y_bot
+    if full:
+        return x, y, start, center
+    return x, y
+
+
+class IncrementalLayout:
+    """
+    Keep a laid-out LineageArray current while divisions are edited.
+
+    A full layout stores each cell's x_start and child-extent center. An
+    edit then only touches what it can move:
+    - the edited cell's own subtree (x_start of its descendants),
+    - the ancestor path of the edited cell (centers, then y),
+    - cells after it in preorder, whose leaves all move by the same number
+      of leaf slots, so their centers shift by a constant and their y is
+      re-blended from the shifted centers in one array operation.
+    Cells before the edit point that are not ancestors are not touched.
+
+    The coordinates match a full layout_arrays run exactly whenever
+    multiples of level_height are exact in floating point (e.g. 1.5 or 2);
+    otherwise they agree up to rounding.
+
+    Structural edits (divide, undivide) replace `tree` with a new
+    LineageArray, since cells are stored in preorder.
+    """
+
+    def __init__(self, tree, level_height=1.5):
+        self.level_height = level_height
+        self.tree = tree
+        tree.x, tree.y, self.start, self.center = _layout(tree.parent, tree.length, tree.offset,
+                                                          level_height, full=True)
+
+    def _high_low(self):
+        tree = self.tree
+        if self.level_height >= 0:
+            return tree.last_child, tree.first_child
+        return tree.first_child, tree.last_child
+
+    def _apply(self, lo, hi):
+        """Write x/y of cells [lo, hi) from the stored start and center."""
+        tree = self.tree
+        cells = np.arange(lo, hi)
+        leaf = tree.first_child[cells] < 0
+        tree.x[cells] = np.where(leaf, self.start[cells] + tree.length[cells], self.start[cells])
+        high, low = self._high_low()
+        inner = cells[~leaf]
+        y = self.center[cells]
+        y[~leaf] = ((1 - tree.offset[inner]) * self.center[high[inner]]
+                    + tree.offset[inner] * self.center[low[inner]])
+        tree.y[cells] = y
+
+    def _starts(self, cell):
+        """Recompute x_start below `cell`, root-down within its subtree."""
+        tree = self.tree
+        end = tree.subtree_end_of(cell)
+        parent = tree.parent[cell + 1:end].astype(np.int64)
+        levels = _depth_levels(np.concatenate(([-1], parent - cell))) if end - cell > 1 else []
+        start, length = self.start, tree.length
+        if levels is not None:
+            for cells in levels[1:]:
+                cells = cells + cell
+                p = tree.parent[cells]
+                start[cells] = start[p] + length[p]
+        else:
+            for i, p in zip(range(cell + 1, end), parent.tolist()):
+                start[i] = start[p] + length[p]
+
+    def _ancestors(self, cell):
+        """Recompute centers and y along the path from `cell` to the root."""
+        tree = self.tree
+        high, low = self._high_low()
+        i = int(tree.parent[cell]) if cell > 0 else -1
+        while i >= 0:
+            self.center[i] = (self.center[high[i]] + self.center[low[i]]) / 2
+            self._apply(i, i + 1)
+            i = int(tree.parent[i])
+
+    def _leaf_rank(self, cell):
+        return int(np.count_nonzero(self.tree.first_child[:cell] < 0))
+
+    def _shift_after(self, end, slots):
+        """Move every cell from `end` on by `slots` leaf positions."""
+        if slots:
+            self.center[end:] += slots * self.level_height
+        self._apply(end, len(self.tree))
+
+    def update(self, cell, length=None, offset=None):
+        """Change a cell's branch length and/or offset."""
+        tree = self.tree
+        if offset is not None:
+            tree.offset[cell] = offset
+        if length is not None:
+            tree.length[cell] = length
+            self._starts(cell)
+            self._apply(cell, tree.subtree_end_of(cell))
+        else:
+            self._apply(cell, cell + 1)
+        return tree
+
+    def divide(self, cell, names, length, offset, cell_length=None, cell_offset=None):
+        """
+        Give a leaf `cell` new daughters (names, lengths and offsets per
+        daughter); optionally set the cell's own length (division time) and
+        offset. Returns the new tree.
+        """
+        old = self.tree
+        if old.first_child[cell] >= 0:
+            raise ValueError(f"Cell {old.name(cell)} already divides")
+        k = len(names)
+        rank = self._leaf_rank(cell)
+        tree = self.tree = old.insert_children(cell, names, length, offset)
+        if cell_length is not None:
+            tree.length[cell] = cell_length
+        if cell_offset is not None:
+            tree.offset[cell] = cell_offset
+
+        h = self.level_height
+        self.start = np.insert(self.start, cell + 1, np.zeros(k))
+        self.center = np.insert(self.center, cell + 1, (rank + np.arange(k)) * h)
+        self._starts(cell)
+        high, low = self._high_low()
+        self.center[cell] = (self.center[high[cell]] + self.center[low[cell]]) / 2
+        self._apply(cell, cell + 1 + k)
+        self._shift_after(cell + 1 + k, k - 1)
+        self._ancestors(cell)
+        return tree
+
+    def undivide(self, cell, cell_length=None):
+        """
+        Remove every descendant of `cell`, which becomes a leaf again
+        (optionally with a new length). Returns the new tree.
+        """
+        old = self.tree
+        end = old.subtree_end_of(cell)
+        removed_leaves = int(np.count_nonzero(old.first_child[cell:end] < 0))
+        rank = self._leaf_rank(cell)
+        tree = self.tree = old.remove_descendants(cell)
+        if cell_length is not None:
+            tree.length[cell] = cell_length
+
+        self.start = np.delete(self.start, np.s_[cell + 1:end])
+        self.center = np.delete(self.center, np.s_[cell + 1:end])
+        self.center[cell] = rank * self.level_height
+        self._apply(cell, cell + 1)
+        self._shift_after(cell + 1, 1 - removed_leaves)
+        self._ancestors(cell)
+        return tree
+
+
+# Below this many cells per depth level, a plain Python sweep beats one
+# NumPy call per level (e.g. long asymmetric stem-cell chains).
+_MIN_LEVEL_WIDTH = 32
+
+
+def _depth_levels(parent):
+    """
+    Group cells by depth, root level first, or return None for deep, narrow
+    trees where a per-cell sweep is cheaper.
+
+    Depths come from pointer jumping, so this costs O(n log depth) array work
+    and never recurses.
+    """
+    n = len(parent)
+    depth = (parent >= 0).astype(np.int64)
+    anc = parent.copy()
+    while True:
+        valid = np.flatnonzero(anc >= 0)
+        if len(valid) == 0:
+            break
+        up = anc[valid]
+        depth[valid] += depth[up]
+        anc[valid] = anc[up]
+    n_levels = int(depth.max()) + 1
+    if n_levels > 1 and n / n_levels < _MIN_LEVEL_WIDTH:
+        return None
+    order = np.argsort(depth, kind="stable")
+    bounds = np.concatenate(([0], np.cumsum(np.bincount(depth, minlength=n_levels))))
+    return [order[bounds[k]:bounds[k + 1]] for k in range(n_levels)]
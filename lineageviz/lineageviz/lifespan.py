@@ -0,0 +1,115 @@
+import numpy as np
+from .profiling import timed
+
+
+class LifespanIndex:
+    """
+    Time index over cell lifespans.
+
+    A cell is alive at t when birth <= t < death. Cells are sorted by birth
+    once, and a max-segment tree over their deaths (in birth order) answers
+    "who is alive at t" by descending only into nodes whose subtree holds a
+    death after t inside the born-by-t prefix: O(log n + k) nodes, visited
+    one tree level at a time with array operations.
+
+    Parameters:
+    - birth, death: per-cell times (use inf for cells that never divide)
+    - tree: optional LineageArray the cells belong to (same indexing), needed
+      for subtree_up_to. Births are then raised to the latest birth on each
+      cell's ancestor path, so the cells born by t always form a subtree.
+    """
+
+    def __init__(self, birth, death, tree=None):
+        birth = np.asarray(birth, dtype=np.float64)
+        death = np.asarray(death, dtype=np.float64)
+        if birth.shape != death.shape:
+            raise ValueError("birth and death need one value per cell")
+        if tree is not None:
+            if len(tree) != len(birth):
+                raise ValueError("birth/death do not match the tree's cells")
+            birth = _path_max(birth, tree.parent)
+        self.tree = tree
+        self.birth = birth
+        self.death = death
+
+        self.order = np.argsort(birth, kind="stable")
+        self.sorted_birth = birth[self.order]
+        n = len(birth)
+        self.size = 1 << max(n - 1, 0).bit_length()
+        seg = np.full(2 * self.size, -np.inf)
+        seg[self.size:self.size + n] = death[self.order]
+        level = self.size
+        while level > 1:
+            seg[level // 2:level] = np.maximum(seg[level:2 * level:2], seg[level + 1:2 * level:2])
+            level //= 2
+        self._max_death = seg
+
+    @classmethod
+    def from_tree(cls, tree, time='time', root_birth=0.0):
+        """
+        Index a LineageArray whose data[time] holds each cell's division time
+        (NaN for cells that do not divide). A cell is born when its parent
+        divides; the root is born at root_birth.
+        """
+        death = np.asarray(tree.data[time], dtype=np.float64)
+        death = np.where(np.isnan(death), np.inf, death)
+        parent = tree.parent
+        birth = np.where(parent >= 0, death[np.maximum(parent, 0)], root_birth)
+        return cls(birth, death, tree)
+
+    def __len__(self):
+        return len(self.birth)
+
+    def born_by(self, t):
+        """Cells with birth <= t, in birth order."""
+        return self.order[:np.searchsorted(self.sorted_birth, t, side='right')]
+
+    @timed
+    def cells_alive_at(self, t):
+        """Indices (ascending) of the cells alive at time t."""
+        hi = np.searchsorted(self.sorted_birth, t, side='right')
+        if hi == 0:
+            return np.empty(0, dtype=np.int64)
+        seg = self._max_death
+        if self.size == 1:
+            return self.order[:1] if seg[1] > t else np.empty(0, dtype=np.int64)
+        nodes = np.ones(1, dtype=np.int64)
+        span = self.size  # leaves covered by a node on the current level
+        while span > 1:
+            span //= 2
+            nodes = np.stack([2 * nodes, 2 * nodes + 1], axis=1).ravel()
+            first_leaf = (nodes - (self.size // span)) * span
+            nodes = nodes[(seg[nodes] > t) & (first_leaf < hi)]
+        return np.sort(self.order[nodes - self.size])
+
+    def alive_mask(self, t):
+        mask = np.zeros(len(self), dtype=bool)
+        mask[self.cells_alive_at(t)] = True
+        return mask
+
+    @timed
+    def subtree_up_to(self, t):
+        """
+        The lineage as it stands at time t: every cell born by t, as a
+        LineageArray (cells dividing after t become leaves), or None if not
+        even the root is born.
+        """
+        if self.tree is None:
+            raise ValueError("subtree_up_to needs an index built with a tree")
+        cells = np.sort(self.born_by(t))
+        if len(cells) == 0:
+            return None
+        return self.tree.take(cells)
+
+
+def _path_max(values, parent):
+    """Maximum of `values` over each cell and its ancestors (pointer jumping)."""
+    best = values.copy()
+    anc = np.asarray(parent, dtype=np.int64).copy()
+    while True:
+        valid = np.flatnonzero(anc >= 0)
+        if len(valid) == 0:
+            return best
+        up = anc[valid]
+        best[valid] = np.maximum(best[valid], best[up])
+        anc[valid] = anc[up]
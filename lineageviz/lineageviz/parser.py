@@ -1,41 +1,126 @@
 import re
-from .tree import Node
-
-def parse_newick_plusplus(s):
-    tokens = re.findall(r'[\(\),;]|[^\(\),;]+', s.strip())
-
-    def parse_node(index):
-        if tokens[index] == '(':
-            index += 1
-            children = []
-            while tokens[index] != ')':
-                child, index = parse_node(index)
-                children.append(child)
-                if tokens[index] == ',':
-                    index += 1
-            index += 1  # skip ')'
-            if index < len(tokens) and tokens[index] not in [',', ')', ';']:
-                label, index = parse_label(tokens[index], index)
-            else:
-                label = (None, 0.0, 0.5)
-            return Node(name=label[0], length=label[1], offset=label[2], children=children), index
-        else:
-            label, index = parse_label(tokens[index], index)
-            return Node(name=label[0], length=label[1], offset=label[2]), index
-
-    def parse_label(token, index):
-        match_full = re.match(r'([^:]+):([\d\.]+)@([\d\.]+)', token)
-        match_unnamed = re.match(r':([\d\.]+)@([\d\.]+)', token)
-        match_name_only = re.match(r'^[^:]+$', token)
-
-        if match_full:
-            return (match_full.group(1), float(match_full.group(2)), float(match_full.group(3))), index + 1
-        elif match_unnamed:
-            return (None, float(match_unnamed.group(1)), float(match_unnamed.group(2))), index + 1
-        elif match_name_only:
-            return (token, 0.0, 0.5), index + 1
+from .profiling import timed
+from .tree import LineageArray, intern_names
+
+# Delimiters are kept by re.split, so a tree alternates label text and
+# single-character structure tokens.
+_SPLIT = re.compile(r'([(),;])')
+
+# name:length@offset | :length@offset | name
+_LABEL = re.compile(r'([^:]+):([\d\.]+)@([\d\.]+)|:([\d\.]+)@([\d\.]+)|([^:]+)$')
+
+
+@timed
+def parse_newick_plusplus(s, as_array=False):
+    """
+    Parse the first tree of a Newick++ string.
+
+    Labels are `name:length@offset`, `:length@offset` or a bare `name`.
+    Returns the root Node, or a LineageArray with as_array=True.
+    """
+    for tree in _iter_trees(_SPLIT.split(s.strip()), as_array):
+        return tree
+    raise ValueError("No tree found in Newick++ input")
+
+
+def iter_newick_plusplus(source, as_array=False, chunk_size=1 << 20):
+    """
+    Yield every `;`-terminated tree in a Newick++ file, one at a time.
+
+    Parameters:
+    - source: a path or an open text file
+    - as_array: yield LineageArray trees instead of Node roots
+    - chunk_size: characters read per chunk
+
+    Only the tree being parsed is held in memory, so files with one tree per
+    embryo can be processed regardless of their total size.
+    """
+    if isinstance(source, str):
+        with open(source, 'r') as f:
+            yield from iter_newick_plusplus(f, as_array, chunk_size)
+        return
+
+    pending = ''
+    while True:
+        chunk = source.read(chunk_size)
+        if not chunk:
+            break
+        pending += chunk
+        end = pending.rfind(';')
+        if end < 0:
+            continue
+        yield from _iter_trees(_SPLIT.split(pending[:end + 1]), as_array)
+        pending = pending[end + 1:]
+    if pending.strip():
+        yield from _iter_trees(_SPLIT.split(pending), as_array)
+
+
+def _iter_trees(tokens, as_array):
+    """
+    Stack-based parse of split tokens into trees.
+
+    Cells are numbered when they open (internal) or appear (leaf), which is
+    preorder, so the arrays feed LineageArray directly.
+    """
+    parent, names, length, offset = [], [], [], []
+    stack = []
+    closed = -1  # cell whose ')' was just seen and may still get a label
+    label_match = _LABEL.match
+
+    for token in tokens:
+        if token == '(':
+            parent.append(stack[-1] if stack else -1)
+            names.append(None)
+            length.append(0.0)
+            offset.append(0.5)
+            stack.append(len(parent) - 1)
+            closed = -1
+        elif token == ')':
+            if not stack:
+                raise ValueError(f"Unbalanced ')' in Newick++ input after cell {len(parent)}")
+            closed = stack.pop()
+        elif token == ',':
+            closed = -1
+        elif token == ';':
+            if stack:
+                raise ValueError("Unbalanced '(' in Newick++ input")
+            if parent:
+                yield _build(parent, names, length, offset, as_array)
+            parent, names, length, offset = [], [], [], []
+            closed = -1
         else:
-            raise ValueError(f"Invalid label at token {index}: {token}")
+            token = token.strip()
+            if not token:
+                continue
+            m = label_match(token)
+            if m is None:
+                raise ValueError(f"Invalid label at cell {len(parent)}: {token}")
+            full_name, full_len, full_off, bare_len, bare_off, name_only = m.groups()
+            if full_name is not None:
+                label = (full_name, float(full_len), float(full_off))
+            elif bare_len is not None:
+                label = (None, float(bare_len), float(bare_off))
+            else:
+                label = (name_only, 0.0, 0.5)
+
+            if closed >= 0:
+                names[closed], length[closed], offset[closed] = label
+                closed = -1
+            else:
+                parent.append(stack[-1] if stack else -1)
+                names.append(label[0])
+                length.append(label[1])
+                offset.append(label[2])
+
+    if stack:
+        raise ValueError("Unbalanced '(' in Newick++ input")
+    if parent:
+        yield _build(parent, names, length, offset, as_array)
+
 
-    tree, _ = parse_node(0)
-    return tree
\ No newline at end of file
+def _build(parent, names, length, offset, as_array):
+    if parent.count(-1) > 1:
+        raise ValueError("Newick++ tree has more than one root; missing ';'?")
+    name_id, table = intern_names(names)
+    tree = LineageArray(parent, length, offset, name_id, table)
+    return tree if as_array else tree.to_node()
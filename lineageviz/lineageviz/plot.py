@@ -1,8 +1,447 @@
-import matplotlib.pyplot as plt
+import numpy as np
 import pandas as pd
+from matplotlib.artist import Artist
+from matplotlib.collections import LineCollection, PolyCollection
+from matplotlib.colors import to_rgba_array
+from matplotlib.text import Text
+from matplotlib.transforms import Bbox
+from .profiling import timed
+from .query import LineageIndex
+from .tree import LineageArray, NodeView
 
+# Text styles used by the tree labels, indexed by the style ids below.
+LABEL_STYLES = [
+    dict(ha='center', fontsize=7),                                        # size %
+    dict(ha='center', fontsize=7, color='gray'),                          # angle
+    dict(ha='center', fontsize=7),                                        # time
+    dict(va='center', ha='right', fontsize=8, color='black'),             # name
+    dict(va='center', ha='right', fontsize=8, color='red'),               # highlighted name
+    dict(va='center', ha='left', fontsize=7, style='italic', color='gray'),  # fate
+    dict(va='center', ha='left', fontsize=7, color='gray'),               # collapsed count
+]
+SIZE, ANGLE, TIME, NAME, HIGHLIGHT, FATE, COUNT = range(7)
+
+
+@timed
 def draw_tree(node, ax, show_sizes=True, show_times=True, show_time_axis=True,
-              color_map=None, search_target=None, fate_labels=None, angle_labels=None):
+              color_map=None, search_target=None, fate_labels=None, angle_labels=None,
+              batched=True, lod=False, viewport=None, collapse_px=1.0, label_spacing_px=None,
+              highlight_lineage=False, cell_colors=None):
+    """
+    Draw a laid-out lineage tree onto a matplotlib Axes.
+
+    With batched=True (the default) all branches, connectors and child links
+    go into one LineCollection and all labels into one LabelBatch artist, in
+    the same order the per-node renderer draws them, so the picture is
+    unchanged but the artist count no longer grows with the tree. Pass
+    batched=False for the original one-artist-per-segment renderer.
+
+    Level of detail (lod=True, or any viewport):
+    - viewport: (xmin, xmax, ymin, ymax) in data units to zoom to; cells and
+      labels outside it are skipped. Defaults to the whole tree.
+    - collapse_px: subtrees whose vertical extent is under this many pixels
+      (at the Axes' current size and DPI) are drawn as one wedge labelled
+      with their number of terminal cells.
+    - label_spacing_px: labels closer than this to an already placed label
+      are dropped (defaults to the label font height).
+
+    highlight_lineage=True highlights the whole sub-lineage of search_target
+    (every descendant's name and branches) instead of just its name.
+
+    cell_colors, an (n, 4) RGBA array with one row per cell, overrides the
+    color_map lineage colors (e.g. to encode a per-cell statistic).
+    """
+    if not batched:
+        _draw_tree_artists(node, ax, show_sizes, show_times, color_map,
+                           search_target, fate_labels, angle_labels)
+        return
+
+    tree = as_lineage_array(node)
+    order = tree.postorder()
+    index = LineageIndex(tree)
+    colors = lineage_colors(tree, color_map, index) if cell_colors is None \
+        else np.array(to_rgba_array(cell_colors))
+    highlight = None
+    if highlight_lineage and search_target is not None:
+        try:
+            highlight = index.subtree_mask(search_target)
+        except KeyError:
+            highlight = np.zeros(len(tree), dtype=bool)
+        colors[highlight] = to_rgba_array([LABEL_STYLES[HIGHLIGHT]['color']])[0]
+
+    if lod or viewport is not None:
+        _draw_tree_lod(tree, ax, order, colors, show_sizes, show_times, search_target,
+                       fate_labels, angle_labels, viewport, collapse_px, label_spacing_px, highlight)
+        ax.get_xaxis().set_visible(False)
+        ax.get_yaxis().set_visible(False)
+        return
+
+    segments, segment_colors = tree_segments(tree, colors, order)
+    ax.add_collection(LineCollection(segments, colors=segment_colors,
+                                     capstyle='projecting', joinstyle='round'))
+
+    labels = tree_labels(tree, order, show_sizes, show_times, search_target,
+                         fate_labels, angle_labels, highlight=highlight)
+    ax.add_artist(LabelBatch(*labels))
+
+    ax.get_xaxis().set_visible(False)
+    ax.get_yaxis().set_visible(False)
+
+
+def as_lineage_array(node):
+    """Return the LineageArray behind `node`, converting Node trees."""
+    if isinstance(node, LineageArray):
+        return node
+    if isinstance(node, NodeView) and node.index == 0:
+        return node.tree
+    return LineageArray.from_node(node)
+
+
+@timed
+def lineage_colors(tree, color_map, index=None):
+    """
+    Resolve one RGBA color per cell from `color_map`.
+
+    Each lineage prefix is looked up once in the LineageIndex name runs
+    (the first matching key in color_map wins, as in the per-node
+    renderer); cells inherit the color of their name. Unnamed or unmatched
+    cells are black.
+    """
+    palette = ['black']
+    table_color = np.zeros(len(tree.names) + 1, dtype=np.int64)
+    if color_map:
+        index = index or LineageIndex(tree)
+        unresolved = np.ones(len(table_color), dtype=bool)
+        unresolved[-1] = False  # slot used by unnamed cells
+        for root_name, color in color_map.items():
+            match = np.zeros(len(table_color), dtype=bool)
+            match[index.name_ids_with_prefix(root_name)] = True
+            match &= unresolved
+            if match.any():
+                table_color[match] = len(palette)
+                palette.append(color)
+                unresolved &= ~match
+    return to_rgba_array(palette)[table_color[tree.name_id]]
+
+
+@timed
+def tree_segments(tree, colors, order=None, cells=None, collapsed=None):
+    """
+    Line segments of a laid-out tree in drawing order.
+
+    For every cell (in postorder) this emits its vertical connector (if it
+    divides), its horizontal branch and the link from its parent's split
+    point, matching the order of the per-node renderer. Returns (segments,
+    colors) as (k, 2, 2) and (k, 4) arrays.
+
+    `cells` optionally masks which cells are drawn; cells in `collapsed` keep
+    their branch but lose their connector.
+    """
+    if order is None:
+        order = tree.postorder()
+    n = len(tree)
+    x, y = tree.x, tree.y
+    split = x + tree.length
+    parent = tree.parent
+    fc, lc = tree.first_child, tree.last_child
+    internal = fc >= 0
+    has_parent = parent >= 0
+    p = np.maximum(parent, 0)
+
+    segs = np.zeros((n, 3, 2, 2))
+    y_first = y[np.maximum(fc, 0)]
+    y_last = y[np.maximum(lc, 0)]
+    segs[:, 0, :, 0] = split[:, None]
+    segs[:, 0, 0, 1] = np.minimum(y_first, y_last)
+    segs[:, 0, 1, 1] = np.maximum(y_first, y_last)
+    segs[:, 1, 0, 0] = x
+    segs[:, 1, 1, 0] = split
+    segs[:, 1, :, 1] = y[:, None]
+    segs[:, 2, 0, 0] = split[p]
+    segs[:, 2, 0, 1] = y[p]
+    segs[:, 2, 1, 0] = x
+    segs[:, 2, 1, 1] = y
+
+    seg_colors = np.empty((n, 3, 4))
+    seg_colors[:, 0] = colors
+    seg_colors[:, 1] = colors
+    seg_colors[:, 2] = colors[p]
+
+    drawn = np.ones(n, dtype=bool) if cells is None else cells
+    connector = internal & drawn
+    if collapsed is not None:
+        connector &= ~collapsed
+    valid = np.stack([connector, drawn, has_parent & drawn], axis=1)
+    valid = valid[order]
+    return segs[order][valid], seg_colors[order][valid]
+
+
+@timed
+def tree_labels(tree, order, show_sizes=True, show_times=True, search_target=None,
+                fate_labels=None, angle_labels=None, cells=None, highlight=None, with_cells=False):
+    """
+    Collect the text labels of a laid-out tree in drawing order.
+
+    Returns (x, y, texts, style_ids) for a LabelBatch. `cells`, if given, is
+    a boolean mask restricting which cells get labels; `highlight`, if
+    given, is the mask of cells whose names are highlighted (otherwise the
+    name equal to search_target is). with_cells=True appends the index of
+    the cell each label belongs to.
+    """
+    names = tree.cell_names()
+    x = tree.x.tolist()
+    y = tree.y.tolist()
+    length = tree.length.tolist()
+    split = (tree.x + tree.length).tolist()
+    fc = tree.first_child.tolist()
+    ns = tree.next_sibling.tolist()
+    keep = None if cells is None else cells.tolist()
+    marked = None if highlight is None else highlight.tolist()
+
+    lx, ly, texts, styles, owners = [], [], [], [], []
+
+    def add(px, py, text, style):
+        lx.append(px)
+        ly.append(py)
+        texts.append(text)
+        styles.append(style)
+        owners.append(i)
+
+    for i in order.tolist():
+        if keep is not None and not keep[i]:
+            continue
+        name = names[i]
+        sx = split[i]
+        c1 = fc[i]
+        if c1 >= 0:
+            c2 = ns[c1]
+            if show_sizes and c2 >= 0 and ns[c2] < 0:
+                total = length[c1] + length[c2]
+                if total > 0:
+                    p1 = int((length[c1] / total) * 100)
+                    add(sx + 1, y[c1] + 0.5, f"{p1}%", SIZE)
+                    add(sx + 1, y[c2] - 0.5, f"{100 - p1}%", SIZE)
+            if angle_labels and name in angle_labels:
+                add(sx, y[i] + 0.8, f"{angle_labels[name]:.1f}°", ANGLE)
+            if show_times:
+                add(sx, y[i] + 1.5, f"{int(length[i])} min", TIME)
+        if name and not pd.isna(name):
+            hit = marked[i] if marked is not None else name == search_target
+            add(x[i] - 1.5, y[i], name, HIGHLIGHT if hit else NAME)
+            if fate_labels and name in fate_labels:
+                add(sx + 1, y[i], fate_labels[name], FATE)
+
+    out = np.asarray(lx, dtype=float), np.asarray(ly, dtype=float), texts, np.asarray(styles, dtype=np.int64)
+    if with_cells:
+        return out + (np.asarray(owners, dtype=np.int64),)
+    return out
+
+
+def _draw_tree_lod(tree, ax, order, colors, show_sizes, show_times, search_target,
+                   fate_labels, angle_labels, viewport, collapse_px, label_spacing_px, highlight=None):
+    x, y = tree.x, tree.y
+    split = x + tree.length
+    n = len(tree)
+
+    if viewport is None:
+        xm, ym = ax.margins()
+        x0, x1 = min(x.min(), split.min()), max(x.max(), split.max())
+        y0, y1 = y.min(), y.max()
+        x0, x1 = x0 - xm * (x1 - x0), x1 + xm * (x1 - x0)
+        y0, y1 = y0 - ym * (y1 - y0), y1 + ym * (y1 - y0)
+    else:
+        x0, x1, y0, y1 = viewport
+    if x1 == x0:
+        x0, x1 = x0 - 0.5, x1 + 0.5
+    if y1 == y0:
+        y0, y1 = y0 - 0.5, y1 + 0.5
+    ax.set_xlim(x0, x1)
+    ax.set_ylim(y0, y1)
+    box = ax.get_window_extent()
+    px_x = box.width / (x1 - x0)
+    px_y = box.height / (y1 - y0)
+
+    # Leaves appear in preorder, so a subtree's leaves are a contiguous run
+    # and its vertical extent spans its first and last leaf.
+    end = tree.subtree_end
+    leaves = np.flatnonzero(tree.is_leaf())
+    first = np.searchsorted(leaves, np.arange(n))
+    last = np.searchsorted(leaves, end) - 1
+    y_lo = np.minimum(y[leaves[first]], y[leaves[last]])
+    y_hi = np.maximum(y[leaves[first]], y[leaves[last]])
+    small = (~tree.is_leaf()) & ((y_hi - y_lo) * abs(px_y) < collapse_px)
+    collapsed = small.copy()
+    collapsed[1:] &= ~small[tree.parent[1:]]
+    roots = np.flatnonzero(collapsed)
+
+    # Everything strictly below a collapsed cell is hidden.
+    depth_change = np.zeros(n + 1, dtype=np.int64)
+    np.add.at(depth_change, roots + 1, 1)
+    np.add.at(depth_change, end[roots], -1)
+    hidden = np.cumsum(depth_change[:n]) > 0
+
+    # A cell is kept if the box around its branch, connector and the link
+    # from its parent touches the viewport.
+    p = np.where(tree.parent >= 0, tree.parent, np.arange(n))
+    bx_lo = np.minimum(np.minimum(x, split), split[p])
+    bx_hi = np.maximum(np.maximum(x, split), split[p])
+    by_lo = np.minimum(y_lo, y[p])
+    by_hi = np.maximum(y_hi, y[p])
+    in_x = (bx_hi >= min(x0, x1)) & (bx_lo <= max(x0, x1))
+    in_y = (by_hi >= min(y0, y1)) & (by_lo <= max(y0, y1))
+    cells = ~hidden & in_x & in_y
+
+    segments, segment_colors = tree_segments(tree, colors, order, cells=cells, collapsed=collapsed)
+    ax.add_collection(LineCollection(segments, colors=segment_colors,
+                                     capstyle='projecting', joinstyle='round'),
+                      autolim=False)
+
+    wedge_x = split[roots]
+    if len(roots):
+        tips = np.maximum.reduceat(np.append(split, split[-1]),
+                                   np.stack([roots, end[roots]], axis=1).ravel())[::2]
+        wedges = np.stack([
+            np.stack([wedge_x, y[roots]], axis=1),
+            np.stack([tips, y_lo[roots]], axis=1),
+            np.stack([tips, y_hi[roots]], axis=1),
+        ], axis=1)
+        keep = cells[roots]
+        wedges = wedges[keep]
+        wedge_colors = colors[roots][keep]
+        faces = wedge_colors.copy()
+        faces[:, 3] *= 0.3
+        ax.add_collection(PolyCollection(wedges, facecolors=faces, edgecolors=wedge_colors,
+                                         linewidths=0.5), autolim=False)
+    else:
+        tips = wedge_x
+        keep = np.zeros(0, dtype=bool)
+
+    # Coarse thinning on a pixel grid so the label loop below only visits
+    # about as many cells as can be labelled legibly.
+    font_px = 8 * ax.figure.dpi / 72
+    spacing = label_spacing_px if label_spacing_px else font_px
+    candidates = np.flatnonzero(cells)
+    if search_target is not None:
+        try:
+            target = tree.index_of(search_target)
+        except KeyError:
+            target = -1
+        if target >= 0 and cells[target]:
+            candidates = np.concatenate(([target], candidates[candidates != target]))
+    bucket_x = np.floor((x[candidates] - x0) * px_x / (spacing * 6)).astype(np.int64)
+    bucket_y = np.floor((y[candidates] - y0) * px_y / spacing).astype(np.int64)
+    _, first_in_bucket = np.unique(np.stack([bucket_x, bucket_y], axis=1), axis=0, return_index=True)
+    labelled = np.zeros(n, dtype=bool)
+    labelled[candidates[first_in_bucket]] = True
+
+    lx, ly, texts, styles = tree_labels(tree, order, show_sizes, show_times, search_target,
+                                        fate_labels, angle_labels, cells=labelled, highlight=highlight)
+    counts = (last - first + 1)[roots][keep]
+    lx = np.concatenate((lx, tips[keep] + 1))
+    ly = np.concatenate((ly, ((y_lo + y_hi) / 2)[roots][keep]))
+    texts = texts + [f"{k} cells" for k in counts.tolist()]
+    styles = np.concatenate((styles, np.full(len(counts), COUNT, dtype=np.int64)))
+
+    placed = _place_labels(lx, ly, texts, styles, x0, y0, px_x, px_y, ax.figure.dpi, spacing,
+                           box.width, box.height)
+    ax.add_artist(LabelBatch(lx[placed], ly[placed], [texts[i] for i in placed], styles[placed]))
+
+
+def _place_labels(lx, ly, texts, styles, x0, y0, px_x, px_y, dpi, spacing, width, height):
+    """
+    Greedily keep labels anchored inside the view whose approximate pixel
+    boxes do not overlap.
+
+    Highlighted names are placed first; returns indices of kept labels in
+    their original (drawing) order.
+    """
+    cell = max(spacing / 2, 1.0)
+    occupied = set()
+    kept = []
+    priority = sorted(range(len(texts)), key=lambda i: styles[i] != HIGHLIGHT)
+    for i in priority:
+        style = LABEL_STYLES[styles[i]]
+        h = style['fontsize'] * dpi / 72
+        w = 0.6 * h * len(texts[i])
+        px = (lx[i] - x0) * px_x
+        py = (ly[i] - y0) * px_y
+        if not (0 <= px <= width and 0 <= py <= height):
+            continue
+        ha = style.get('ha', 'left')
+        left = px - w if ha == 'right' else px - w / 2 if ha == 'center' else px
+        bottom = py - h / 2 if style.get('va') == 'center' else py
+        cols = range(int(np.floor(left / cell)), int(np.floor((left + w) / cell)) + 1)
+        rows = range(int(np.floor(bottom / cell)), int(np.floor((bottom + h) / cell)) + 1)
+        boxes = [(c, r) for c in cols for r in rows]
+        if any(b in occupied for b in boxes):
+            continue
+        occupied.update(boxes)
+        kept.append(i)
+    kept.sort()
+    return np.asarray(kept, dtype=np.int64)
+
+
+class LabelBatch(Artist):
+    """
+    Many text labels drawn as a single artist.
+
+    One Text object per style is reused for every label, so adding a
+    thousand labels costs one artist rather than a thousand. Like ax.text
+    labels, the batch is not clipped to the Axes.
+    """
+
+    zorder = 3
+
+    def __init__(self, x, y, texts, style_ids, styles=LABEL_STYLES):
+        super().__init__()
+        self._x = np.asarray(x, dtype=float)
+        self._y = np.asarray(y, dtype=float)
+        self._texts = list(texts)
+        self._style_ids = np.asarray(style_ids, dtype=np.int64)
+        self._templates = [Text(**style) for style in styles]
+        self._shown = None
+        self.set_clip_on(False)
+
+    def __len__(self):
+        return len(self._texts)
+
+    def set_shown(self, mask):
+        """Draw only the labels where `mask` is True (None shows all)."""
+        self._shown = None if mask is None else np.flatnonzero(mask).tolist()
+        self.stale = True
+
+    def _iter_labels(self):
+        transform = self.get_transform()
+        for t in self._templates:
+            t.set_figure(self.figure)
+            t.set_transform(transform)
+        templates = self._templates
+        labels = zip(self._x.tolist(), self._y.tolist(), self._texts, self._style_ids.tolist())
+        if self._shown is not None:
+            labels = list(labels)
+            labels = [labels[i] for i in self._shown]
+        for px, py, s, k in labels:
+            t = templates[k]
+            t.set_position((px, py))
+            t.set_text(s)
+            yield t
+
+    def draw(self, renderer):
+        if not self.get_visible():
+            return
+        renderer.open_group('labelbatch', gid=self.get_gid())
+        for t in self._iter_labels():
+            t.draw(renderer)
+        renderer.close_group('labelbatch')
+        self.stale = False
+
+    def get_window_extent(self, renderer=None):
+        boxes = [t.get_window_extent(renderer) for t in self._iter_labels()]
+        return Bbox.union(boxes) if boxes else Bbox.null()
+
+
+def _draw_tree_artists(node, ax, show_sizes, show_times, color_map,
+                       search_target, fate_labels, angle_labels):
     times = []
 
     def recurse(n):
@@ -0,0 +1,149 @@
+import contextvars
+import functools
+import json
+import os
+import threading
+import time
+
+
+class _Recording:
+    __slots__ = ('enabled', 'events')
+
+    def __init__(self, enabled=False):
+        self.enabled = enabled
+        self.events = []  # (name, start_ns, duration_ns, thread id, args)
+
+
+# The recording spans go to. Code that never calls start_recording() shares
+# one process-wide recording; start_recording() gives the current context
+# (e.g. one Streamlit rerun, on its session's thread) its own, so concurrent
+# sessions neither see nor reset each other's spans.
+_current = contextvars.ContextVar('lineageviz_profiling', default=_Recording())
+
+
+def start_recording(on=True):
+    """Begin a fresh recording for the current thread/context."""
+    _current.set(_Recording(bool(on)))
+
+
+def enable(on=True):
+    """Turn span recording on or off for the current recording."""
+    _current.get().enabled = bool(on)
+
+
+def is_enabled():
+    return _current.get().enabled
+
+
+def reset():
+    """Forget every span of the current recording."""
+    del _current.get().events[:]
+
+
+def events():
+    return list(_current.get().events)
+
+
+class _Span:
+    __slots__ = ('name', 'args', 'start', 'events')
+
+    def __init__(self, name, args, events):
+        self.name = name
+        self.args = args
+        self.events = events
+
+    def __enter__(self):
+        self.start = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, *exc):
+        end = time.perf_counter_ns()
+        self.events.append((self.name, self.start, end - self.start, threading.get_ident(), self.args))
+        return False
+
+
+class _NullSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NULL_SPAN = _NullSpan()
+
+
+def span(name, **args):
+    """
+    Context manager timing the enclosed block as `name`.
+
+    When recording is off this returns a shared no-op object, so leaving
+    spans in hot code costs one context-variable lookup and a call.
+    """
+    recording = _current.get()
+    return _Span(name, args or None, recording.events) if recording.enabled else _NULL_SPAN
+
+
+def timed(name=None):
+    """
+    Decorator recording each call as a span. Use as @timed or
+    @timed("label"); the default label is module.qualname.
+    """
+    def decorate(fn):
+        label = name or f"{fn.__module__}.{fn.__qualname__}"
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            recording = _current.get()
+            if not recording.enabled:
+                return fn(*args, **kwargs)
+            with _Span(label, None, recording.events):
+                return fn(*args, **kwargs)
+        return wrapper
+
+    if callable(name):
+        fn, name = name, None
+        return decorate(fn)
+    return decorate
+
+
+def summary():
+    """
+    Recorded spans aggregated by name, in order of first appearance.
+    Returns a list of dicts: name, calls, total_ms, mean_ms, max_ms.
+    """
+    rows = {}
+    for name, _, duration, _, _ in _current.get().events:
+        row = rows.get(name)
+        if row is None:
+            row = rows[name] = {'name': name, 'calls': 0, 'total_ms': 0.0, 'max_ms': 0.0}
+        ms = duration / 1e6
+        row['calls'] += 1
+        row['total_ms'] += ms
+        row['max_ms'] = max(row['max_ms'], ms)
+    for row in rows.values():
+        row['mean_ms'] = row['total_ms'] / row['calls']
+    return list(rows.values())
+
+
+def chrome_trace():
+    """Recorded spans as a Chrome trace-event document (chrome://tracing, Perfetto)."""
+    spans = _current.get().events
+    origin = min((start for _, start, _, _, _ in spans), default=0)
+    pid = os.getpid()
+    trace = []
+    for name, start, duration, tid, args in spans:
+        event = {'name': name, 'cat': name.split('.')[0], 'ph': 'X', 'pid': pid, 'tid': tid,
+                 'ts': (start - origin) / 1e3, 'dur': duration / 1e3}
+        if args:
+            event['args'] = {k: v if isinstance(v, (int, float, bool, str)) else repr(v) for k, v in args.items()}
+        trace.append(event)
+    return {'traceEvents': trace, 'displayTimeUnit': 'ms'}
+
+
+def write_chrome_trace(filename):
+    with open(filename, 'w') as f:
+        json.dump(chrome_trace(), f)
+    return filename
@@ -0,0 +1,155 @@
+import numpy as np
+
+
+class LineageIndex:
+    """
+    Structural queries on a LineageArray without walking the tree.
+
+    - Subtrees are preorder intervals: b is in a's subtree iff
+      a <= b < subtree_end[a], so membership is O(1) and descendants are a
+      slice.
+    - LCA uses a sparse table of depth minima over the preorder sequence:
+      for u < v the shallowest cell in (u, v] is a child of their LCA, so
+      each query is two table lookups (O(1)) after O(n log n) setup.
+    - Prefix lookups use the name table sorted once, which serves as a
+      compact trie: all names under a prefix form one contiguous run found
+      by two binary searches.
+
+    Each part is built on first use. Build a new index after editing the
+    tree's structure or names.
+    """
+
+    def __init__(self, tree):
+        self.tree = tree
+        self._depths = None
+        self._sparse = None
+        self._sorted_names = None
+
+    # --- Cells ---
+
+    def cell(self, key):
+        """Preorder index of a cell given its index or name."""
+        if isinstance(key, (int, np.integer)):
+            if not 0 <= key < len(self.tree):
+                raise IndexError(f"No cell {key}")
+            return int(key)
+        return self.tree.index_of(key)
+
+    @property
+    def depths(self):
+        """Number of ancestors of every cell (pointer jumping, no Python loop)."""
+        if self._depths is None:
+            parent = self.tree.parent.astype(np.int64)
+            depth = (parent >= 0).astype(np.int64)
+            anc = parent.copy()
+            while True:
+                valid = np.flatnonzero(anc >= 0)
+                if len(valid) == 0:
+                    break
+                up = anc[valid]
+                depth[valid] += depth[up]
+                anc[valid] = anc[up]
+            self._depths = depth
+        return self._depths
+
+    def depth(self, key):
+        return int(self.depths[self.cell(key)])
+
+    # --- Ancestry ---
+
+    def descendants(self, key, include_self=False):
+        """Preorder indices of every cell below `key`."""
+        i = self.cell(key)
+        return np.arange(i if include_self else i + 1, self.tree.subtree_end_of(i))
+
+    def ancestors(self, key, include_self=False):
+        """Indices from `key`'s parent (or itself) up to the root."""
+        i = self.cell(key)
+        parent = self.tree.parent
+        path = [i] if include_self else []
+        i = int(parent[i])
+        while i >= 0:
+            path.append(i)
+            i = int(parent[i])
+        return np.asarray(path, dtype=np.int64)
+
+    def is_ancestor(self, a, b):
+        """True if `a` is `b` or one of its ancestors."""
+        a, b = self.cell(a), self.cell(b)
+        return a <= b < self.tree.subtree_end_of(a)
+
+    def subtree_mask(self, *keys):
+        """Boolean mask of the cells in the subtrees of all `keys`."""
+        n = len(self.tree)
+        change = np.zeros(n + 1, dtype=np.int64)
+        for key in keys:
+            i = self.cell(key)
+            change[i] += 1
+            change[self.tree.subtree_end_of(i)] -= 1
+        return np.cumsum(change[:n]) > 0
+
+    def lca(self, a, b):
+        """
+        Lowest common ancestor of two cells (indices or names), or of two
+        equal-length index arrays (vectorized).
+        """
+        if np.ndim(a) or np.ndim(b):
+            return self._lca(np.asarray(a, dtype=np.int64), np.asarray(b, dtype=np.int64))
+        return int(self._lca(np.array([self.cell(a)]), np.array([self.cell(b)]))[0])
+
+    def _lca(self, a, b):
+        table = self._sparse_table()
+        depth = self.depths
+        lo = np.minimum(a, b) + 1
+        hi = np.maximum(a, b)
+        same = lo > hi
+        lo = np.where(same, hi, lo)
+        k = np.floor(np.log2(hi - lo + 1)).astype(np.int64)
+        left = table[k, lo]
+        right = table[k, hi - (1 << k) + 1]
+        shallow = np.where(depth[left] <= depth[right], left, right)
+        return np.where(same, a, self.tree.parent[shallow].astype(np.int64))
+
+    def _sparse_table(self):
+        # Row k holds, for every start i, the shallowest cell in [i, i + 2**k).
+        if self._sparse is None:
+            depth = self.depths
+            n = len(depth)
+            levels = max(int(n).bit_length(), 1)
+            table = np.empty((levels, n), dtype=np.int32 if n < 2 ** 31 else np.int64)
+            table[0] = np.arange(n)
+            for k in range(1, levels):
+                half = 1 << (k - 1)
+                prev = table[k - 1]
+                a = prev[:n - half]
+                b = prev[half:]
+                table[k, :n - half] = np.where(depth[a] <= depth[b], a, b)
+                table[k, n - half:] = prev[n - half:]
+            self._sparse = table
+        return self._sparse
+
+    # --- Names ---
+
+    def _name_runs(self):
+        if self._sorted_names is None:
+            ids = np.array([j for j, name in enumerate(self.tree.names) if isinstance(name, str) and name],
+                           dtype=np.int64)
+            names = np.array([self.tree.names[j] for j in ids.tolist()], dtype=str)
+            order = np.argsort(names, kind='stable')
+            self._sorted_names = (names[order], ids[order])
+        return self._sorted_names
+
+    def name_ids_with_prefix(self, prefix):
+        """Name-table ids of every name starting with `prefix`."""
+        names, ids = self._name_runs()
+        if not prefix:
+            return ids
+        lo = np.searchsorted(names, prefix, side='left')
+        hi = np.searchsorted(names, prefix + '\U0010ffff', side='left')
+        return ids[lo:hi]
+
+    def with_prefix(self, prefix):
+        """Preorder indices of the cells whose name starts with `prefix`."""
+        table = np.zeros(len(self.tree.names) + 1, dtype=bool)
+        table[self.name_ids_with_prefix(prefix)] = True
+        return np.flatnonzero(table[self.tree.name_id])
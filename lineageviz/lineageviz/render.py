@@ -0,0 +1,153 @@
+"""
+Batch-render lineage files to images.
+
+    python -m lineageviz.render data/*.csv embryos/ -o renders/ --workers 8
+
+Inputs may be files, directories (every CSV/JSON/Newick++ file inside) or
+glob patterns. Files are rendered in a process pool; each worker keeps one
+Agg figure and reuses it for every tree it draws. A file that fails to
+load or render is reported and skipped without stopping the batch.
+"""
+import argparse
+import glob
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from matplotlib.figure import Figure
+from .export import save_tree_image
+from .importer import NEWICK_EXTENSIONS, READERS, load_lineage
+
+LINEAGE_EXTENSIONS = tuple(READERS) + NEWICK_EXTENSIONS
+
+_figure = None  # one figure per worker process
+
+
+def find_lineages(inputs):
+    """Expand files, directories and glob patterns into sorted lineage paths."""
+    found = set()
+    for item in inputs:
+        if os.path.isdir(item):
+            for dirpath, _, filenames in os.walk(item):
+                found.update(os.path.join(dirpath, f) for f in filenames
+                             if os.path.splitext(f)[1].lower() in LINEAGE_EXTENSIONS)
+        elif os.path.isfile(item):
+            found.add(item)
+        else:
+            found.update(p for p in glob.glob(item, recursive=True)
+                         if os.path.isfile(p) and os.path.splitext(p)[1].lower() in LINEAGE_EXTENSIONS)
+    return sorted(found)
+
+
+def output_paths(paths, out_dir, fmt='png'):
+    """One output file per input, named after it (suffixed on clashes)."""
+    used = {}
+    out = []
+    for path in paths:
+        stem = os.path.splitext(os.path.basename(path))[0]
+        n = used.get(stem, 0)
+        used[stem] = n + 1
+        name = stem if n == 0 else f"{stem}_{n}"
+        out.append(os.path.join(out_dir, f"{name}.{fmt}"))
+    return out
+
+
+def render_file(path, output, figsize=(12, 6), dpi=150, options=None):
+    """
+    Load and render one lineage file. Never raises: returns
+    (path, output, error) with error None on success, else its message.
+    """
+    global _figure
+    if _figure is None:
+        _figure = Figure(figsize=figsize)
+    try:
+        tree, _ = load_lineage(path)
+        save_tree_image(tree, output, figsize=figsize, dpi=dpi, fig=_figure, **(options or {}))
+    except Exception as e:
+        _figure = None  # do not reuse a figure left in an unknown state
+        return path, output, f"{type(e).__name__}: {e}"
+    return path, output, None
+
+
+def render_all(paths, out_dir, workers=None, fmt='png', figsize=(12, 6), dpi=150,
+               progress=None, **options):
+    """
+    Render every lineage file in `paths` into `out_dir`.
+
+    Parameters:
+    - paths: lineage files (see find_lineages)
+    - out_dir: output directory (created if needed)
+    - workers: process count (default: CPU count); 1 renders in-process
+    - fmt: image format / file extension
+    - figsize, dpi: figure size in inches and raster resolution
+    - progress: optional callable(done, total, path, error)
+    - options: passed to draw_tree
+
+    Returns a list of (path, output, error) in input order.
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    outputs = output_paths(paths, out_dir, fmt)
+    total = len(paths)
+    results = {}
+
+    def record(result):
+        results[result[0]] = result
+        if progress is not None:
+            progress(len(results), total, result[0], result[2])
+
+    if workers == 1 or total <= 1:
+        for path, output in zip(paths, outputs):
+            record(render_file(path, output, figsize, dpi, options))
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = {pool.submit(render_file, path, output, figsize, dpi, options): (path, output)
+                       for path, output in zip(paths, outputs)}
+            for future in as_completed(futures):
+                try:
+                    record(future.result())
+                except Exception as e:  # worker died (e.g. out of memory)
+                    path, output = futures[future]
+                    record((path, output, f"{type(e).__name__}: {e}"))
+    return [results[path] for path in paths]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m lineageviz.render",
+                                     description="Render lineage files (CSV, JSON, Newick++) to images.")
+    parser.add_argument('inputs', nargs='+', help="files, directories or glob patterns")
+    parser.add_argument('-o', '--out-dir', default='renders')
+    parser.add_argument('-j', '--workers', type=int, default=None)
+    parser.add_argument('--format', default='png', help="png, svg, pdf, ...")
+    parser.add_argument('--dpi', type=int, default=150)
+    parser.add_argument('--size', type=float, nargs=2, default=(12, 6), metavar=('W', 'H'))
+    parser.add_argument('--no-sizes', action='store_true', help="hide size labels")
+    parser.add_argument('--no-times', action='store_true', help="hide division times")
+    parser.add_argument('--lod', action='store_true', help="level-of-detail rendering for large trees")
+    parser.add_argument('-q', '--quiet', action='store_true')
+    args = parser.parse_args(argv)
+
+    paths = find_lineages(args.inputs)
+    if not paths:
+        print("No lineage files found.", file=sys.stderr)
+        return 2
+
+    started = time.time()
+
+    def report(done, total, path, error):
+        if error is not None:
+            print(f"[{done}/{total}] FAILED {path}: {error}", file=sys.stderr)
+        elif not args.quiet:
+            print(f"[{done}/{total}] {path}", file=sys.stderr)
+
+    results = render_all(paths, args.out_dir, workers=args.workers, fmt=args.format,
+                         figsize=tuple(args.size), dpi=args.dpi, progress=report,
+                         show_sizes=not args.no_sizes, show_times=not args.no_times, lod=args.lod)
+    failed = sum(error is not None for _, _, error in results)
+    print(f"Rendered {len(results) - failed}/{len(results)} files in {time.time() - started:.1f}s"
+          f" ({failed} failed).", file=sys.stderr)
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
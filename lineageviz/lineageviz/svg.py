@@ -0,0 +1,213 @@
+"""
+Streaming SVG writer for laid-out lineage trees.
+
+Matplotlib's SVG backend emits one element with its own style attributes
+per segment and per label, and holds every artist in memory first. This
+writer goes straight from the layout arrays to the file instead, a chunk
+of cells at a time (in preorder):
+
+- each cell's link from its parent's split point, branch and division
+  connector are one merged polyline ("M parent_split parent_y L x y
+  H split V lo V hi"), and a chunk's polylines of one color share a single
+  <path>;
+- colors, line and label styles are CSS classes defined once;
+- labels are the same ones draw_tree places (see plot.tree_labels).
+
+Memory beyond the tree's own arrays depends on chunk_size, not on the
+number of cells.
+"""
+from xml.sax.saxutils import escape
+
+import numpy as np
+import pandas as pd
+from matplotlib.colors import to_hex, to_rgba
+from .plot import (LABEL_STYLES, SIZE, ANGLE, TIME, NAME, HIGHLIGHT, FATE,
+                   as_lineage_array, lineage_colors)
+from .profiling import timed
+from .query import LineageIndex
+
+CHUNK_SIZE = 8192
+_ANCHOR = {'center': 'middle', 'left': 'start', 'right': 'end'}
+
+
+@timed
+def write_svg(tree, filename, width=864, height=432, title="Lineage Tree", show_sizes=True,
+              show_times=True, color_map=None, search_target=None, fate_labels=None,
+              angle_labels=None, highlight_lineage=False, linewidth=1.5,
+              chunk_size=CHUNK_SIZE, **draw_options):
+    """
+    Write a laid-out lineage tree (see layout_tree) to an SVG file.
+
+    Parameters:
+    - tree: a laid-out Node tree or LineageArray
+    - filename: output path
+    - width, height: picture size in points (72 per inch)
+    - title: heading above the tree (None for none)
+    - show_sizes, show_times, color_map, search_target, fate_labels,
+      angle_labels, highlight_lineage: as in draw_tree
+    - linewidth: stroke width in points
+    - chunk_size: cells formatted per write
+
+    Matplotlib-only draw_tree options (batched, lod, viewport, ...) are
+    accepted and ignored.
+    """
+    tree = as_lineage_array(tree)
+    colors = lineage_colors(tree, color_map)
+    highlight = None
+    if highlight_lineage and search_target is not None:
+        try:
+            highlight = LineageIndex(tree).subtree_mask(search_target)
+        except KeyError:
+            highlight = np.zeros(len(tree), dtype=bool)
+        colors[highlight] = to_rgba(LABEL_STYLES[HIGHLIGHT]['color'])
+    palette, color_id = np.unique(colors, axis=0, return_inverse=True)
+    color_id = color_id.reshape(-1)
+
+    view = _Viewport(tree, width, height, 30 if title else 10)
+    with open(filename, 'w', encoding='utf-8', newline='\n') as f:
+        f.write(f'<?xml version="1.0" encoding="utf-8"?>\n'
+                f'<svg xmlns="http://www.w3.org/2000/svg" width="{width:g}pt" height="{height:g}pt" '
+                f'viewBox="0 0 {width:g} {height:g}">\n')
+        f.write(_stylesheet(palette, linewidth))
+        if title:
+            f.write(f'<text class="title" x="{width / 2:.2f}" y="20">{escape(title)}</text>\n')
+        f.write('<g id="branches">\n')
+        for start in range(0, len(tree), chunk_size):
+            f.write(_chunk_paths(tree, view, color_id, start, min(start + chunk_size, len(tree))))
+        f.write('</g>\n<g id="labels">\n')
+        for start in range(0, len(tree), chunk_size):
+            f.write(_chunk_labels(tree, view, start, min(start + chunk_size, len(tree)),
+                                  show_sizes, show_times, search_target, fate_labels,
+                                  angle_labels, highlight))
+        f.write('</g>\n</svg>\n')
+
+
+class _Viewport:
+    """Data -> SVG coordinates, with the 5% data margins of matplotlib autoscaling."""
+
+    def __init__(self, tree, width, height, top, pad=10):
+        x0, x1 = np.nanmin(tree.x), np.nanmax(tree.x + tree.length)
+        y0, y1 = np.nanmin(tree.y), np.nanmax(tree.y)
+        dx, dy = (x1 - x0) or 1.0, (y1 - y0) or 1.0
+        self.x0, self.y1 = x0 - 0.05 * dx, y1 + 0.05 * dy
+        self.kx = (width - 2 * pad) / (1.1 * dx)
+        self.ky = (height - top - pad) / (1.1 * dy)
+        self.left, self.top = pad, top
+
+    def x(self, x):
+        return self.left + (x - self.x0) * self.kx
+
+    def y(self, y):
+        return self.top + (self.y1 - y) * self.ky
+
+
+def _stylesheet(palette, linewidth):
+    rules = [f'path{{fill:none;stroke-width:{linewidth:g};stroke-linecap:square;stroke-linejoin:round}}',
+             'text{font-family:"DejaVu Sans",Arial,sans-serif;fill:#000}',
+             '.title{font-size:12px;text-anchor:middle}']
+    for k, rgba in enumerate(palette):
+        opacity = f';stroke-opacity:{rgba[3]:g}' if rgba[3] < 1 else ''
+        rules.append(f'.c{k}{{stroke:{to_hex(rgba)}{opacity}}}')
+    for k, style in enumerate(LABEL_STYLES):
+        rule = f'font-size:{style.get("fontsize", 10)}px;text-anchor:{_ANCHOR[style.get("ha", "left")]}'
+        if style.get('va') == 'center':
+            rule += ';dominant-baseline:central'
+        if 'color' in style:
+            rule += f';fill:{to_hex(style["color"])}'
+        if style.get('style') == 'italic':
+            rule += ';font-style:italic'
+        rules.append(f'.l{k}{{{rule}}}')
+    return '<style>\n' + '\n'.join(rules) + '\n</style>\n'
+
+
+def _chunk_paths(tree, view, color_id, a, b):
+    """
+    One <path> per color for cells a..b-1: each cell's link from its
+    parent's split point, branch and connector. The link takes the parent's
+    color (as in tree_segments), so it only joins the cell's polyline when
+    both colors agree and is a separate subpath otherwise.
+    """
+    x = view.x(tree.x[a:b])
+    split = view.x(tree.x[a:b] + tree.length[a:b])
+    y = view.y(tree.y[a:b])
+    parent = tree.parent[a:b]
+    p = np.maximum(parent, 0)
+    x_split_p = view.x(tree.x[p] + tree.length[p])
+    y_p = view.y(tree.y[p])
+    fc, lc = tree.first_child[a:b], tree.last_child[a:b]
+    y_first = view.y(tree.y[np.maximum(fc, 0)])
+    y_last = view.y(tree.y[np.maximum(lc, 0)])
+    lo, hi = np.minimum(y_first, y_last), np.maximum(y_first, y_last)
+
+    ids = color_id[a:b]
+    link_ids = color_id[p]
+    linked = parent >= 0
+    joined = linked & (link_ids == ids)
+    separate = linked & ~joined
+
+    polylines = []
+    for px, py, ps, pl, ph, sx, sy, inner, join in zip(
+            x.tolist(), y.tolist(), split.tolist(), lo.tolist(), hi.tolist(),
+            x_split_p.tolist(), y_p.tolist(), (fc >= 0).tolist(), joined.tolist()):
+        d = f"M{sx:.2f} {sy:.2f}L{px:.2f} {py:.2f}H{ps:.2f}" if join else f"M{px:.2f} {py:.2f}H{ps:.2f}"
+        polylines.append(d + f"V{pl:.2f}V{ph:.2f}" if inner else d)
+    polylines += [f"M{sx:.2f} {sy:.2f}L{px:.2f} {py:.2f}"
+                  for px, py, sx, sy in zip(x[separate].tolist(), y[separate].tolist(),
+                                            x_split_p[separate].tolist(), y_p[separate].tolist())]
+
+    ids = np.concatenate((ids, link_ids[separate]))
+    order = np.argsort(ids, kind='stable')
+    runs = np.flatnonzero(np.r_[True, ids[order][1:] != ids[order][:-1], True])
+    out = []
+    for s, e in zip(runs[:-1].tolist(), runs[1:].tolist()):
+        d = ''.join([polylines[i] for i in order[s:e].tolist()])
+        out.append(f'<path class="c{ids[order[s]]}" d="{d}"/>\n')
+    return ''.join(out)
+
+
+def _chunk_labels(tree, view, a, b, show_sizes, show_times, search_target, fate_labels,
+                  angle_labels, highlight):
+    """The tree_labels of cells a..b-1 as <text> elements."""
+    cells = np.arange(a, b)
+    x, y, length = tree.x, tree.y, tree.length
+    split = x[a:b] + length[a:b]
+    fc = tree.first_child[a:b]
+    ns = tree.next_sibling
+    table = tree.names
+    names = [table[k] if k >= 0 else None for k in tree.name_id[a:b].tolist()]
+    out = []
+
+    def emit(px, py, texts, style):
+        for sx, sy, s in zip(view.x(np.asarray(px, dtype=float)).tolist(),
+                             view.y(np.asarray(py, dtype=float)).tolist(), texts):
+            out.append(f'<text class="l{style}" x="{sx:.2f}" y="{sy:.2f}">{escape(str(s))}</text>\n')
+
+    internal = fc >= 0
+    if show_sizes:
+        # Size split of cells with exactly two daughters, as in tree_labels
+        c1 = np.maximum(fc, 0)
+        c2 = ns[c1]
+        total = length[c1] + length[np.maximum(c2, 0)]
+        two = internal & (c2 >= 0) & (ns[np.maximum(c2, 0)] < 0) & (total > 0)
+        c1, c2 = c1[two], c2[two]
+        p1 = [int(v) for v in (length[c1] / total[two] * 100).tolist()]
+        emit(split[two] + 1, y[c1] + 0.5, [f"{p}%" for p in p1], SIZE)
+        emit(split[two] + 1, y[c2] - 0.5, [f"{100 - p}%" for p in p1], SIZE)
+    if angle_labels:
+        rows = [k for k in np.flatnonzero(internal).tolist() if names[k] in angle_labels]
+        emit(split[rows], y[cells[rows]] + 0.8, [f"{angle_labels[names[k]]:.1f}°" for k in rows], ANGLE)
+    if show_times:
+        rows = np.flatnonzero(internal)
+        emit(split[rows], y[cells[rows]] + 1.5, [f"{int(v)} min" for v in length[cells[rows]].tolist()], TIME)
+
+    named = [k for k, name in enumerate(names) if name and not pd.isna(name)]
+    if highlight is not None:
+        hit = highlight[a:b]
+    else:
+        hit = np.array([name == search_target for name in names], dtype=bool)
+    for style, rows in ((NAME, [k for k in named if not hit[k]]), (HIGHLIGHT, [k for k in named if hit[k]])):
+        emit(x[cells[rows]] - 1.5, y[cells[rows]], [names[k] for k in rows], style)
+    if fate_labels:
+        rows = [k for k in named if names[k] in fate_labels]
+        emit(split[rows] + 1, y[cells[rows]], [fate_labels[names[k]] for k in rows], FATE)
+    return ''.join(out)
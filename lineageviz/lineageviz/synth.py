@@ -0,0 +1,132 @@
+import csv
+import heapq
+import json
+import os
+
+import numpy as np
+
+COLUMNS = ("parent", "left_child", "right_child", "time", "left_volume", "right_volume", "division_angle")
+KINDS = ("balanced", "stem", "random")
+
+
+def synthetic_divisions(n_cells, kind="balanced", seed=0, cycle=10.0):
+    """
+    Generate a synthetic binary lineage as a division table.
+
+    Parameters:
+    - n_cells: approximate number of cells (rounded to an odd count)
+    - kind: 'balanced' (every cell divides, generation by generation),
+      'stem' (an asymmetric stem-cell chain: one daughter keeps dividing)
+      or 'random' (each cell divides after an exponential cycle time, the
+      earliest first, so clades grow unevenly)
+    - seed: random seed for times, volume splits and division angles
+    - cycle: mean cell-cycle length
+
+    Returns a dict of equal-length columns (see COLUMNS), rows in division
+    time order. The root is 'P0', other cells are 'c<index>'.
+    """
+    if kind not in KINDS:
+        raise ValueError(f"Unknown lineage kind {kind!r}; expected one of {KINDS}")
+    rng = np.random.default_rng(seed)
+    n_div = max((int(n_cells) - 1) // 2, 1)
+
+    if kind == "balanced":
+        divider = np.arange(n_div)
+        depth = np.floor(np.log2(divider + 1))
+        time = (depth + 1) * cycle + rng.uniform(-0.1, 0.1, n_div) * cycle
+        time = np.maximum.accumulate(time)
+    elif kind == "stem":
+        divider = np.concatenate(([0], 2 * np.arange(1, n_div) - 1))
+        time = np.cumsum(cycle * rng.uniform(0.8, 1.2, n_div))
+    else:
+        divider, time = _random_divisions(n_div, rng, cycle)
+
+    left = 2 * np.arange(n_div) + 1
+    right = left + 1
+    split = rng.uniform(0.35, 0.65, n_div)  # daughter volumes relative to the parent
+
+    names = np.array(["P0"] + [f"c{i}" for i in range(1, 2 * n_div + 1)], dtype=object)
+    return {
+        "parent": names[divider],
+        "left_child": names[left],
+        "right_child": names[right],
+        "time": np.round(time, 3),
+        "left_volume": np.round(split, 4),
+        "right_volume": np.round(1 - split, 4),
+        "division_angle": rng.integers(0, 180, n_div),
+    }
+
+
+def _random_divisions(n_div, rng, cycle):
+    """Event-driven growth: the cell with the earliest division time divides next."""
+    waits = rng.exponential(cycle, 2 * n_div + 1).tolist()
+    queue = [(waits[0], 0)]
+    divider, time = [], []
+    next_cell = 1
+    while len(divider) < n_div:
+        t, cell = heapq.heappop(queue)
+        divider.append(cell)
+        time.append(t)
+        for child in (next_cell, next_cell + 1):
+            heapq.heappush(queue, (t + waits[child], child))
+        next_cell += 2
+    return np.asarray(divider), np.asarray(time)
+
+
+def divisions_to_newick(divisions):
+    """Serialize a division table as one Newick++ tree (iteratively)."""
+    rows = {p: i for i, p in enumerate(divisions["parent"].tolist())}
+    left = divisions["left_child"].tolist()
+    right = divisions["right_child"].tolist()
+    time = divisions["time"].tolist()
+    lv = divisions["left_volume"].tolist()
+    rv = divisions["right_volume"].tolist()
+    volume = {}
+    for l, r, a, b in zip(left, right, lv, rv):
+        volume[l] = a
+        volume[r] = b
+
+    out = []
+    # ('open', cell) emits the subtree; ('label', text) closes an internal cell
+    stack = [("open", divisions["parent"][0])]
+    while stack:
+        op, item = stack.pop()
+        if op == "label":
+            out.append(item)
+            continue
+        if item == ",":
+            out.append(",")
+            continue
+        i = rows.get(item)
+        if i is None:
+            out.append(f"{item}:{volume.get(item, 0.0)}@0.5")
+            continue
+        offset = rv[i] / (lv[i] + rv[i])
+        out.append("(")
+        stack.append(("label", f"){item}:{time[i]}@{offset:.6g}"))
+        stack.append(("open", right[i]))
+        stack.append(("open", ","))
+        stack.append(("open", left[i]))
+    return "".join(out) + ";"
+
+
+def write_lineage(divisions, filename):
+    """Write a division table as CSV, JSON or Newick++ (by file extension)."""
+    ext = os.path.splitext(filename)[1].lower()
+    if ext in (".nwk", ".newick", ".tree"):
+        with open(filename, "w") as f:
+            f.write(divisions_to_newick(divisions))
+        return filename
+    columns = [c for c in COLUMNS if c in divisions]
+    values = [divisions[c].tolist() for c in columns]
+    if ext == ".csv":
+        with open(filename, "w", newline="") as f:
+            writer = csv.writer(f)
+            writer.writerow(columns)
+            writer.writerows(zip(*values))
+    elif ext == ".json":
+        with open(filename, "w") as f:
+            json.dump([dict(zip(columns, row)) for row in zip(*values)], f)
+    else:
+        raise ValueError(f"Unsupported lineage format: {ext or filename}")
+    return filename
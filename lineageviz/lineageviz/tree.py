@@ -1,3 +1,6 @@
+import numpy as np
+
+
 class Node:
     def __init__(self, name=None, length=0.0, offset=0.5, children=None):
         self.name = name
@@ -8,4 +11,403 @@ class Node:
         self.y = None  # for plotting
 
     def __repr__(self):
-        return f"Node(name={self.name}, length={self.length}, offset={self.offset}, children={len(self.children)})"
\ No newline at end of file
+        return f"Node(name={self.name}, length={self.length}, offset={self.offset}, children={len(self.children)})"
+
+
+def flatten(root):
+    """
+    Walk a Node tree in preorder without recursion.
+
+    Returns (nodes, parent): the Node objects in preorder and, for each one,
+    the preorder index of its parent (-1 for the root).
+    """
+    nodes, parent = [], []
+    stack = [(root, -1)]
+    while stack:
+        n, p = stack.pop()
+        index = len(nodes)
+        nodes.append(n)
+        parent.append(p)
+        for child in reversed(n.children):
+            stack.append((child, index))
+    return nodes, parent
+
+
+def _preorder(root, children, starts):
+    """
+    Cells below root in preorder, where children[starts[i]:starts[i + 1]]
+    are the children of cell i. Kept separate so the Python lists of the
+    walk are freed before the caller goes on.
+    """
+    children = children.tolist()
+    starts = starts.tolist()
+    preorder = []
+    stack = [root]
+    while stack:
+        i = stack.pop()
+        preorder.append(i)
+        stack.extend(reversed(children[starts[i]:starts[i + 1]]))
+    return np.asarray(preorder, dtype=np.int64)
+
+
+def intern_names(names):
+    """
+    Map a sequence of cell names onto an interned name table.
+
+    Returns (name_id, table) where table[name_id[i]] == names[i]; None maps
+    to -1.
+    """
+    lookup = {}
+    ids = np.fromiter((lookup.setdefault(name, len(lookup)) for name in names),
+                      dtype=np.int32, count=len(names))
+    none = lookup.pop(None, None)
+    if none is not None:
+        ids = np.where(ids == none, -1, ids - (ids > none)).astype(np.int32)
+    table = list(lookup)
+    return ids, table
+
+
+class LineageArray:
+    """
+    Columnar, array-backed lineage tree.
+
+    Cells are stored in preorder: the root is index 0 and every subtree is the
+    contiguous slice [i, subtree_end[i]). Structure lives in int32 arrays
+    (parent, first_child, last_child, next_sibling), per-cell values in
+    float64 arrays (length, offset, x, y) and names in an interned table
+    indexed by name_id.
+    Extra per-cell columns (e.g. volume, fate) can be carried in `data`.
+
+    Parameters:
+    - parent: preorder parent index per cell (-1 for the root)
+    - length, offset: branch length and child-extent offset per cell
+    - name_id: index into `names` per cell (-1 for unnamed cells)
+    - names: interned name table
+    - x, y: optional coordinates (NaN until laid out)
+    - data: optional dict of extra per-cell arrays
+    """
+
+    def __init__(self, parent, length, offset, name_id, names, x=None, y=None, data=None):
+        self.parent = np.asarray(parent, dtype=np.int32)
+        n = len(self.parent)
+        if n == 0 or self.parent[0] != -1:
+            raise ValueError("LineageArray needs a root at index 0")
+        if n > 1 and not np.all(self.parent[1:] < np.arange(1, n)):
+            raise ValueError("LineageArray cells must be stored in preorder")
+        self.length = np.asarray(length, dtype=np.float64)
+        self.offset = np.asarray(offset, dtype=np.float64)
+        self.name_id = np.asarray(name_id, dtype=np.int32)
+        self.names = list(names)
+        self.x = np.full(n, np.nan) if x is None else np.asarray(x, dtype=np.float64)
+        self.y = np.full(n, np.nan) if y is None else np.asarray(y, dtype=np.float64)
+        self.data = dict(data) if data else {}
+
+        # In preorder a cell's first child, if any, immediately follows it.
+        self.first_child = np.full(n, -1, dtype=np.int32)
+        has_child = self.parent[1:] == np.arange(n - 1)
+        self.first_child[:-1][has_child] = np.flatnonzero(has_child) + 1
+
+        # Siblings share a parent; a stable sort keeps them in preorder.
+        self.next_sibling = np.full(n, -1, dtype=np.int32)
+        order = np.argsort(self.parent, kind="stable").astype(np.int32)
+        same = self.parent[order[1:]] == self.parent[order[:-1]]
+        self.next_sibling[order[:-1][same]] = order[1:][same]
+
+        self.last_child = np.full(n, -1, dtype=np.int32)
+        is_last = self.next_sibling < 0
+        is_last[0] = False
+        self.last_child[self.parent[is_last]] = np.flatnonzero(is_last)
+
+        self._subtree_end = None
+        self._name_index = None
+
+    # --- Construction ---
+
+    @classmethod
+    def from_node(cls, root):
+        """Build a LineageArray from a Node tree (copies values, not objects)."""
+        nodes, parent = flatten(root)
+        name_id, names = intern_names([n.name for n in nodes])
+        x = [np.nan if n.x is None else n.x for n in nodes]
+        y = [np.nan if n.y is None else n.y for n in nodes]
+        return cls(parent,
+                   [n.length for n in nodes],
+                   [n.offset for n in nodes],
+                   name_id, names, x=x, y=y)
+
+    @classmethod
+    def from_parent_array(cls, parent, length, offset, names, root=0, data=None, sibling_key=None):
+        """
+        Build a LineageArray from cells in any order.
+
+        Parameters:
+        - parent: parent index per cell (-1 or any negative value for roots)
+        - length, offset: per-cell values
+        - names: per-cell names (not interned)
+        - root: index of the cell to use as root; cells not below it are dropped
+        - data: optional dict of extra per-cell arrays, reordered alongside
+        - sibling_key: optional per-cell sort key for children of the same
+          parent
+
+        Children keep their relative input order unless sibling_key is given.
+        """
+        parent = np.array(parent, dtype=np.int64)
+        parent[root] = -1
+        n = len(parent)
+        if sibling_key is None:
+            order = np.argsort(parent, kind="stable")
+        else:
+            order = np.lexsort((sibling_key, parent))
+        has_parent = parent[order] >= 0
+        order = order[has_parent]
+        counts = np.bincount(parent[order], minlength=n)
+        starts = np.concatenate(([0], np.cumsum(counts)))
+
+        preorder = _preorder(root, order, starts)
+
+        remap = np.full(n, -1, dtype=np.int64)
+        remap[preorder] = np.arange(len(preorder))
+        new_parent = np.where(parent[preorder] >= 0, remap[np.maximum(parent[preorder], 0)], -1)
+        new_parent[0] = -1
+
+        names = list(names)
+        name_id, table = intern_names([names[i] for i in preorder.tolist()])
+        data = {key: np.asarray(col)[preorder] for key, col in (data or {}).items()}
+        return cls(new_parent,
+                   np.asarray(length, dtype=np.float64)[preorder],
+                   np.asarray(offset, dtype=np.float64)[preorder],
+                   name_id, table, data=data)
+
+    def take(self, cells):
+        """
+        The sub-lineage made of `cells`, which must be sorted, include the
+        root and contain the parent of every other cell in it. Names, layout
+        and data columns are carried over.
+        """
+        cells = np.asarray(cells, dtype=np.int64)
+        if len(cells) == 0 or cells[0] != 0:
+            raise ValueError("take() needs the root cell")
+        parent = np.searchsorted(cells, self.parent[cells])
+        parent[0] = -1
+        data = {key: np.asarray(col)[cells] for key, col in self.data.items()}
+        return LineageArray(parent, self.length[cells], self.offset[cells], self.name_id[cells],
+                            self.names, x=self.x[cells], y=self.y[cells], data=data)
+
+    def insert_children(self, cell, names, length, offset):
+        """
+        A copy with new children appended after the existing children of
+        `cell`. Their data columns are NaN (None for object columns) and
+        they are not laid out.
+        """
+        k = len(names)
+        at = self.subtree_end_of(cell)
+        shift = lambda a: np.where(a >= at, a + k, a)
+        parent = np.insert(shift(self.parent.astype(np.int64)), at, np.full(k, cell))
+        name_id = np.insert(self.name_id, at, np.arange(len(self.names), len(self.names) + k))
+        data = {key: np.insert(np.asarray(col), at, [_missing(col)] * k) for key, col in self.data.items()}
+        return LineageArray(parent,
+                            np.insert(self.length, at, length),
+                            np.insert(self.offset, at, offset),
+                            name_id, self.names + list(names),
+                            x=np.insert(self.x, at, np.full(k, np.nan)),
+                            y=np.insert(self.y, at, np.full(k, np.nan)),
+                            data=data)
+
+    def remove_descendants(self, cell):
+        """A copy without the descendants of `cell`, which becomes a leaf."""
+        end = self.subtree_end_of(cell)
+        keep = np.concatenate((np.arange(cell + 1), np.arange(end, len(self))))
+        return self.take(keep)
+
+    def to_node(self):
+        """Materialize the tree as Node objects; returns the root Node."""
+        names = self.names
+        x = self.x.tolist()
+        y = self.y.tolist()
+        nodes = [
+            Node(name=names[j] if j >= 0 else None, length=length, offset=offset)
+            for j, length, offset in zip(self.name_id.tolist(), self.length.tolist(), self.offset.tolist())
+        ]
+        for node, xi, yi in zip(nodes, x, y):
+            node.x = None if xi != xi else xi
+            node.y = None if yi != yi else yi
+        for i, p in enumerate(self.parent.tolist()):
+            if p >= 0:
+                nodes[p].children.append(nodes[i])
+        return nodes[0]
+
+    # --- Queries ---
+
+    def __len__(self):
+        return len(self.parent)
+
+    def __repr__(self):
+        return f"LineageArray(cells={len(self)}, root={self.name(0)})"
+
+    @property
+    def root(self):
+        return NodeView(self, 0)
+
+    def node(self, index):
+        return NodeView(self, index)
+
+    def name(self, index):
+        j = self.name_id[index]
+        return self.names[j] if j >= 0 else None
+
+    def cell_names(self):
+        """Per-cell names as a list (None for unnamed cells)."""
+        table = self.names + [None]
+        return [table[j] for j in self.name_id.tolist()]
+
+    def index_of(self, name):
+        """Preorder index of the cell called `name` (KeyError if absent)."""
+        if self._name_index is None:
+            index = {}
+            for i, j in enumerate(self.name_id.tolist()):
+                if j >= 0:
+                    index.setdefault(self.names[j], i)
+            self._name_index = index
+        return self._name_index[name]
+
+    def is_leaf(self):
+        return self.first_child < 0
+
+    def children(self, index):
+        out = []
+        c = self.first_child[index]
+        while c >= 0:
+            out.append(int(c))
+            c = self.next_sibling[c]
+        return out
+
+    @property
+    def subtree_end(self):
+        """Exclusive end of each cell's preorder subtree slice."""
+        if self._subtree_end is None:
+            n = len(self)
+            size = [1] * n
+            parent = self.parent.tolist()
+            for i in range(n - 1, 0, -1):
+                size[parent[i]] += size[i]
+            self._subtree_end = np.arange(n, dtype=np.int64) + np.asarray(size, dtype=np.int64)
+        return self._subtree_end
+
+    def subtree_end_of(self, cell):
+        """subtree_end[cell] without computing it for every cell."""
+        if self._subtree_end is not None:
+            return int(self._subtree_end[cell])
+        # The first later cell hanging off an earlier cell closes the subtree
+        outside = np.flatnonzero(self.parent[cell + 1:] < cell)
+        return cell + 1 + int(outside[0]) if len(outside) else len(self)
+
+    def postorder(self):
+        """Cell indices in postorder (children before parents, siblings in order)."""
+        n = len(self)
+        rank = np.arange(n) - self.depth() + (self.subtree_end - np.arange(n)) - 1
+        order = np.empty(n, dtype=np.int64)
+        order[rank] = np.arange(n)
+        return order
+
+    def depth(self):
+        """Number of ancestors of each cell."""
+        parent = self.parent.tolist()
+        d = [0] * len(self)
+        for i in range(1, len(self)):
+            d[i] = d[parent[i]] + 1
+        return np.asarray(d, dtype=np.int32)
+
+
+def _missing(col):
+    col = np.asarray(col)
+    if col.dtype == object:
+        return None
+    if np.issubdtype(col.dtype, np.floating):
+        return np.nan
+    return 0
+
+
+class NodeView:
+    """
+    Node-compatible view onto one cell of a LineageArray.
+
+    Reads and writes go straight to the underlying arrays, so code written
+    against Node (name, length, offset, children, x, y) works on array-backed
+    trees without copying.
+    """
+
+    __slots__ = ("tree", "index")
+
+    def __init__(self, tree, index):
+        self.tree = tree
+        self.index = int(index)
+
+    def __eq__(self, other):
+        return isinstance(other, NodeView) and other.tree is self.tree and other.index == self.index
+
+    def __hash__(self):
+        return hash((id(self.tree), self.index))
+
+    @property
+    def name(self):
+        return self.tree.name(self.index)
+
+    @name.setter
+    def name(self, value):
+        tree = self.tree
+        if value is None:
+            tree.name_id[self.index] = -1
+        else:
+            try:
+                j = tree.names.index(value)
+            except ValueError:
+                j = len(tree.names)
+                tree.names.append(value)
+            tree.name_id[self.index] = j
+        tree._name_index = None
+
+    @property
+    def length(self):
+        return float(self.tree.length[self.index])
+
+    @length.setter
+    def length(self, value):
+        self.tree.length[self.index] = value
+
+    @property
+    def offset(self):
+        return float(self.tree.offset[self.index])
+
+    @offset.setter
+    def offset(self, value):
+        self.tree.offset[self.index] = value
+
+    @property
+    def x(self):
+        v = float(self.tree.x[self.index])
+        return None if v != v else v
+
+    @x.setter
+    def x(self, value):
+        self.tree.x[self.index] = np.nan if value is None else value
+
+    @property
+    def y(self):
+        v = float(self.tree.y[self.index])
+        return None if v != v else v
+
+    @y.setter
+    def y(self, value):
+        self.tree.y[self.index] = np.nan if value is None else value
+
+    @property
+    def children(self):
+        return [NodeView(self.tree, c) for c in self.tree.children(self.index)]
+
+    @property
+    def parent(self):
+        p = self.tree.parent[self.index]
+        return NodeView(self.tree, p) if p >= 0 else None
+
+    def __repr__(self):
+        return f"Node(name={self.name}, length={self.length}, offset={self.offset}, children={len(self.children)})"
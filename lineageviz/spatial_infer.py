@@ -1,10 +1,17 @@
 # spatial_infer.py
 import numpy as np
+from lineageviz.profiling import timed
 
 def normalize(v):
     norm = np.linalg.norm(v)
     return v / norm if norm > 0 else v
 
+def normalize_rows(v):
+    """normalize for each row of an (n, 3) array; zero rows are kept."""
+    # Batched matmul reproduces np.linalg.norm / R @ v bit for bit
+    norm = np.sqrt(np.matmul(v[:, None, :], v[:, :, None])[:, 0])
+    return np.where(norm > 0, v / np.where(norm > 0, norm, 1), v)
+
 def infer_daughter_positions(parent_pos, division_angle_deg, prev_vector=None, 
                              volume_left=0.5, volume_right=0.5, shape='sphere'):
     """
@@ -24,18 +31,20 @@ def infer_daughter_positions(parent_pos, division_angle_deg, prev_vector=None,
         prev_vector = np.array([0, 0, 1])
     else:
         prev_vector = normalize(np.array(prev_vector))
+    ux, uy, uz = prev_vector.tolist()
 
-    # Create an arbitrary orthogonal vector
-    if np.allclose(prev_vector, [0, 0, 1]):
+    # Create an arbitrary orthogonal vector. The comparisons and the cross
+    # product with the z-axis are written out on floats; they are exactly
+    # np.allclose(prev_vector, z) and np.cross(prev_vector, z), minus the
+    # call overhead that dominates when positioning long stem-cell chains.
+    if abs(ux) <= 1e-8 and abs(uy) <= 1e-8 and abs(uz - 1) <= 1e-8 + 1e-5:
         ortho = np.array([1, 0, 0])
     else:
-        ortho = normalize(np.cross(prev_vector, [0, 0, 1]))
+        ortho = normalize(np.array([uy * 1.0 - uz * 0.0, uz * 0.0 - ux * 1.0, ux * 0.0 - uy * 0.0]))
 
     # Rotate ortho around prev_vector by angle_rad to get division vector
-    axis = prev_vector
     cos_theta = np.cos(angle_rad)
     sin_theta = np.sin(angle_rad)
-    ux, uy, uz = axis
     R = np.array([
         [cos_theta + ux**2 * (1 - cos_theta),      ux*uy*(1 - cos_theta) - uz*sin_theta, ux*uz*(1 - cos_theta) + uy*sin_theta],
         [uy*ux*(1 - cos_theta) + uz*sin_theta, cos_theta + uy**2 * (1 - cos_theta),      uy*uz*(1 - cos_theta) - ux*sin_theta],
@@ -44,8 +53,8 @@ def infer_daughter_positions(parent_pos, division_angle_deg, prev_vector=None,
     div_vector = normalize(R @ ortho)
 
     # Distance between daughters based on radii
-    rL = (3 * volume_left / (4 * np.pi)) ** (1/3)
-    rR = (3 * volume_right / (4 * np.pi)) ** (1/3)
+    rL = np.cbrt(3 * volume_left / (4 * np.pi))
+    rR = np.cbrt(3 * volume_right / (4 * np.pi))
     separation = rL + rR + 0.2  # add small buffer
 
     offset_vector = div_vector * (separation / 2)
@@ -56,22 +65,132 @@ def infer_daughter_positions(parent_pos, division_angle_deg, prev_vector=None,
 
 # Optional: helper to recursively assign positions to a tree
 def position_tree(tree, root_name='P0', parent_pos=(0,0,0), prev_vector=None):
-    positions = {root_name: parent_pos}
-    queue = [(root_name, parent_pos, prev_vector)]
-
-    while queue:
-        parent, ppos, prev = queue.pop(0)
-        node = tree.get(parent, {})
-        daughters = node.get("daughters", [])
-        if len(daughters) == 2:
-            l, r = daughters
-            angle = node.get("division_angle", 90)
-            volL = node.get("left_volume", 0.5)
-            volR = node.get("right_volume", 0.5)
-            lp, rp = infer_daughter_positions(ppos, angle, prev, volL, volR)
-            positions[l] = lp
-            positions[r] = rp
-            queue.append((l, lp, np.array(rp) - np.array(lp)))
-            queue.append((r, rp, np.array(lp) - np.array(rp)))
-
-    return positions
+    names, positions = position_tree_array(tree, root_name, parent_pos, prev_vector)
+    out = {root_name: parent_pos}
+    for name, pos in zip(names[1:], positions[1:]):
+        out[name] = tuple(pos)
+    return out
+
+# Below this many divisions in a generation, per-division calls beat one
+# batched call (same cut-off idea as layout._MIN_LEVEL_WIDTH).
+_MIN_BATCH = 6
+
+@timed
+def position_tree_array(tree, root_name='P0', parent_pos=(0,0,0), prev_vector=None):
+    """
+    Positions every cell reachable from root_name, one generation at a time.
+
+    All divisions of a generation are inferred together by
+    infer_daughter_positions_batch, so the per-division Python work is just
+    the dictionary lookup; generations with only a few divisions call
+    infer_daughter_positions directly. Cells come out in breadth-first
+    order (the order position_tree has always used).
+    Returns: (names, positions) with positions an (N, 3) float array
+    """
+    names = [root_name]
+    blocks = [np.asarray(parent_pos, dtype=float).reshape(1, 3)]
+    frontier = [root_name]
+    frontier_pos = blocks[0]
+    frontier_prev = None if prev_vector is None else np.asarray(prev_vector, dtype=float).reshape(1, 3)
+    expanded = set()
+
+    while frontier:
+        rows, left, right, angles, vol_l, vol_r = [], [], [], [], [], []
+        for k, parent in enumerate(frontier):
+            node = tree.get(parent, {})
+            daughters = node.get("daughters", [])
+            if len(daughters) == 2 and parent not in expanded:
+                expanded.add(parent)
+                rows.append(k)
+                left.append(daughters[0])
+                right.append(daughters[1])
+                angles.append(node.get("division_angle", 90))
+                vol_l.append(node.get("left_volume", 0.5))
+                vol_r.append(node.get("right_volume", 0.5))
+        if not rows:
+            break
+
+        if len(rows) < _MIN_BATCH:
+            # Narrow generations (e.g. stem-cell chains): per-division calls
+            # beat the fixed cost of the batched array math.
+            pairs = [infer_daughter_positions(frontier_pos[k], a,
+                                              None if frontier_prev is None else frontier_prev[k], vl, vr)
+                     for k, a, vl, vr in zip(rows, angles, vol_l, vol_r)]
+            lp = np.array([pair[0] for pair in pairs], dtype=float)
+            rp = np.array([pair[1] for pair in pairs], dtype=float)
+        else:
+            rows = np.asarray(rows)
+            prev = None if frontier_prev is None else frontier_prev[rows]
+            lp, rp = infer_daughter_positions_batch(frontier_pos[rows], np.asarray(angles, dtype=float), prev,
+                                                    np.asarray(vol_l, dtype=float), np.asarray(vol_r, dtype=float))
+
+        # Interleave daughters (left, right, left, right, ...) like the
+        # breadth-first queue did.
+        m = len(rows)
+        frontier = [None] * (2 * m)
+        frontier[0::2] = left
+        frontier[1::2] = right
+        frontier_pos = np.empty((2 * m, 3))
+        frontier_pos[0::2] = lp
+        frontier_pos[1::2] = rp
+        frontier_prev = np.empty((2 * m, 3))
+        frontier_prev[0::2] = rp - lp
+        frontier_prev[1::2] = lp - rp
+        names.extend(frontier)
+        blocks.append(frontier_pos)
+
+    return names, np.concatenate(blocks)
+
+@timed
+def infer_daughter_positions_batch(parent_pos, division_angle_deg, prev_vector=None,
+                                   volume_left=0.5, volume_right=0.5):
+    """
+    Vectorized infer_daughter_positions for n divisions at once.
+    - parent_pos: (n, 3) array
+    - division_angle_deg: (n,) angles in degrees
+    - prev_vector: (n, 3) previous division vectors, or None for the z-axis
+    - volume_left/right: scalars or (n,) arrays
+    Returns: (left_pos, right_pos) as (n, 3) arrays
+    """
+    parent_pos = np.asarray(parent_pos, dtype=float)
+    n = len(parent_pos)
+    angle_rad = np.radians(np.broadcast_to(np.asarray(division_angle_deg, dtype=float), (n,)))
+    z = np.array([0.0, 0.0, 1.0])
+
+    if prev_vector is None:
+        prev = np.broadcast_to(z, (n, 3))
+    else:
+        prev = np.asarray(prev_vector, dtype=float)
+        prev = normalize_rows(prev)
+
+    # Arbitrary orthogonal vector, matching np.allclose(prev, z)
+    on_z = np.all(np.abs(prev - z) <= 1e-8 + 1e-5 * np.abs(z), axis=1)
+    ortho = normalize_rows(np.cross(prev, z))
+    ortho[on_z] = [1.0, 0.0, 0.0]
+
+    # Stacked Rodrigues rotations about prev by angle_rad, built entry for
+    # entry as in infer_daughter_positions
+    cos_theta = np.cos(angle_rad)
+    sin_theta = np.sin(angle_rad)
+    ux, uy, uz = prev[:, 0], prev[:, 1], prev[:, 2]
+    R = np.empty((n, 3, 3))
+    R[:, 0, 0] = cos_theta + ux**2 * (1 - cos_theta)
+    R[:, 0, 1] = ux*uy*(1 - cos_theta) - uz*sin_theta
+    R[:, 0, 2] = ux*uz*(1 - cos_theta) + uy*sin_theta
+    R[:, 1, 0] = uy*ux*(1 - cos_theta) + uz*sin_theta
+    R[:, 1, 1] = cos_theta + uy**2 * (1 - cos_theta)
+    R[:, 1, 2] = uy*uz*(1 - cos_theta) - ux*sin_theta
+    R[:, 2, 0] = uz*ux*(1 - cos_theta) - uy*sin_theta
+    R[:, 2, 1] = uz*uy*(1 - cos_theta) + ux*sin_theta
+    R[:, 2, 2] = cos_theta + uz**2 * (1 - cos_theta)
+    div_vector = normalize_rows(np.matmul(R, ortho[:, :, None])[:, :, 0])
+
+    rL = _radii(volume_left, n)
+    rR = _radii(volume_right, n)
+    separation = rL + rR + 0.2  # add small buffer
+
+    offset_vector = div_vector * (separation / 2)[:, None]
+    return parent_pos - offset_vector, parent_pos + offset_vector
+
+def _radii(volumes, n):
+    return np.cbrt(3 * np.broadcast_to(np.asarray(volumes, dtype=float), (n,)) / (4 * np.pi))
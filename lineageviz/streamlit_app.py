@@ -1,24 +1,39 @@
-
 import streamlit as st
 import pandas as pd
-import matplotlib.pyplot as plt
-import requests
-from io import StringIO
+import numpy as np
+import json
+import os
+from io import BytesIO, StringIO
+from matplotlib.figure import Figure
+from lineageviz import profiling
+from lineageviz.aggregate import fate_composition, subtree_aggregates
+from lineageviz.api import SpeciesClient, SpeciesUnavailable
+from lineageviz.importer import from_dataframe
 from lineageviz.layout import layout_tree
+from lineageviz.lifespan import LifespanIndex
 from lineageviz.plot import draw_tree
-from lineageviz.tree import Node
-from geometry_engine import plot_geometry_scene
-from spatial_infer import position_tree
+from geometry_engine import MAX_FRAMES, frame_times, plot_geometry_at, plot_geometry_timeseries
+from spatial_infer import position_tree_array
 
 st.set_page_config(layout="wide")
 st.title("🧬 Lineage Tree Visualizer")
 
+# Spans are recorded per rerun while "Profile stages" is ticked; the panel
+# at the bottom of the sidebar shows them. Each rerun gets its own
+# recording, so sessions running at the same time do not mix.
+profiling.start_recording(st.session_state.get("profile_stages", False))
+
 API_BASE = "https://cleavage-api.onrender.com"
+
+@st.cache_resource
+def species_client():
+    # One pooled session and disk cache shared by every rerun and session
+    offline = os.environ.get("LINEAGEVIZ_OFFLINE", "") not in ("", "0")
+    return SpeciesClient(API_BASE, offline=offline)
+
 try:
-    response = requests.get(f"{API_BASE}/species")
-    response.raise_for_status()
-    species_list = response.json()
-except Exception as e:
+    species_list = species_client().species()
+except SpeciesUnavailable:
     st.sidebar.warning("⚠️ Could not load species from API.")
     species_list = []
 
@@ -44,22 +59,25 @@ color_by_lineage = st.sidebar.checkbox("Color Code Lineages", value=True)
 show_fates = st.sidebar.checkbox("Show Fate Labels", value=True)
 show_angles = st.sidebar.checkbox("Show Division Angles", value=True)
 search_cell = st.sidebar.text_input("Highlight Cell")
+highlight_lineage = st.sidebar.checkbox("Highlight its descendants too", value=True)
 show_geometry = st.sidebar.checkbox("Show geometry scene")
 show_vectors = st.sidebar.checkbox("Show division vectors", value=True)
 show_planes = st.sidebar.checkbox("Show division planes", value=True)
 show_shapes = st.sidebar.checkbox("Show cell volumes", value=True)
+animate_geometry = st.sidebar.checkbox("Animate scene over time")
+if animate_geometry:
+    frame_step = st.sidebar.number_input("Frame every (min, 0 = every division)", min_value=0.0,
+                                         value=0.0, step=10.0)
+    max_frames = st.sidebar.slider("Max animation frames", 2, 200, MAX_FRAMES)
+st.sidebar.checkbox("⏱ Profile stages", key="profile_stages")
 
 if species_choice != "None":
     try:
-        response = requests.get(f"{API_BASE}/species/{species_choice}")
-        if response.status_code == 200:
-            api_df = pd.DataFrame(response.json())
-            st.session_state.lineage_data = api_df
-            st.success(f"Loaded {species_choice} from API")
-        else:
-            st.error("Failed to load species data")
-    except Exception as e:
-        st.error("Error connecting to API")
+        api_df = pd.DataFrame(species_client().lineage(species_choice))
+        st.session_state.lineage_data = api_df
+        st.success(f"Loaded {species_choice} from API")
+    except SpeciesUnavailable:
+        st.error("Failed to load species data")
 
 # === Input Help + Template ===
 with st.sidebar.expander("📄 Input Format Instructions"):
@@ -127,56 +145,119 @@ with st.form("add_division"):
         else:
             st.warning("Missing parent or daughter cell names.")
 
-# === Tree Rendering ===
-st.subheader("🌳 Lineage Tree Preview")
-rows = st.session_state.lineage_data.to_dict(orient="records")
-nodes, structure, cell_fates = {}, [], {}
+# === Cached Pipeline ===
+# Each stage is memoized on the content of the lineage table plus only the
+# parameters it depends on, so toggling a label checkbox re-renders without
+# re-parsing or re-laying out, and the geometry positions are computed once
+# per table. The time slider only queries a LifespanIndex built once per
+# table instead of re-filtering rows. Stages returning trees, indexes or
+# figures use st.cache_resource, which hands back the cached object instead
+# of pickling it on every hit; callers must treat those results as
+# read-only.
 LINEAGE_COLORS = {
     "AB": "#0066cc", "P1": "#cc3300", "MS": "#009966", "E": "#ffcc00",
     "C": "#9933cc", "D": "#666666", "P4": "#cc6699", "others": "gray"
 }
-for row in rows:
+
+@st.cache_resource(max_entries=16)
+def parse_stage(lineage_df):
+    """
+    Lineage table -> (LifespanIndex over the full LineageArray, fate labels,
+    angle labels, ImportReport), or None. The tree carries each cell's
+    division time and the volume it was born with as data columns; rows with
+    missing names, non-numeric values or non-positive volumes are left out
+    and listed in the report.
+    """
     try:
-        parent, left, right = row['parent'], row['left_child'], row['right_child']
-        time = float(row['time'])
-        lv, rv = float(row['left_volume']), float(row['right_volume'])
-        fate = row.get('fate', '')
-        if not all([parent, left, right]) or lv <= 0 or rv <= 0 or time > time_limit:
-            continue
-        offset = rv / (lv + rv) if (lv + rv) > 0 else 0.5
-        nodes[left] = Node(name=left, length=lv, offset=0.5)
-        nodes[right] = Node(name=right, length=rv, offset=0.5)
-        if fate:
-            cell_fates[left] = fate
-            cell_fates[right] = fate
-        structure.append((parent, nodes[left], nodes[right], time, offset))
-    except Exception:
-        continue
-if structure:
-    for parent, left, right, time, offset in reversed(structure):
-        p = nodes.get(parent, Node(name=parent))
-        p.length = time
-        p.offset = offset
-        p.children = [left, right]
-        nodes[parent] = p
-    root = nodes[structure[0][0]]
-    root.name = structure[0][0]
-    layout_tree(root, level_height=2)
-    fig, ax = plt.subplots(figsize=(14, 6))
-    angle_labels = {row["parent"]: row["division_angle"] for row in rows if "division_angle" in row and pd.notna(row["division_angle"])}
-    draw_tree(root, ax,
+        tree, report = from_dataframe(lineage_df, skip_non_positive=True)
+    except ValueError:
+        return None
+    fates = tree.data.get("fate")
+    cell_fates = {} if fates is None else {
+        name: fate for name, fate in zip(tree.cell_names(), fates.tolist()) if fate is not None}
+    angle_labels = {}
+    if "division_angle" in lineage_df.columns:
+        angles = lineage_df[["parent", "division_angle"]].dropna()
+        angle_labels = dict(zip(angles["parent"], angles["division_angle"]))
+    return LifespanIndex.from_tree(tree), cell_fates, angle_labels, report
+
+def import_issues(report):
+    """One-line summary of what the ImportReport found wrong with the table."""
+    issues = [f"{len(report.bad_rows)} unreadable rows" if report.bad_rows else "",
+              f"{len(report.non_positive_volumes)} rows with non-positive volumes"
+              if report.non_positive_volumes else "",
+              f"{len(report.duplicate_parents)} repeated parents" if report.duplicate_parents else "",
+              f"{len(report.multiple_parents)} cells with several parents" if report.multiple_parents else "",
+              f"{len(report.cycles)} cycles" if report.cycles else "",
+              f"{len(report.orphans)} cells not connected to {report.root}" if report.orphans else ""]
+    return "Lineage table issues: " + "; ".join(i for i in issues if i) + "."
+
+@st.cache_resource(max_entries=32)
+def layout_stage(lineage_df, time_cutoff, level_height=2):
+    parsed = parse_stage(lineage_df)
+    if parsed is None:
+        return None
+    lifespans, cell_fates, angle_labels, _ = parsed
+    tree = lifespans.subtree_up_to(time_cutoff)
+    if tree is None or len(tree) == 1:
+        return None
+    # Cells dividing after the cutoff are drawn as leaves sized by volume
+    pending = ~(tree.data["time"] <= time_cutoff)
+    tree.length[pending] = tree.data["volume"][pending]
+    tree.offset[pending] = 0.5
+    layout_tree(tree, level_height=level_height)
+    return tree, cell_fates, angle_labels
+
+@st.cache_data(max_entries=64)
+def render_stage(lineage_df, time_cutoff, show_sizes, show_times, show_axis, color_by_lineage,
+                 show_fates, show_angles, search_cell, highlight_lineage=False):
+    """Draw the laid-out tree and return it as PNG bytes (None if empty)."""
+    laid_out = layout_stage(lineage_df, time_cutoff)
+    if laid_out is None:
+        return None
+    tree, cell_fates, angle_labels = laid_out
+    fig = Figure(figsize=(14, 6))
+    ax = fig.subplots()
+    draw_tree(tree, ax,
               show_sizes=show_sizes,
               show_times=show_times,
               show_time_axis=show_axis,
               color_map=LINEAGE_COLORS if color_by_lineage else None,
               search_target=search_cell,
               fate_labels=cell_fates if show_fates else None,
-              angle_labels=angle_labels if show_angles else None)
+              angle_labels=angle_labels if show_angles else None,
+              highlight_lineage=highlight_lineage)
     ax.get_yaxis().set_visible(False)
-    st.pyplot(fig)
+    buf = BytesIO()
+    fig.savefig(buf, format="png", bbox_inches="tight", dpi=200)  # st.pyplot's defaults
+    return buf.getvalue()
 
-# === Geometry Scene ===
-def build_cell_data_with_inference(lineage_df, time_cutoff):
+@st.cache_data(max_entries=64)
+def lineage_summary(lineage_df, time_cutoff, cell):
+    """Sub-lineage aggregates of `cell` (cells, terminal cells, generations, fates)."""
+    laid_out = layout_stage(lineage_df, time_cutoff)
+    if laid_out is None:
+        return None
+    tree, cell_fates, _ = laid_out
+    try:
+        i = tree.index_of(cell)
+    except KeyError:
+        return None
+    agg = subtree_aggregates(tree)
+    categories, counts = fate_composition(tree, cell_fates)
+    summary = {
+        "Cells": int(agg["cells"][i]),
+        "Terminal cells": int(agg["terminal_cells"][i]),
+        "Generations below": int(agg["height"][i]),
+    }
+    for fate, count in zip(categories, counts[i].tolist()):
+        if count:
+            summary[f"Fate: {fate}"] = count
+    return summary
+
+@st.cache_resource(max_entries=16)
+def positions_stage(lineage_df):
+    """Inferred 3D positions of every cell, independent of the time cutoff."""
     tree = {}
     birth_times = {"P0": 0.0}
     death_times = {}
@@ -194,17 +275,75 @@ def build_cell_data_with_inference(lineage_df, time_cutoff):
         }
         birth_times[l], birth_times[r] = div_time, div_time
         death_times[p] = div_time
-    positions = position_tree(tree, root_name='P0', parent_pos=(0, 0, 0))
-    visible = [name for name in positions if birth_times.get(name, 0) <= time_cutoff < death_times.get(name, float('inf'))]
-    return pd.DataFrame([{ "name": name, "x": x, "y": y, "z": z, "volume": tree.get(name, {}).get("left_volume", 0.5) } for name, (x, y, z) in positions.items() if name in visible])
+    names, positions = position_tree_array(tree, root_name='P0', parent_pos=(0, 0, 0))
+    births = np.array([birth_times.get(name, 0) for name in names], dtype=float)
+    deaths = np.array([death_times.get(name, np.inf) for name in names], dtype=float)
+    cells = pd.DataFrame({
+        "name": names,
+        "x": positions[:, 0], "y": positions[:, 1], "z": positions[:, 2],
+        "volume": [tree.get(name, {}).get("left_volume", 0.5) for name in names],
+        "shape": [tree.get(name, {}).get("shape") for name in names],
+        "elongation_axis": [tree.get(name, {}).get("elongation_axis") for name in names],
+        "daughters": [tree.get(name, {}).get("daughters") for name in names],
+    })
+    return cells, LifespanIndex(births, deaths)
+
+@st.cache_resource(max_entries=16)
+def timeseries_stage(lineage_df, show_vectors, show_planes, show_shapes, step, max_frames):
+    """
+    The geometry scene animated in the browser, one frame per division
+    event (or per `step` minutes) thinned to at most max_frames. Returns
+    (figure, frames shown, frame times before thinning).
+    """
+    cells, lifespans = positions_stage(lineage_df)
+    times = frame_times(lifespans, step, max_frames)
+    fig = plot_geometry_timeseries(cells, lifespans, times=times, show_vectors=show_vectors,
+                                   show_planes=show_planes, show_spheres=show_shapes)
+    return fig, len(times), len(frame_times(lifespans, step))
 
+# === Tree Rendering ===
+st.subheader("🌳 Lineage Tree Preview")
+parsed = parse_stage(st.session_state.lineage_data)
+with profiling.span("app.tree_preview"):
+    tree_png = render_stage(st.session_state.lineage_data, time_limit, show_sizes, show_times, show_axis,
+                            color_by_lineage, show_fates, show_angles, search_cell, highlight_lineage)
+    if tree_png is not None:
+        st.image(tree_png, use_container_width=True)
+    if parsed is not None and not parsed[3].ok:
+        st.warning(import_issues(parsed[3]))
+    if search_cell:
+        summary = lineage_summary(st.session_state.lineage_data, time_limit, search_cell)
+        if summary:
+            st.caption(f"Sub-lineage of {search_cell}: " + ", ".join(f"{k} {v}" for k, v in summary.items()))
+
+# === Geometry Scene ===
 if show_geometry:
-    cell_data = build_cell_data_with_inference(st.session_state.lineage_data, time_limit)
-    fig_geo = plot_geometry_scene(cell_data, show_vectors, show_planes, show_shapes)
-    st.plotly_chart(fig_geo, use_container_width=True)
+    if animate_geometry:
+        # One figure for all times, played and scrubbed in the browser
+        fig_geo, shown, total = timeseries_stage(st.session_state.lineage_data, show_vectors, show_planes,
+                                                 show_shapes, frame_step or None, max_frames)
+        if shown < total:
+            st.caption(f"Frames are sampled: {shown} of {total} frame times are shown, evenly spread. "
+                       "Raise the frame limit or set a step to see every division.")
+    else:
+        cells, lifespans = positions_stage(st.session_state.lineage_data)
+        fig_geo = plot_geometry_at(cells, lifespans, time_limit, show_vectors, show_planes, show_shapes)
+    with profiling.span("app.plotly_chart"):  # includes figure serialization
+        st.plotly_chart(fig_geo, use_container_width=True)
 
 # === Export ===
 st.subheader("📤 Download Current Tree as CSV")
 csv_buffer = StringIO()
 st.session_state.lineage_data.to_csv(csv_buffer, index=False)
 st.download_button("Download Lineage CSV", data=csv_buffer.getvalue(), file_name="lineage.csv", mime="text/csv")
+
+# === Stage Timings ===
+if profiling.is_enabled():
+    with st.sidebar.expander("⏱ Stage timings (this rerun)", expanded=True):
+        timings = pd.DataFrame(profiling.summary())
+        if timings.empty:
+            st.caption("Nothing recomputed: every stage came from the cache.")
+        else:
+            st.dataframe(timings[["name", "calls", "total_ms", "max_ms"]].round(2), hide_index=True)
+        st.download_button("Download Chrome trace", data=json.dumps(profiling.chrome_trace()),
+                           file_name="lineageviz-trace.json", mime="application/json")
@@ -0,0 +1,88 @@
+import numpy as np
+import pytest
+
+from lineageviz.aggregate import (REDUCERS, Reducer, fate_composition, register_reducer,
+                                  subtree_aggregates, subtree_reduce)
+from lineageviz.tree import LineageArray
+
+
+def random_tree(rng, n, chain=False):
+    if chain:
+        parent = np.concatenate(([-1], np.maximum(np.arange(n - 1) - rng.integers(0, 2, n - 1), 0)))
+    else:
+        parent = np.concatenate(([-1], [rng.integers(0, i) for i in range(1, n)]))
+    volume = rng.uniform(0.1, 1, n)
+    volume[rng.integers(0, n)] = np.nan
+    fate = np.array([rng.choice(['muscle', 'skin', None, '']) for _ in range(n)], dtype=object)
+    return LineageArray.from_parent_array(parent, rng.uniform(1, 20, n), np.full(n, 0.5),
+                                          [f"c{i}" for i in range(n)],
+                                          data={'volume': volume, 'fate': fate})
+
+
+def subtrees(tree):
+    """Cells of every subtree, by walking each cell up to the root."""
+    members = [[] for _ in range(len(tree))]
+    for j in range(len(tree)):
+        i = j
+        while i >= 0:
+            members[i].append(j)
+            i = int(tree.parent[i])
+    return [np.array(m) for m in members]
+
+
+def depths(tree):
+    out = []
+    for j in range(len(tree)):
+        d, i = 0, int(tree.parent[j])
+        while i >= 0:
+            d, i = d + 1, int(tree.parent[i])
+        out.append(d)
+    return np.array(out)
+
+
+@pytest.mark.parametrize("n, chain", [(1, False), (50, False), (700, False), (3000, True)])
+def test_aggregates_match_naive_sums(n, chain):
+    tree = random_tree(np.random.default_rng(n), n, chain)
+    agg = subtree_aggregates(tree)
+    members = subtrees(tree)
+    leaf = tree.is_leaf()
+    volume = np.nan_to_num(tree.data['volume'])
+    depth = depths(tree)
+
+    np.testing.assert_array_equal(agg['cells'], [len(m) for m in members])
+    np.testing.assert_array_equal(agg['terminal_cells'], [leaf[m].sum() for m in members])
+    np.testing.assert_allclose(agg['volume'], [volume[m].sum() for m in members])
+    np.testing.assert_allclose(agg['terminal_volume'], [(volume * leaf)[m].sum() for m in members])
+    np.testing.assert_allclose(agg['cumulative_time'], [tree.length[m].sum() for m in members])
+    np.testing.assert_array_equal(agg['max_depth'], [depth[m].max() for m in members])
+    np.testing.assert_array_equal(agg['height'], [depth[m].max() - depth[i] for i, m in enumerate(members)])
+
+    categories, counts = fate_composition(tree)
+    assert categories == sorted({f for f in tree.data['fate'] if f})
+    for k, fate in enumerate(categories):
+        np.testing.assert_array_equal(counts[:, k], [sum(tree.data['fate'][j] == fate for j in m)
+                                                     for m in members])
+
+
+@pytest.mark.parametrize("ufunc", [np.minimum, np.maximum, np.add])
+def test_subtree_reduce_float_ufuncs(ufunc):
+    tree = random_tree(np.random.default_rng(9), 300)
+    values = np.random.default_rng(1).normal(size=(300, 2))
+    expected = [ufunc.reduce(values[m], axis=0) for m in subtrees(tree)]
+    np.testing.assert_allclose(subtree_reduce(tree, values, ufunc), expected)
+
+
+def test_registered_reducers_do_not_leak():
+    tree = random_tree(np.random.default_rng(2), 40)
+    built_in = dict(REDUCERS)
+    doubled = register_reducer('double_time', Reducer(lambda tree, index: 2 * tree.length))
+    assert REDUCERS == built_in
+    assert 'double_time' not in subtree_aggregates(tree)
+
+    agg = subtree_aggregates(tree, reducers=doubled)
+    np.testing.assert_allclose(agg['double_time'], 2 * agg['cumulative_time'])
+    more = register_reducer('leaves', REDUCERS['terminal_cells'], doubled)
+    assert set(more) == set(doubled) | {'leaves'} and 'leaves' not in doubled
+
+    dropped = subtree_aggregates(tree, reducers={'volume': None})
+    assert 'volume' not in dropped and 'cells' in dropped
@@ -0,0 +1,47 @@
+import os
+
+import numpy as np
+import pytest
+from PIL import Image
+
+from lineageviz.animate import export_animation, frame_times, render_frames
+from lineageviz.importer import load_lineage
+from lineageviz.layout import layout_tree
+
+SAMPLE = os.path.join(os.path.dirname(__file__), os.pardir, "temp_input.csv")
+
+
+def sample_tree():
+    tree, _ = load_lineage(SAMPLE)
+    layout_tree(tree, level_height=2)
+    return tree
+
+
+def test_frame_times_end_with_the_whole_tree():
+    tree = sample_tree()
+    last = np.nanmax(tree.data['time'])
+    times = frame_times(tree, step=25)
+    assert times[0] == 0 and times[-1] >= last > times[-2]
+    np.testing.assert_allclose(np.diff(times), 25)
+
+
+@pytest.mark.parametrize("workers", [1, 3])
+def test_render_frames_writes_one_png_per_time(tmp_path, workers):
+    tree = sample_tree()
+    times = frame_times(tree, step=40)
+    seen = []
+    paths = render_frames(tree, times, str(tmp_path), figsize=(4, 3), dpi=40, workers=workers,
+                          progress=lambda done, total: seen.append((done, total)))
+    assert paths == [str(tmp_path / f"frame_{k:04d}.png") for k in range(len(times))]
+    assert sorted(os.listdir(tmp_path)) == [os.path.basename(p) for p in paths]
+    assert {Image.open(p).size for p in paths} == {(160, 120)}
+    assert seen[-1] == (len(times), len(times))
+
+
+def test_export_animation_gif_frame_count(tmp_path):
+    tree, _ = load_lineage(SAMPLE)
+    filename = str(tmp_path / "growth.gif")
+    times = export_animation(tree, filename, step=30, figsize=(4, 3), dpi=40, workers=2)
+    assert len(times) == len(frame_times(tree, 30))
+    with Image.open(filename) as gif:
+        assert gif.n_frames == len(times)
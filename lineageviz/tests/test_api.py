@@ -0,0 +1,127 @@
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from lineageviz.api import SpeciesClient, SpeciesUnavailable
+
+
+class StandIn(BaseHTTPRequestHandler):
+    """Serves server.routes ({path: (status, body)}) with body-derived ETags."""
+
+    def do_GET(self):
+        server = self.server
+        with server.lock:
+            server.requests.append((self.path, self.headers.get('If-None-Match')))
+        status, body = server.routes.get(self.path, (404, None))
+        etag = f'"{abs(hash(json.dumps(body)))}"'
+        if status == 200 and self.headers.get('If-None-Match') == etag:
+            self.send_response(304)
+            self.end_headers()
+            return
+        payload = json.dumps(body).encode() if status == 200 else b'error'
+        self.send_response(status)
+        if status == 200:
+            self.send_header('ETag', etag)
+        self.send_header('Content-Length', str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def server():
+    httpd = ThreadingHTTPServer(('127.0.0.1', 0), StandIn)
+    httpd.routes = {'/species': (200, ['frog', 'worm'])}
+    httpd.requests = []
+    httpd.lock = threading.Lock()
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    httpd.url = f"http://127.0.0.1:{httpd.server_address[1]}"
+    yield httpd
+    httpd.shutdown()
+    httpd.server_close()
+
+
+def client(server, tmp_path, **options):
+    return SpeciesClient(server.url, cache_dir=str(tmp_path), timeout=5, **options)
+
+
+def test_fresh_cache_skips_the_network(server, tmp_path):
+    api = client(server, tmp_path)
+    assert api.species() == ['frog', 'worm']
+    assert api.species() == ['frog', 'worm']
+    assert len(server.requests) == 1
+
+
+def test_etag_revalidation_reuses_cached_body(server, tmp_path):
+    api = client(server, tmp_path, ttl=0)
+    assert api.species() == ['frog', 'worm']
+    etag = api._read('/species')['etag']
+    fetched = api._read('/species')['fetched']
+
+    assert api.species() == ['frog', 'worm']
+    assert server.requests == [('/species', None), ('/species', etag)]
+    assert api._read('/species')['fetched'] >= fetched
+
+    server.routes['/species'] = (200, ['frog'])
+    assert api.species() == ['frog']
+    assert api._read('/species')['etag'] != etag
+
+
+def test_ttl_expiry_revalidates(server, tmp_path, monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr('lineageviz.api.time.time', lambda: now[0])
+    api = client(server, tmp_path, ttl=60)
+    api.species()
+    now[0] += 59
+    api.species()
+    assert len(server.requests) == 1
+    now[0] += 2
+    api.species()
+    assert len(server.requests) == 2
+    assert server.requests[1][1] is not None
+
+
+def test_offline_reads_only_from_disk(server, tmp_path):
+    client(server, tmp_path).species()
+    server.requests.clear()
+
+    offline = client(server, tmp_path, offline=True, ttl=0)
+    assert offline.species() == ['frog', 'worm']
+    with pytest.raises(SpeciesUnavailable):
+        offline.lineage('frog')
+    assert server.requests == []
+
+
+def test_server_error_falls_back_to_stale_cache(server, tmp_path):
+    server.routes['/species/frog'] = (200, [{'parent': 'P0'}])
+    api = client(server, tmp_path, ttl=0)
+    assert api.lineage('frog') == [{'parent': 'P0'}]
+
+    server.routes['/species/frog'] = (500, None)
+    assert api.lineage('frog') == [{'parent': 'P0'}]
+    with pytest.raises(SpeciesUnavailable):
+        api.lineage('worm')
+
+
+def test_sync_all_isolates_failures(server, tmp_path):
+    server.routes['/species'] = (200, ['frog', 'worm', 'fly'])
+    server.routes['/species/frog'] = (200, [{'parent': 'P0'}])
+    server.routes['/species/worm'] = (500, None)
+    server.routes['/species/fly'] = (200, [{'parent': 'P1'}])
+    api = client(server, tmp_path, max_workers=3)
+    seen = []
+
+    results = api.sync_all(progress=lambda done, total, name, error: seen.append((done, total, name)))
+    assert results['frog'] is None and results['fly'] is None
+    assert isinstance(results['worm'], SpeciesUnavailable)
+    assert sorted(name for _, _, name in seen) == ['fly', 'frog', 'worm']
+    assert [done for done, _, _ in seen] == [1, 2, 3]
+
+    offline = client(server, tmp_path, offline=True)
+    assert offline.lineage('frog') == [{'parent': 'P0'}]
+    assert offline.lineage('fly') == [{'parent': 'P1'}]
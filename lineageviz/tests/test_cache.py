@@ -0,0 +1,134 @@
+import json
+import os
+
+import numpy as np
+import pytest
+
+from lineageviz.cache import TreeCache, load_arrays, save_arrays
+from lineageviz.importer import load_lineage
+from lineageviz.layout import layout_arrays
+
+SAMPLE = os.path.join(os.path.dirname(__file__), os.pardir, "temp_input.csv")
+
+
+def assert_same_tree(a, b):
+    assert a.names == b.names
+    assert [type(name) for name in a.names] == [type(name) for name in b.names]
+    for key in ('parent', 'length', 'offset', 'name_id', 'x', 'y'):
+        np.testing.assert_array_equal(getattr(a, key), getattr(b, key))
+    assert a.data.keys() == b.data.keys()
+    for key in a.data:
+        if a.data[key].dtype == object:
+            assert list(a.data[key]) == list(b.data[key])
+        else:
+            np.testing.assert_array_equal(a.data[key], b.data[key])
+
+
+def write_json(path, rows):
+    path.write_text(json.dumps(rows))
+    return str(path)
+
+
+def numeric_rows():
+    return [dict(parent=1, left_child=2, right_child=3, time=10, left_volume=0.5, right_volume=0.5,
+                 fate=None),
+            dict(parent=2, left_child=4, right_child="4b", time=20, left_volume=0.6, right_volume=0.4,
+                 fate="muscle")]
+
+
+def test_round_trip(tmp_path):
+    tree, _ = load_lineage(SAMPLE)
+    layout_arrays(tree, 2)
+    save_arrays(tree, str(tmp_path / "entry"))
+    assert_same_tree(load_arrays(str(tmp_path / "entry")), tree)
+    assert_same_tree(load_arrays(str(tmp_path / "entry"), mmap=False), tree)
+
+
+def test_numeric_names_keep_their_type(tmp_path):
+    source = write_json(tmp_path / "numeric.json", numeric_rows())
+    fresh, _ = load_lineage(source)
+    assert 1 in fresh.names and "4b" in fresh.names
+    layout_arrays(fresh, 1.5)
+
+    cache = TreeCache(str(tmp_path / "cache"))
+    first = cache.load(source)
+    cached = cache.load(source)
+    assert_same_tree(first, fresh)
+    assert_same_tree(cached, fresh)
+    assert cached.index_of(4) == fresh.index_of(4)
+    assert list(cached.data['fate']) == list(fresh.data['fate'])
+
+
+def test_unsupported_names_are_rejected(tmp_path):
+    tree, _ = load_lineage(SAMPLE)
+    for name in (("P", 0), object()):
+        tree.names[0] = name
+        with pytest.raises(ValueError):
+            save_arrays(tree, str(tmp_path / "entry"))
+        assert not os.path.exists(tmp_path / "entry")
+
+
+def test_key_normalizes_format_and_tracks_content(tmp_path):
+    cache = TreeCache(str(tmp_path / "cache"))
+    source = tmp_path / "lineage.txt"
+    source.write_text(open(SAMPLE).read())
+    keys = {cache.key(str(source), 2, fmt) for fmt in ('csv', '.csv', 'CSV')}
+    assert len(keys) == 1
+    assert cache.key(str(source), 2, 'json') not in keys
+    assert cache.key(str(source), 1.5, 'csv') not in keys
+
+    source.write_text(open(SAMPLE).read() + "E,Ea,Ep,300,0.5,0.5\n")
+    assert cache.key(str(source), 2, 'csv') not in keys
+
+
+def test_hits_skip_the_importer(tmp_path, monkeypatch):
+    cache = TreeCache(str(tmp_path / "cache"))
+    first = cache.load(SAMPLE, 2)
+    monkeypatch.setattr('lineageviz.cache.load_lineage', pytest.fail)
+    assert_same_tree(cache.load(SAMPLE, 2), first)
+    assert len(cache.entries()) == 1
+
+
+def test_stale_version_is_a_miss(tmp_path):
+    cache = TreeCache(str(tmp_path / "cache"))
+    key = cache.key(SAMPLE, 2)
+    cache.load(SAMPLE, 2)
+    meta = os.path.join(cache.directory, key, 'meta.json')
+    with open(meta) as f:
+        old = dict(json.load(f), version=0)
+    with open(meta, 'w') as f:
+        json.dump(old, f)
+    assert cache.get(key) is None
+
+
+def test_eviction_drops_least_recently_used(tmp_path):
+    cache = TreeCache(str(tmp_path / "cache"))
+    keys = []
+    for k, level_height in enumerate((1.0, 2.0, 3.0)):
+        cache.load(SAMPLE, level_height)
+        keys.append(cache.key(SAMPLE, level_height))
+        os.utime(os.path.join(cache.directory, keys[-1], 'meta.json'), (1000 + k, 1000 + k))
+    cache.get(keys[0])  # now the most recently used
+    one = cache.entries()[0][1]
+
+    cache.evict(max_bytes=2 * one)
+    assert sorted(key for key, _, _ in cache.entries()) == sorted([keys[0], keys[2]])
+    cache.max_bytes = one
+    cache.load(SAMPLE, 4.0)
+    assert [key for key, _, _ in cache.entries()] == [cache.key(SAMPLE, 4.0)]
+
+
+def test_invalidate(tmp_path):
+    cache = TreeCache(str(tmp_path / "cache"))
+    other = write_json(tmp_path / "numeric.json", numeric_rows())
+    for level_height in (1.0, 2.0):
+        cache.load(SAMPLE, level_height)
+    cache.load(other)
+
+    cache.invalidate(key=cache.key(SAMPLE, 1.0))
+    assert len(cache.entries()) == 2
+    cache.invalidate(filename=SAMPLE)
+    assert [key for key, _, _ in cache.entries()] == [cache.key(other)]
+    cache.load(SAMPLE, 2.0)
+    cache.invalidate()
+    assert cache.entries() == []
@@ -0,0 +1,20 @@
+import numpy as np
+import pytest
+
+from lineageviz.compare import embryo_features, load_embryo
+from lineageviz.synth import synthetic_divisions, write_lineage
+
+
+@pytest.mark.parametrize("kind", ["random", "stem"])
+def test_features_do_not_depend_on_file_format(tmp_path, kind):
+    divisions = synthetic_divisions(301, kind, seed=3)
+    features = {}
+    for ext in ("csv", "json", "nwk"):
+        path = tmp_path / f"embryo.{ext}"
+        write_lineage(divisions, str(path))
+        names, _, values = embryo_features(load_embryo(str(path)))
+        features[ext] = dict(zip(names, values[:, 0].tolist()))
+    for ext in ("json", "nwk"):
+        assert features[ext].keys() == features["csv"].keys()
+        np.testing.assert_allclose([features[ext][k] for k in features["csv"]],
+                                   list(features["csv"].values()), rtol=1e-9)
@@ -0,0 +1,146 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from geometry_engine import (division_rows, export_to_ply, frame_times, plot_geometry_at,
+                             plot_geometry_scene, plot_geometry_timeseries, ply_arrays)
+from lineageviz.lifespan import LifespanIndex
+from lineageviz.synth import synthetic_divisions
+from spatial_infer import position_tree_array
+
+
+def positioned_cells(n, kind="random"):
+    """Every cell with its position and lifespan, as the app's positions_stage builds them."""
+    d = synthetic_divisions(n, kind, seed=5)
+    tree = {p: dict(daughters=[l, r], division_angle=a, left_volume=vl, right_volume=vr)
+            for p, l, r, a, vl, vr in zip(d['parent'], d['left_child'], d['right_child'],
+                                          d['division_angle'], d['left_volume'], d['right_volume'])}
+    birth = {'P0': 0.0}
+    birth.update((c, t) for l, r, t in zip(d['left_child'], d['right_child'], d['time']) for c in (l, r))
+    death = dict(zip(d['parent'], d['time']))
+    names, positions = position_tree_array(tree)
+    cells = pd.DataFrame({
+        "name": names, "x": positions[:, 0], "y": positions[:, 1], "z": positions[:, 2],
+        "volume": [tree.get(c, {}).get("left_volume", 0.5) for c in names],
+        "daughters": [tree.get(c, {}).get("daughters") for c in names],
+    })
+    lifespans = LifespanIndex([birth[c] for c in names], [death.get(c, np.inf) for c in names])
+    return cells, lifespans
+
+
+def points_by_kind(traces):
+    """Sorted (x, y, z) rows of the given traces, per trace name."""
+    out = {}
+    for trace in traces:
+        xyz = np.stack([np.asarray(trace.x, dtype=float), np.asarray(trace.y, dtype=float),
+                        np.asarray(trace.z, dtype=float)], axis=1)
+        out.setdefault(trace.name, []).append(xyz[~np.isnan(xyz).any(axis=1)])
+    return {name: np.unique(np.concatenate(rows), axis=0) for name, rows in out.items()}
+
+
+@pytest.mark.parametrize("step", [None, 7.5])
+def test_frames_match_static_scene(step):
+    cells, lifespans = positioned_cells(301)
+    times = frame_times(lifespans, step, max_frames=12)
+    fig = plot_geometry_timeseries(cells, lifespans, times=times)
+    assert len(fig.frames) == len(times)
+    for frame, t in zip(fig.frames, times.tolist()):
+        visible = [trace for trace, update in zip(fig.data, frame.data) if update.visible]
+        static = plot_geometry_at(cells, lifespans, t).data
+        expected = points_by_kind(static)
+        got = points_by_kind(visible)
+        assert got.keys() == expected.keys()
+        for name in expected:
+            np.testing.assert_array_equal(got[name], expected[name])
+
+
+def test_static_scene_shows_divisions_at_a_cutoff():
+    cells, lifespans = positioned_cells(101)
+    t = float(np.median(lifespans.death[np.isfinite(lifespans.death)]))
+    names = {trace.name for trace in plot_geometry_at(cells, lifespans, t).data}
+    assert names == {"Cells", "Division vectors", "Division planes"}
+
+
+def test_frame_times_cover_every_event_without_a_cap():
+    _, lifespans = positioned_cells(101)
+    births = np.unique(lifespans.birth)
+    np.testing.assert_array_equal(frame_times(lifespans), births)
+    thinned = frame_times(lifespans, max_frames=10)
+    assert len(thinned) == 10 and thinned[0] == births[0] and thinned[-1] == births[-1]
+
+
+def finite_points(traces):
+    """Distinct (x, y, z) rows of the traces, gaps (NaN) dropped, and how often each occurs."""
+    xyz = np.concatenate([np.empty((0, 3))] + [
+        np.stack([np.asarray(t.x, dtype=float), np.asarray(t.y, dtype=float),
+                  np.asarray(t.z, dtype=float)], axis=1) for t in traces])
+    return np.unique(xyz[~np.isnan(xyz).any(axis=1)], axis=0, return_counts=True)
+
+
+@pytest.mark.parametrize("show_vectors, show_planes, show_spheres",
+                         [(True, True, True), (True, False, True), (False, False, True), (True, True, False)])
+def test_batched_scene_matches_per_cell_traces(show_vectors, show_planes, show_spheres):
+    cells, _ = positioned_cells(151)
+    options = (show_vectors, show_planes, show_spheres)
+    batched = plot_geometry_scene(cells, *options).data
+    legacy = plot_geometry_scene(cells, *options, batched=False).data
+    m = len(division_rows(cells)[0])
+    assert len(batched) == show_spheres + show_vectors + (show_vectors and show_planes)
+
+    # Same cell points and vector end points, each as often as in the per-cell traces
+    for mode in ('markers+text', 'lines'):
+        ours = finite_points([t for t in batched if t.type == 'scatter3d' and t.mode == mode])
+        theirs = finite_points([t for t in legacy if t.type == 'scatter3d' and t.mode == mode])
+        for a, b in zip(ours, theirs):
+            np.testing.assert_array_equal(a, b)
+    vectors = [t for t in batched if t.type == 'scatter3d' and t.mode == 'lines']
+    assert sum(np.isnan(np.asarray(t.x, dtype=float)).sum() for t in vectors) == (m if show_vectors else 0)
+
+    # One triangle per division plane
+    ours = [t for t in batched if t.type == 'mesh3d']
+    theirs = [t for t in legacy if t.type == 'mesh3d']
+    assert sum(len(t.i) for t in ours) == len(theirs) == (m if show_vectors and show_planes else 0)
+    for a, b in zip(finite_points(ours), finite_points(theirs)):
+        np.testing.assert_array_equal(a, b)
+
+
+def read_ply(path):
+    """(header lines, payload bytes) of a binary PLY file."""
+    data = path.read_bytes()
+    end = data.index(b"end_header\n") + len(b"end_header\n")
+    return data[:end].decode('ascii').splitlines(), data[end:]
+
+
+@pytest.mark.parametrize("options, vertex_bytes", [
+    (dict(), 12),
+    (dict(volume=True), 16),
+    (dict(volume=True, color_map={'c1': 'red', 'others': 'gray'}), 19),
+    (dict(volume=True, planes=True), 16),
+    (dict(planes=True, bodies=True, resolution=4), 12),
+])
+def test_ply_header_and_payload(tmp_path, options, vertex_bytes):
+    cells, _ = positioned_cells(101)
+    cells['shape'] = np.where(np.arange(len(cells)) % 3 == 0, 'elongated', 'sphere')
+    path = tmp_path / "embryo.ply"
+    export_to_ply(cells, str(path), **options)
+    header, payload = read_ply(path)
+    vertices, faces = ply_arrays(cells, **options)
+
+    assert header[:2] == ["ply", "format binary_little_endian 1.0"]
+    counts = {line.split()[1]: int(line.split()[2]) for line in header if line.startswith("element")}
+    properties = [line.split()[-1] for line in header if line.startswith("property") and "list" not in line]
+    assert properties == list(vertices.dtype.names)
+    assert counts['vertex'] == len(vertices)
+    n_faces = counts.get('face', 0)
+    assert (n_faces > 0) == bool(options.get('planes') or options.get('bodies'))
+    assert len(payload) == vertex_bytes * counts['vertex'] + 13 * n_faces
+
+    written = np.frombuffer(payload, dtype=vertices.dtype, count=counts['vertex'])
+    np.testing.assert_array_equal(written, vertices)
+    np.testing.assert_array_equal(written[['x', 'y', 'z']][:len(cells)].tolist(),
+                                  cells[['x', 'y', 'z']].to_numpy(dtype=np.float32).tolist())
+    if n_faces:
+        tris = np.frombuffer(payload, dtype=[('n', 'u1'), ('v', '<i4', (3,))],
+                             offset=vertex_bytes * counts['vertex'])
+        assert (tris['n'] == 3).all() and tris['v'].max() < counts['vertex']
+        np.testing.assert_array_equal(tris, faces)
@@ -0,0 +1,121 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from lineageviz.importer import LineageBuilder, from_dataframe, load_lineage
+from lineageviz.synth import synthetic_divisions
+
+
+def messy_table():
+    df = pd.DataFrame(synthetic_divisions(201, 'random', seed=4)).astype({'time': object})
+    df = pd.concat([df, df.iloc[[3]]], ignore_index=True)  # duplicate parent
+    df.loc[5, 'time'] = 'soon'
+    df.loc[7, 'left_child'] = ''
+    df.loc[9, 'left_volume'] = -1
+    df['fate'] = ''
+    df.loc[20:25, 'fate'] = 'muscle'
+    df.loc[len(df)] = ['x1', 'x2', 'x1', 5, 0.5, 0.5, 0, '']  # cycle
+    return df.sample(frac=1, random_state=0).reset_index(drop=True)
+
+
+def assert_same(a, b):
+    (tree_a, report_a), (tree_b, report_b) = a, b
+    assert tree_a.cell_names() == tree_b.cell_names()
+    np.testing.assert_array_equal(tree_a.parent, tree_b.parent)
+    np.testing.assert_array_equal(tree_a.length, tree_b.length)
+    np.testing.assert_array_equal(tree_a.offset, tree_b.offset)
+    assert tree_a.data.keys() == tree_b.data.keys()
+    assert list(tree_a.data['fate']) == list(tree_b.data['fate'])
+    assert repr(report_a) == repr(report_b)
+    assert [row for row, _ in report_a.bad_rows] == [row for row, _ in report_b.bad_rows]
+    assert report_a.non_positive_volumes == report_b.non_positive_volumes
+
+
+@pytest.mark.parametrize("chunk_size", [1, 7, 1 << 14])
+@pytest.mark.parametrize("skip_non_positive", [False, True])
+def test_chunked_builder_matches_from_dataframe(tmp_path, chunk_size, skip_non_positive):
+    df = messy_table()
+    expected = from_dataframe(df, skip_non_positive)
+
+    builder = LineageBuilder(chunk_size=chunk_size)
+    for start in range(0, len(df), 50):
+        builder.add_frame(df.iloc[start:start + 50])
+    assert_same(builder.finish(skip_non_positive), expected)
+
+    rows = LineageBuilder(chunk_size=chunk_size).add_rows(df.to_dict('records'))
+    assert_same(rows.finish(skip_non_positive), expected)
+
+    path = tmp_path / "lineage.csv"
+    df.to_csv(path, index=False)
+    saved = pd.read_csv(path, dtype={'parent': str, 'left_child': str, 'right_child': str},
+                        keep_default_na=False)
+    assert_same(load_lineage(str(path)), from_dataframe(saved))
+
+
+def table(*rows):
+    """Division rows (parent, left, right, time[, left_volume, right_volume])."""
+    rows = [row + (0.5, 0.5) if len(row) == 4 else row for row in rows]
+    return pd.DataFrame(rows, columns=['parent', 'left_child', 'right_child', 'time',
+                                       'left_volume', 'right_volume'])
+
+
+def parents_by_name(tree):
+    names = tree.cell_names()
+    return {name: names[p] if p >= 0 else None for name, p in zip(names, tree.parent.tolist())}
+
+
+def test_cycle_away_from_the_root_is_reported_and_dropped():
+    tree, report = from_dataframe(table(('P0', 'A', 'B', 10), ('A', 'C', 'D', 20),
+                                        ('X', 'Y', 'Z', 30), ('Y', 'X', 'W', 40)))
+    assert report.root == 'P0'
+    assert report.roots == ['P0']
+    assert sorted(map(sorted, report.cycles)) == [['X', 'Y']]
+    assert sorted(report.orphans) == ['W', 'X', 'Y', 'Z']
+    assert parents_by_name(tree) == {'P0': None, 'A': 'P0', 'B': 'P0', 'C': 'A', 'D': 'A'}
+    assert not report.ok
+
+
+def test_cycle_through_the_first_row_is_cut_at_a_root():
+    tree, report = from_dataframe(table(('X', 'Y', 'Z', 30), ('Y', 'X', 'W', 40)))
+    assert report.roots == []
+    assert sorted(map(sorted, report.cycles)) == [['X', 'Y']]
+    assert report.root == 'Y'
+    assert parents_by_name(tree) == {'Y': None, 'X': 'Y', 'Z': 'X', 'W': 'Y'}
+    assert report.orphans == []
+
+
+def test_daughter_claimed_twice_keeps_its_first_parent():
+    tree, report = from_dataframe(table(('P0', 'A', 'B', 10), ('A', 'C', 'D', 20),
+                                        ('B', 'C', 'E', 25), ('D', 'D', 'F', 30)))
+    assert report.multiple_parents == ['C', 'D']  # C twice, D as its own daughter
+    assert report.cycles == []
+    assert parents_by_name(tree) == {'P0': None, 'A': 'P0', 'C': 'A', 'D': 'A', 'F': 'D',
+                                     'B': 'P0', 'E': 'B'}
+    assert tree.length[tree.index_of('B')] == 25
+
+
+def test_repeated_parent_keeps_its_first_row():
+    tree, report = from_dataframe(table(('P0', 'A', 'B', 10), ('P0', 'Q', 'R', 15)))
+    assert report.duplicate_parents == ['P0']
+    assert parents_by_name(tree) == {'P0': None, 'A': 'P0', 'B': 'P0'}
+    assert tree.length[0] == 10
+
+
+@pytest.mark.parametrize("skip_non_positive", [False, True])
+def test_non_positive_volumes(skip_non_positive):
+    df = table(('P0', 'A', 'B', 10, 0.6, 0.4), ('A', 'C', 'D', 20, 0.0, 0.5),
+               ('B', 'E', 'F', 30, 0.5, -1.0), ('D', 'G', 'H', 40, 0.3, 0.3))
+    tree, report = from_dataframe(df, skip_non_positive)
+    assert report.non_positive_volumes == [2, 3]
+    lengths = dict(zip(tree.cell_names(), tree.length.tolist()))
+    if skip_non_positive:
+        # The skipped divisions never happened: A and B stay leaves sized by volume
+        assert parents_by_name(tree) == {'P0': None, 'A': 'P0', 'B': 'P0'}
+        assert sorted(report.orphans) == ['D', 'G', 'H']
+        assert lengths['A'] == 0.6 and lengths['B'] == 0.4
+        assert np.isnan(tree.data['time'][tree.index_of('A')])
+    else:
+        assert parents_by_name(tree)['C'] == 'A' and parents_by_name(tree)['F'] == 'B'
+        assert lengths['C'] == 0.0 and lengths['F'] == -1.0
+        assert lengths['A'] == 20 and lengths['D'] == 40
+    assert not report.ok
@@ -0,0 +1,50 @@
+import numpy as np
+import pytest
+
+from lineageviz.layout import IncrementalLayout, layout_arrays
+from lineageviz.tree import LineageArray
+
+
+def random_tree(rng, n, chain=False):
+    """Random parent links; chain=True grows one deep asymmetric lineage."""
+    if chain:
+        parent = np.concatenate(([-1], np.maximum(np.arange(n - 1) - rng.integers(0, 2, n - 1), 0)))
+    else:
+        parent = np.concatenate(([-1], [rng.integers(0, i) for i in range(1, n)]))
+    return LineageArray.from_parent_array(parent, rng.uniform(1, 20, n), rng.uniform(0.1, 0.9, n),
+                                          [f"c{i}" for i in range(n)])
+
+
+def full_layout(tree, level_height):
+    fresh = LineageArray(tree.parent, tree.length.copy(), tree.offset.copy(), tree.name_id, tree.names)
+    return layout_arrays(fresh, level_height)
+
+
+@pytest.mark.parametrize("level_height", [1.5, 2, -1.5])
+@pytest.mark.parametrize("n, chain", [(1, False), (40, False), (400, False), (300, True)])
+def test_edits_match_full_relayout(n, chain, level_height):
+    rng = np.random.default_rng(n + int(chain))
+    layout = IncrementalLayout(random_tree(rng, n, chain), level_height)
+    added = 0
+    for step in range(60):
+        tree = layout.tree
+        leaves = np.flatnonzero(tree.first_child < 0)
+        inner = np.flatnonzero(tree.first_child[1:] >= 0) + 1
+        op = rng.integers(0, 3)
+        if op == 0:
+            k = int(rng.integers(1, 4))
+            names = [f"new{added + j}" for j in range(k)]
+            added += k
+            layout.divide(int(rng.choice(leaves)), names, rng.uniform(1, 20, k), rng.uniform(0.1, 0.9, k),
+                          cell_length=rng.uniform(1, 20) if rng.random() < 0.5 else None)
+        elif op == 1 and len(inner):
+            layout.undivide(int(rng.choice(inner)),
+                            cell_length=rng.uniform(1, 20) if rng.random() < 0.5 else None)
+        else:
+            cell = int(rng.integers(0, len(tree)))
+            layout.update(cell, length=rng.uniform(1, 20) if rng.random() < 0.7 else None,
+                          offset=rng.uniform(0.1, 0.9) if rng.random() < 0.7 else None)
+
+        expected = full_layout(layout.tree, level_height)
+        np.testing.assert_array_equal(layout.tree.x, expected.x, err_msg=f"x after edit {step}")
+        np.testing.assert_array_equal(layout.tree.y, expected.y, err_msg=f"y after edit {step}")
@@ -0,0 +1,28 @@
+import numpy as np
+import pytest
+
+from lineageviz.lifespan import LifespanIndex
+
+
+def brute_force(birth, death, t):
+    return np.flatnonzero((birth <= t) & (t < death))
+
+
+@pytest.mark.parametrize("death", [np.inf, 3.0])
+def test_single_cell(death):
+    index = LifespanIndex([0.0], [death])
+    for t in (-1.0, 0.0, 1.0, 3.0, 5.0):
+        alive = index.cells_alive_at(t)
+        assert alive.ndim == 1
+        np.testing.assert_array_equal(alive, brute_force(index.birth, index.death, t))
+
+
+@pytest.mark.parametrize("n", [2, 3, 17, 200])
+def test_matches_brute_force(n):
+    rng = np.random.default_rng(n)
+    birth = rng.uniform(0, 100, n)
+    death = birth + rng.exponential(10, n)
+    death[rng.random(n) < 0.2] = np.inf
+    index = LifespanIndex(birth, death)
+    for t in np.concatenate(([-1.0], birth, death[np.isfinite(death)], rng.uniform(0, 150, 20))):
+        np.testing.assert_array_equal(index.cells_alive_at(t), brute_force(birth, death, t))
@@ -0,0 +1,75 @@
+import io
+
+import numpy as np
+import pytest
+
+from lineageviz.parser import iter_newick_plusplus, parse_newick_plusplus
+from lineageviz.tree import flatten
+
+EMBRYO = "((ABa:10@0.5,ABp:12@0.4)AB:20@0.6,(EMS:15@0.5,P2:18@0.5)P1:22@0.4)P0:30@0.55;"
+SMALL = "(a,b:1@0.3)r;"
+
+
+def as_columns(tree):
+    """(parent, names, length, offset) of a LineageArray in preorder."""
+    return tree.parent.tolist(), tree.cell_names(), tree.length.tolist(), tree.offset.tolist()
+
+
+def node_columns(root):
+    nodes, parent = flatten(root)
+    return parent, [n.name for n in nodes], [n.length for n in nodes], [n.offset for n in nodes]
+
+
+def chain(depth):
+    """A single lineage `depth` divisions deep: n0 -> n1 -> ... -> leaf."""
+    closing = ''.join(f")n{i}:{i + 1}@0.5" for i in reversed(range(depth)))
+    return "(" * depth + "leaf:1@0.5" + closing + ";"
+
+
+def test_labels():
+    parent, names, length, offset = as_columns(parse_newick_plusplus(EMBRYO, as_array=True))
+    assert names == ["P0", "AB", "ABa", "ABp", "P1", "EMS", "P2"]
+    assert parent == [-1, 0, 1, 1, 0, 4, 4]
+    assert length == [30, 20, 10, 12, 22, 15, 18]
+    assert offset == [0.55, 0.6, 0.5, 0.4, 0.4, 0.5, 0.5]
+
+    parent, names, length, offset = as_columns(parse_newick_plusplus(SMALL, as_array=True))
+    assert (parent, names, length, offset) == ([-1, 0, 0], ["r", "a", "b"], [0.0, 0.0, 1.0], [0.5, 0.5, 0.3])
+
+
+def test_deep_chain_without_recursion():
+    depth = 100_000
+    tree = parse_newick_plusplus(chain(depth), as_array=True)
+    assert len(tree) == depth + 1
+    np.testing.assert_array_equal(tree.parent, np.arange(-1, depth))
+    assert tree.name(0) == "n0" and tree.name(depth) == "leaf"
+    assert tree.length[depth - 1] == depth
+
+
+@pytest.mark.parametrize("chunk_size", [1, 2, 5, 13, 1 << 20])
+def test_several_trees_across_chunk_boundaries(chunk_size):
+    text = "\n".join([EMBRYO, SMALL, chain(50), EMBRYO.rstrip(';')])  # last tree without ';'
+    trees = list(iter_newick_plusplus(io.StringIO(text), as_array=True, chunk_size=chunk_size))
+    expected = [parse_newick_plusplus(s, as_array=True) for s in (EMBRYO, SMALL, chain(50), EMBRYO)]
+    assert [as_columns(t) for t in trees] == [as_columns(t) for t in expected]
+
+
+def test_reads_paths(tmp_path):
+    path = tmp_path / "embryos.nwk"
+    path.write_text(EMBRYO + SMALL)
+    assert len(list(iter_newick_plusplus(str(path), chunk_size=7))) == 2
+
+
+@pytest.mark.parametrize("text", [EMBRYO, SMALL, chain(300)])
+def test_array_matches_nodes(text):
+    tree = parse_newick_plusplus(text, as_array=True)
+    root = parse_newick_plusplus(text)
+    assert node_columns(root) == as_columns(tree)
+    streamed = list(iter_newick_plusplus(io.StringIO(text), chunk_size=3))
+    assert [node_columns(r) for r in streamed] == [as_columns(tree)]
+
+
+@pytest.mark.parametrize("text", ["((a,b)c;", "(a,b))c;", "(a,b)c(d,e)f;", "(a,b:x@1)c;"])
+def test_malformed_input(text):
+    with pytest.raises(ValueError):
+        parse_newick_plusplus(text)
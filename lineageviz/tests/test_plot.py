@@ -0,0 +1,137 @@
+import io
+import os
+
+import numpy as np
+import pytest
+from matplotlib.collections import PolyCollection
+from matplotlib.figure import Figure
+from matplotlib.image import imread
+
+from lineageviz.importer import load_lineage
+from lineageviz.layout import layout_tree
+from lineageviz.plot import COUNT, LABEL_STYLES, NAME, LabelBatch, draw_tree
+from lineageviz.synth import synthetic_divisions
+from lineageviz.tree import LineageArray
+
+DEMO = os.path.join(os.path.dirname(__file__), os.pardir, "lineageviz", "tree.csv")
+COLORS = {"AB": "#0066cc", "P1": "#cc3300", "MS": "#009966", "E": "#ffcc00"}
+
+
+def pixels(fig):
+    buf = io.BytesIO()
+    fig.savefig(buf, format='png', dpi=80)
+    buf.seek(0)
+    return imread(buf)
+
+
+def drawn(tree, figsize=(10, 5), **options):
+    fig = Figure(figsize=figsize, dpi=80)
+    ax = fig.subplots()
+    draw_tree(tree, ax, **options)
+    return fig, ax
+
+
+def demo_tree():
+    tree, _ = load_lineage(DEMO)
+    layout_tree(tree, level_height=2)
+    return tree
+
+
+@pytest.mark.parametrize("options", [
+    dict(),
+    dict(color_map=COLORS, search_target='AB'),
+    dict(show_sizes=False, show_times=False, fate_labels={'ABa': 'skin'}, angle_labels={'P0': 90.0}),
+])
+def test_batched_matches_legacy_pixels(options):
+    tree = demo_tree()
+    batched, _ = drawn(tree, **options)
+    legacy, _ = drawn(tree.to_node(), batched=False, **options)
+    np.testing.assert_array_equal(pixels(batched), pixels(legacy))
+
+
+def random_layout(n):
+    d = synthetic_divisions(n, 'random', seed=1)
+    names = ['P0'] + list(d['left_child']) + list(d['right_child'])
+    index = {name: i for i, name in enumerate(names)}
+    parent = np.full(len(names), -1)
+    for p, l, r in zip(d['parent'], d['left_child'], d['right_child']):
+        parent[index[l]] = parent[index[r]] = index[p]
+    tree = LineageArray.from_parent_array(parent, np.ones(len(names)), np.full(len(names), 0.5), names)
+    layout_tree(tree, level_height=1)
+    return tree
+
+
+def label_batch(ax):
+    return next(a for a in ax.artists if isinstance(a, LabelBatch))
+
+
+@pytest.mark.parametrize("collapse_px", [3.0, 12.0])
+def test_lod_collapses_narrow_subtrees_into_wedges(collapse_px):
+    tree = random_layout(801)
+    fig, ax = drawn(tree, figsize=(8, 4), lod=True, collapse_px=collapse_px)
+    y0, y1 = ax.get_ylim()
+    px_y = ax.get_window_extent().height / (y1 - y0)
+
+    # Brute force: vertical extent of every subtree from its leaves
+    end, leaf = tree.subtree_end, tree.is_leaf()
+    extent = np.array([np.ptp(tree.y[i:end[i]][leaf[i:end[i]]]) for i in range(len(tree))])
+    small = ~leaf & (extent * px_y < collapse_px)
+    roots = [i for i in np.flatnonzero(small) if not small[tree.parent[i]]]
+
+    wedges = [c for c in ax.collections if isinstance(c, PolyCollection)]
+    apexes = {tuple(path.vertices[0]) for path in wedges[0].get_paths()} if wedges else set()
+    split = tree.x + tree.length
+    assert roots and apexes == {(split[i], tree.y[i]) for i in roots}
+
+    # Each "k cells" label that survives label thinning names its wedge's leaf count
+    leaf_y = [tree.y[i:end[i]][leaf[i:end[i]]] for i in roots]
+    expected = {(y.min() + y.max()) / 2: f"{len(y)} cells" for y in leaf_y}
+    labels = label_batch(ax)
+    counts = [(y, t) for y, t, s in zip(labels._y.tolist(), labels._texts, labels._style_ids) if s == COUNT]
+    assert counts and all(expected[y] == t for y, t in counts)
+
+
+def label_boxes(ax, labels):
+    """Approximate pixel boxes (left, bottom, right, top) as used by the label placer."""
+    x0, x1 = ax.get_xlim()
+    y0, y1 = ax.get_ylim()
+    box = ax.get_window_extent()
+    px_x, px_y = box.width / (x1 - x0), box.height / (y1 - y0)
+    out = []
+    for lx, ly, text, s in zip(labels._x, labels._y, labels._texts, labels._style_ids.tolist()):
+        style = LABEL_STYLES[s]
+        h = style['fontsize'] * ax.figure.dpi / 72
+        w = 0.6 * h * len(text)
+        px, py = (lx - x0) * px_x, (ly - y0) * px_y
+        ha = style.get('ha', 'left')
+        left = px - w if ha == 'right' else px - w / 2 if ha == 'center' else px
+        bottom = py - h / 2 if style.get('va') == 'center' else py
+        out.append((left, bottom, left + w, bottom + h))
+    return out, px_x, px_y
+
+
+@pytest.mark.parametrize("spacing", [4.0, 10.0, 25.0])
+def test_label_thinning_respects_spacing(spacing):
+    tree = random_layout(801)
+    fig, ax = drawn(tree, figsize=(8, 4), lod=True, collapse_px=0.5, label_spacing_px=spacing)
+    labels = label_batch(ax)
+    boxes, px_x, px_y = label_boxes(ax, labels)
+    assert len(boxes) > 0
+    for i, a in enumerate(boxes):
+        for b in boxes[i + 1:]:
+            overlap_x = min(a[2], b[2]) - max(a[0], b[0])
+            overlap_y = min(a[3], b[3]) - max(a[1], b[1])
+            assert overlap_x <= 0 or overlap_y <= 0
+
+    # At most one labelled cell per spacing-sized pixel bucket
+    x0, y0 = ax.get_xlim()[0], ax.get_ylim()[0]
+    names = labels._style_ids == NAME
+    cells = np.stack([np.floor((labels._x[names] + 1.5 - x0) * px_x / (spacing * 6)),
+                      np.floor((labels._y[names] - y0) * px_y / spacing)], axis=1)
+    assert len(np.unique(cells, axis=0)) == len(cells)
+
+
+def test_wider_spacing_places_fewer_labels():
+    tree = random_layout(801)
+    counts = [len(label_batch(drawn(tree, lod=True, label_spacing_px=s)[1])) for s in (4.0, 10.0, 25.0)]
+    assert counts[0] > counts[1] > counts[2] > 0
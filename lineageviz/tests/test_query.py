@@ -0,0 +1,76 @@
+import numpy as np
+import pytest
+
+from lineageviz.query import LineageIndex
+from lineageviz.tree import LineageArray
+
+
+def random_tree(rng, n, chain=False):
+    if chain:
+        parent = np.concatenate(([-1], np.arange(n - 1)))
+    else:
+        parent = np.concatenate(([-1], [rng.integers(0, i) for i in range(1, n)]))
+    return LineageArray.from_parent_array(parent, np.ones(n), np.full(n, 0.5),
+                                          [f"c{i}" for i in rng.permutation(n)])
+
+
+def path_to_root(tree, i):
+    """i and its ancestors, walking parent links one at a time."""
+    path = [i]
+    while tree.parent[path[-1]] >= 0:
+        path.append(int(tree.parent[path[-1]]))
+    return path
+
+
+@pytest.mark.parametrize("n, chain", [(1, False), (2, False), (60, False), (500, False), (300, True)])
+def test_ancestry_matches_parent_walk(n, chain):
+    rng = np.random.default_rng(n)
+    tree = random_tree(rng, n, chain)
+    index = LineageIndex(tree)
+    paths = [path_to_root(tree, i) for i in range(n)]
+
+    for i in range(n):
+        np.testing.assert_array_equal(index.ancestors(i), paths[i][1:])
+        np.testing.assert_array_equal(index.ancestors(i, include_self=True), paths[i])
+        below = [j for j in range(n) if i in paths[j] and j != i]
+        np.testing.assert_array_equal(index.descendants(i), below)
+        np.testing.assert_array_equal(index.descendants(i, include_self=True), sorted(below + [i]))
+        assert index.depth(i) == len(paths[i]) - 1
+
+    pairs = rng.integers(0, n, (200, 2))
+    expected = []
+    for a, b in pairs.tolist():
+        assert index.is_ancestor(a, b) == (a in paths[b])
+        expected.append(next(c for c in paths[a] if c in paths[b]))
+        assert index.lca(a, b) == expected[-1]
+    np.testing.assert_array_equal(index.lca(pairs[:, 0], pairs[:, 1]), expected)
+
+
+def test_queries_accept_names():
+    tree = random_tree(np.random.default_rng(3), 40)
+    index = LineageIndex(tree)
+    names = tree.cell_names()
+    assert index.lca(names[5], names[9]) == index.lca(5, 9)
+    assert index.is_ancestor(names[0], names[39])
+    with pytest.raises(KeyError):
+        index.lca("nope", names[1])
+    with pytest.raises(IndexError):
+        index.ancestors(40)
+
+
+def test_with_prefix():
+    parent = [-1, 0, 0, 1, 1, 2, 2]
+    names = ["P0", "AB", "P1", "ABa", "ABp", "EMS", "P2"]
+    index = LineageIndex(LineageArray.from_parent_array(parent, np.ones(7), np.full(7, 0.5), names))
+    cell_names = index.tree.cell_names()
+
+    def found(prefix):
+        return sorted(cell_names[i] for i in index.with_prefix(prefix))
+
+    assert found("AB") == ["AB", "ABa", "ABp"]
+    assert found("P") == ["P0", "P1", "P2"]
+    assert found("ABp") == ["ABp"]
+    assert found("") == sorted(names)
+    assert len(index.with_prefix("Z")) == 0
+    assert len(index.with_prefix("ABx")) == 0
+    assert index.with_prefix("Z").dtype.kind == "i"
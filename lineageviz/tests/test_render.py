@@ -0,0 +1,37 @@
+import os
+import shutil
+
+import pytest
+
+from lineageviz.render import find_lineages, render_all
+
+SAMPLE = os.path.join(os.path.dirname(__file__), os.pardir, "temp_input.csv")
+
+
+def lineage_dir(tmp_path):
+    """Two good lineages (one in a subdirectory, same stem) and one broken one."""
+    (tmp_path / "nested").mkdir(parents=True)
+    shutil.copy(SAMPLE, tmp_path / "embryo.csv")
+    shutil.copy(SAMPLE, tmp_path / "nested" / "embryo.csv")
+    (tmp_path / "broken.csv").write_text("not,a\nlineage,table\n")
+    (tmp_path / "notes.txt").write_text("ignored")
+    return tmp_path
+
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_broken_file_does_not_stop_the_batch(tmp_path, workers):
+    paths = find_lineages([str(lineage_dir(tmp_path / "in"))])
+    assert [os.path.basename(p) for p in paths] == ["broken.csv", "embryo.csv", "embryo.csv"]
+    seen = []
+    results = render_all(paths, str(tmp_path / "out"), workers=workers, figsize=(8, 4), dpi=30,
+                         progress=lambda done, total, path, error: seen.append((done, total)))
+
+    assert [path for path, _, _ in results] == paths
+    errors = {os.path.basename(output): error for _, output, error in results}
+    assert errors.keys() == {"broken.png", "embryo.png", "embryo_1.png"}
+    assert errors["broken.png"].startswith("ValueError: Missing columns")
+    assert errors["embryo.png"] is None and errors["embryo_1.png"] is None
+    assert sorted(os.listdir(tmp_path / "out")) == ["embryo.png", "embryo_1.png"]
+    for name in ("embryo.png", "embryo_1.png"):
+        assert (tmp_path / "out" / name).read_bytes().startswith(b"\x89PNG")
+    assert sorted(seen) == [(1, 3), (2, 3), (3, 3)]
@@ -0,0 +1,74 @@
+import numpy as np
+import pytest
+
+import spatial_infer
+from lineageviz.synth import synthetic_divisions
+
+
+def division_dict(kind, n):
+    d = synthetic_divisions(n, kind, seed=2)
+    return {str(p): dict(daughters=[l, r], division_angle=a, left_volume=vl, right_volume=vr)
+            for p, l, r, a, vl, vr in zip(d['parent'], d['left_child'], d['right_child'],
+                                          d['division_angle'], d['left_volume'], d['right_volume'])}
+
+
+@pytest.mark.parametrize("kind", ["stem", "balanced", "random"])
+def test_narrow_generations_match_batched(monkeypatch, kind):
+    tree = division_dict(kind, 801)
+    names, positions = spatial_infer.position_tree_array(tree)
+    monkeypatch.setattr(spatial_infer, "_MIN_BATCH", 1)
+    batched_names, batched = spatial_infer.position_tree_array(tree)
+    assert names == batched_names
+    np.testing.assert_array_equal(positions, batched)
+
+
+def reference_daughters(parent_pos, angle, prev_vector, volume_left, volume_right):
+    """infer_daughter_positions as first written (np.allclose, np.cross, ** (1/3))."""
+    parent_pos = np.array(parent_pos)
+    angle_rad = np.radians(angle)
+    prev = np.array([0, 0, 1]) if prev_vector is None else spatial_infer.normalize(np.array(prev_vector))
+    if np.allclose(prev, [0, 0, 1]):
+        ortho = np.array([1, 0, 0])
+    else:
+        ortho = spatial_infer.normalize(np.cross(prev, [0, 0, 1]))
+    c, s = np.cos(angle_rad), np.sin(angle_rad)
+    ux, uy, uz = prev
+    R = np.array([
+        [c + ux**2 * (1 - c), ux*uy*(1 - c) - uz*s, ux*uz*(1 - c) + uy*s],
+        [uy*ux*(1 - c) + uz*s, c + uy**2 * (1 - c), uy*uz*(1 - c) - ux*s],
+        [uz*ux*(1 - c) - uy*s, uz*uy*(1 - c) + ux*s, c + uz**2 * (1 - c)]
+    ])
+    div_vector = spatial_infer.normalize(R @ ortho)
+    separation = (3 * volume_left / (4 * np.pi)) ** (1/3) + (3 * volume_right / (4 * np.pi)) ** (1/3) + 0.2
+    offset = div_vector * (separation / 2)
+    return tuple(parent_pos - offset), tuple(parent_pos + offset)
+
+
+def reference_position_tree(tree, root_name='P0', parent_pos=(0, 0, 0)):
+    """The original one-division-at-a-time breadth-first queue."""
+    positions = {root_name: parent_pos}
+    queue = [(root_name, parent_pos, None)]
+    while queue:
+        parent, ppos, prev = queue.pop(0)
+        node = tree.get(parent, {})
+        daughters = node.get("daughters", [])
+        if len(daughters) == 2:
+            l, r = daughters
+            lp, rp = reference_daughters(ppos, node.get("division_angle", 90), prev,
+                                         node.get("left_volume", 0.5), node.get("right_volume", 0.5))
+            positions[l] = lp
+            positions[r] = rp
+            queue.append((l, lp, np.array(rp) - np.array(lp)))
+            queue.append((r, rp, np.array(lp) - np.array(rp)))
+    return positions
+
+
+@pytest.mark.parametrize("kind", ["stem", "balanced", "random"])
+@pytest.mark.parametrize("n", [1, 801, 4001])
+def test_position_tree_matches_reference(kind, n):
+    tree = division_dict(kind, n)
+    expected = reference_position_tree(tree)
+    got = spatial_infer.position_tree(tree)
+    assert list(got) == list(expected)
+    np.testing.assert_allclose(np.array(list(got.values()), dtype=float),
+                               np.array(list(expected.values()), dtype=float), rtol=1e-9, atol=1e-9)
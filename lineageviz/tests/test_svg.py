@@ -0,0 +1,24 @@
+import os
+import re
+
+from lineageviz.importer import load_lineage
+from lineageviz.layout import layout_tree
+from lineageviz.svg import _Viewport, write_svg
+
+SAMPLE = os.path.join(os.path.dirname(__file__), os.pardir, "temp_input.csv")
+
+
+def test_every_cell_is_linked_to_its_parent(tmp_path):
+    tree, _ = load_lineage(SAMPLE)
+    layout_tree(tree, level_height=2)
+    out = tmp_path / "tree.svg"
+    write_svg(tree, str(out), color_map={'AB': 'red', 'EMS': 'green'}, chunk_size=5)
+
+    links = set()
+    for d in re.findall(r'<path class="c\d+" d="([^"]*)"', out.read_text()):
+        links.update(re.findall(r'M([-\d.]+) ([-\d.]+)L([-\d.]+) ([-\d.]+)', d))
+    view = _Viewport(tree, 864, 432, 30)
+    p = tree.parent[1:]
+    expected = zip(view.x(tree.x[p] + tree.length[p]), view.y(tree.y[p]),
+                   view.x(tree.x[1:]), view.y(tree.y[1:]))
+    assert links == {tuple(f"{v:.2f}" for v in link) for link in expected}